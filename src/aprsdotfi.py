@@ -20,95 +20,245 @@
 
 import requests
 import logging
+import threading
+from datetime import datetime, timezone
+from geodata import get_distance_in_meters
 
 # Default user agent which is used by the program for sending requests to aprs.fi
 default_user_agent = f"mowas-pwb (+https://github.com/joergschultzelutter/mowas-pwb/)"
 
+# aprs.fi API endpoint and timeout (in seconds)
+aprsdotfi_api_url = "https://api.aprs.fi/api/get"
+aprsdotfi_timeout = 30
+
+# Max. number of call signs per aprs.fi request (limit set by aprs.fi)
+aprsdotfi_max_names_per_request = 20
+
+# Default interval (minutes) and minimal movement (meters) for the position tracker
+aprsdotfi_poll_interval = 5
+aprsdotfi_min_distance = 250
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session (connection pooling); created on first use
+aprsdotfi_session = None
+aprsdotfi_session_lock = threading.Lock()
+
+
+def get_aprsdotfi_session():
+    """
+    Returns the shared HTTP session for aprs.fi requests
+
+    Parameters
+    ==========
 
-def get_position_on_aprsfi(aprsfi_callsign: str, aprsdotfi_api_key: str):
+    Returns
+    =======
+    aprsdotfi_session: 'requests.Session'
+            Our HTTP session
     """
-    Get the position of the given call sign on aprs.fi
-    Call sign is taken 'as is', e.g. with or without SSID.
+    global aprsdotfi_session
 
-    If a query for the user's call sign returns more than one position,
-    then only the very first call sign position on aprs.fi
-    is used by the program.
+    with aprsdotfi_session_lock:
+        if aprsdotfi_session is None:
+            aprsdotfi_session = requests.Session()
+            aprsdotfi_session.headers.update({"User-Agent": default_user_agent})
+    return aprsdotfi_session
+
+
+def get_positions_on_aprsfi(aprsfi_callsigns: list, aprsdotfi_api_key: str):
+    """
+    Get the positions of the given call signs on aprs.fi
+    Call signs are taken 'as is', e.g. with or without SSID.
+
+    aprs.fi accepts up to 20 call signs per request; the call signs
+    are therefore requested in batches of (max.) 20 call signs.
 
     Parameters
     ==========
-    aprsfi_callsign: 'str'
-            Call sign that we want to get the lat/lon coordinates for
+    aprsfi_callsigns: 'list'
+            Call signs that we want to get the lat/lon coordinates for
     aprsdotfi_api_key: 'str'
             aprs.fi api access key
 
     Returns
     =======
     success: 'bool'
-            True if call was successful
-    latitude: 'float'
-            latitude position if user was found on aprs.fi
-    longitude: 'float'
-            longitude position if user was found on aprs.fi
+            True if all requests were successful
+    positions: 'dict'
+            Position per call sign which was found on aprs.fi; contains
+            'latitude', 'longitude' and 'last_seen' (UTC, may be 'None')
     """
 
-    headers = {"User-Agent": default_user_agent}
+    success = True
+    positions = {}
 
-    success = False
-    latitude = longitude = 0.0
+    aprsfi_callsigns = [callsign.upper() for callsign in aprsfi_callsigns]
 
-    result = "fail"
-    found = 0  # number of entries found in aprs.fi request (if any)
+    for index in range(0, len(aprsfi_callsigns), aprsdotfi_max_names_per_request):
+        batch = aprsfi_callsigns[index : index + aprsdotfi_max_names_per_request]
+        try:
+            resp = get_aprsdotfi_session().get(
+                url=aprsdotfi_api_url,
+                params={
+                    "name": ",".join(batch),
+                    "what": "loc",
+                    "apikey": aprsdotfi_api_key,
+                    "format": "json",
+                },
+                timeout=aprsdotfi_timeout,
+            )
+            json_content = resp.json() if resp.status_code == 200 else {}
+        except Exception as ex:
+            json_content = {}
 
-    aprsfi_callsign = aprsfi_callsign.upper()
+        # extract web service result. Can either be 'ok' or 'fail'
+        if json_content.get("result") != "ok":
+            logger.debug(msg=f"aprs.fi request for {batch} has failed")
+            success = False
+            continue
 
-    try:
-        resp = requests.get(
-            url=f"https://api.aprs.fi/api/get?name={aprsfi_callsign}&what=loc&apikey={aprsdotfi_api_key}&format=json",
-            headers=headers,
-        )
-    except Exception as ex:
-        resp = None
-    if resp:
-        if resp.status_code == 200:
+        # aprs.fi returns one entry per call sign that it was able to find
+        for entry in json_content.get("entries", []):
+            # Check if lat/lon are present; this is the essential information that we need
             try:
-                json_content = resp.json()
-            except Exception as ex:
-                json_content = {}
-            # extract web service result. Can either be 'ok' or 'fail'
-            if "result" in json_content:
-                result = json_content["result"]
-            if result == "ok":
-                # extract number of result sets in the response. Must be > 0
-                # regardless of the available number of results, we will only
-                # use the first result
-                if "found" in json_content:
-                    found = json_content["found"]
-                if found > 0:
-                    # We extract only the very first entry and disregard
-                    # entries 2..n whereas ever present
-                    # now extract lat/lon/altitude/lasttime
-
-                    # Check if lat/lon are present; this is the essential information that we need to continue
-                    if (
-                        "lat" not in json_content["entries"][0]
-                        and "lng" in json_content["entries"][0]
-                    ):
-                        success = False
-                    else:
-                        success = True
-                        try:
-                            latitude = float(json_content["entries"][0]["lat"])
-                            longitude = float(json_content["entries"][0]["lng"])
-                        except ValueError:
-                            latitude = longitude = 0
-                            success = False
-        return (success, latitude, longitude)
+                callsign = entry["name"].upper()
+                latitude = float(entry["lat"])
+                longitude = float(entry["lng"])
+            except (KeyError, ValueError):
+                continue
+            try:
+                last_seen = datetime.fromtimestamp(int(entry["lasttime"]), timezone.utc)
+            except (KeyError, ValueError):
+                last_seen = None
+            positions[callsign] = {
+                "latitude": latitude,
+                "longitude": longitude,
+                "last_seen": last_seen,
+            }
+
+    return success, positions
+
+
+def create_position_tracker(
+    aprsfi_callsigns: list,
+    aprsdotfi_api_key: str,
+    min_distance: float = aprsdotfi_min_distance,
+):
+    """
+    Creates a position tracker for 1..n call signs. The tracker is updated
+    in the background (see update_position_tracker) and only publishes
+    a call sign's new position if the call sign has moved by at least
+    'min_distance'
+
+    Parameters
+    ==========
+    aprsfi_callsigns: 'list'
+            Call signs that we want to track
+    aprsdotfi_api_key: 'str'
+            aprs.fi api access key
+    min_distance: 'float'
+            Minimal movement (in meters) before we publish a new position
+
+    Returns
+    =======
+    position_tracker: 'dict'
+            Our position tracker
+    """
+    return {
+        "callsigns": [callsign.upper() for callsign in aprsfi_callsigns],
+        "aprsdotfi_api_key": aprsdotfi_api_key,
+        "min_distance": min_distance,
+        "positions": {},
+        "version": 0,
+        "lock": threading.Lock(),
+    }
+
+
+def update_position_tracker(position_tracker: dict):
+    """
+    Gets the call signs' current positions from aprs.fi and publishes
+    the positions of those call signs which have moved far enough
+
+    Parameters
+    ==========
+    position_tracker: 'dict'
+            Our position tracker, see create_position_tracker
+
+    Returns
+    =======
+    success: 'bool'
+            True if at least one call sign's position could be retrieved
+    """
+    _, positions = get_positions_on_aprsfi(
+        aprsfi_callsigns=position_tracker["callsigns"],
+        aprsdotfi_api_key=position_tracker["aprsdotfi_api_key"],
+    )
+    for callsign in position_tracker["callsigns"]:
+        if callsign not in positions:
+            logger.debug(
+                msg=f"Unable to retrieve coordinates for {callsign} on aprs.fi"
+            )
+    if not positions:
+        return False
+
+    with position_tracker["lock"]:
+        tracked_positions = position_tracker["positions"]
+        moved = False
+        for callsign, position in positions.items():
+            tracked_position = tracked_positions.get(callsign)
+            if (
+                tracked_position is None
+                or get_distance_in_meters(
+                    tracked_position["latitude"],
+                    tracked_position["longitude"],
+                    position["latitude"],
+                    position["longitude"],
+                )
+                >= position_tracker["min_distance"]
+            ):
+                tracked_positions[callsign] = position
+                moved = True
+                logger.info(
+                    msg=f"New position for {callsign}: {position['latitude']}/{position['longitude']}"
+                )
+            else:
+                # Keep the published position but remember when we saw the call sign
+                tracked_position["last_seen"] = position["last_seen"]
+        if moved:
+            position_tracker["version"] += 1
+    return True
+
+
+def get_tracked_positions(position_tracker: dict):
+    """
+    Returns the latest published positions of a position tracker
+
+    Parameters
+    ==========
+    position_tracker: 'dict'
+            Our position tracker, see create_position_tracker
+
+    Returns
+    =======
+    version: 'int'
+            Incremented whenever a new position gets published
+    positions: 'dict'
+            Position per call sign ('latitude', 'longitude', 'last_seen');
+            call signs which were never found on aprs.fi are not included
+    """
+    with position_tracker["lock"]:
+        return (
+            position_tracker["version"],
+            {
+                callsign: dict(position)
+                for callsign, position in position_tracker["positions"].items()
+            },
+        )
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,1479 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: benchmarks, based on the captured MOWAS feeds in 'demo_data'
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# All network-dependent enrichers (reverse geocoding, map rendering,
+# translation) are replaced by stubs; the benchmarks neither access
+# the MOWAS servers nor send any messages.
+#
+# Usage: python benchmark.py replay --points 1 10 100 1000 --scale 1 4
+#        python benchmark.py startup --runs 5
+#        python benchmark.py multitenant --subscribers 10 100 1000 5000
+#        python benchmark.py dedup --areas 1000 --points 500
+#        python benchmark.py sms --max-len 67 160
+#        python benchmark.py sms --verify --cases 30000
+#        python benchmark.py ascii
+#        python benchmark.py synthetic --elements 1000 --areas 5 --vertices 200 --points 1000
+#        python benchmark.py geopool --workers 1 2 4 8 --vertices 2000 --points 20000
+#        python benchmark.py locators --points 10 100 1000 10000
+#        python benchmark.py locators --verify --cases 40000
+#
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from expiringdict import ExpiringDict
+import apprise
+import mowas
+import outputgenerator
+from geodata import (
+    convert_latlon_array_to_maidenhead,
+    convert_latlon_array_to_utm,
+    convert_latlon_to_maidenhead,
+    convert_latlon_to_utm,
+)
+from geomatch import build_area_match_table
+from geopool import create_geometry_pool, shutdown_geometry_pool
+from utils import make_pretty_sms_messages, split_string_to_string_list
+from text_normalizer import convert_text_to_plain_ascii, remove_html_content
+from multitenant import create_subscriber_caches, run_multitenant_cycle
+from test_data_generator import generate_synthetic_feed, write_synthetic_feed
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Location of the captured MOWAS feeds
+demo_data_directory = os.path.join(os.path.dirname(__file__), "..", "demo_data")
+
+# Captured MOWAS feeds per MOWAS category
+demo_data_files = {
+    "TEMPEST": ["unwetter.json", "unwetter2.json", "unwetter3.json"],
+    "FLOOD": [
+        "hochwassermeldungen.json",
+        "hochwassermeldungen2.json",
+        "hochwassermeldungen3.json",
+        "hochwassermeldungen4.json",
+    ],
+    "DISASTERS": [
+        "gefahrendurchsagen.json",
+        "gefahrendurchsagen2.json",
+        "gefahrendurchsagen3.json",
+    ],
+}
+
+# Bounding box of Germany; used for generating random watch coordinates
+germany_bbox = (47.27, 5.87, 55.06, 15.04)
+
+# Modules which are imported by the program at startup
+startup_modules = ["mowas", "outputgenerator", "multitenant", "polling"]
+
+# Optional backends; only imported once they have been selected
+optional_backends = {
+    "generic summarizer": "text_summarizer_generic",
+    "openai summarizer": "text_summarizer_openai",
+    "palm summarizer": "text_summarizer_palm",
+    "deepl translator": "deepl",
+    "map renderer": "staticmaps",
+    "geocoder": "geopy.geocoders",
+}
+
+# Processing stages of the replay benchmark
+benchmark_stages = ["parse", "filter", "geometry", "enrichment", "render", "dispatch"]
+
+# Functions (as referenced by the MOWAS module) per processing stage
+mowas_stage_functions = {
+    "geometry": ["build_area_match_table", "convert_polygon_to_latlon"],
+    "enrichment": [
+        "remove_html_content",
+        "get_reverse_geopy_data",
+        "convert_latlon_array_to_utm",
+        "convert_latlon_array_to_maidenhead",
+        "translate_text_list",
+        "create_text_summary",
+    ],
+    "render": ["render_png_map"],
+}
+
+
+def stub_network_enrichers():
+    """
+    Replaces all network-dependent enrichers in the MOWAS module by stubs
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    """
+    mowas.get_reverse_geopy_data = lambda latitude, longitude, **kwargs: (
+        True,
+        {"address": f"{latitude} {longitude}"},
+    )
+    mowas.render_png_map = lambda **kwargs: None
+    mowas.translate_text_list = lambda original_text, **kwargs: original_text
+
+
+def stub_message_senders():
+    """
+    Replaces the Email and Apprise senders by stubs. The messages are
+    still generated but never sent.
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    apprise_config_file: 'str'
+        Name of a temporary Apprise config file that can be used
+        for the message generation
+    """
+    outputgenerator.send_email_message = lambda **kwargs: True
+    apprise.Apprise.notify = lambda self, **kwargs: True
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", suffix=".yml", delete=False
+    ) as apprise_config:
+        apprise_config.write("urls:\n  - json://localhost\n")
+    return apprise_config.name
+
+
+class StageRecorder:
+    """
+    Collects the wall time and the memory allocations per processing
+    stage. Stages may be nested (e.g. the geometry stage runs within
+    the filter stage); the time of a nested stage is not deducted from
+    the enclosing stage - see get_stage_times.
+    """
+
+    def __init__(self):
+        self.times = dict.fromkeys(benchmark_stages + ["process"], 0.0)
+        self.allocations = dict.fromkeys(benchmark_stages + ["process"], 0)
+        self.peak_allocation = 0
+        self._stack = []
+
+    def wrap(self, stage: str, function):
+        def wrapper(*args, **kwargs):
+            self._enter()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.times[stage] += time.perf_counter() - start
+                self._leave(stage)
+
+        return wrapper
+
+    def _enter(self):
+        if tracemalloc.is_tracing():
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            self._stack.append([current, 0])
+
+    def _leave(self, stage: str):
+        if tracemalloc.is_tracing():
+            start_current, child_peak = self._stack.pop()
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, child_peak)
+            self.peak_allocation = max(self.peak_allocation, peak)
+            self.allocations[stage] = max(self.allocations[stage], peak - start_current)
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def get_stage_times(self):
+        """
+        Returns the wall time per stage; the filter stage is whatever
+        process_mowas_data spends outside of its nested stages
+        """
+        times = dict(self.times)
+        times["filter"] = max(
+            0.0,
+            times.pop("process")
+            - times["geometry"]
+            - times["enrichment"]
+            - times["render"],
+        )
+        return times
+
+    def get_stage_allocations(self):
+        """
+        Returns the peak allocation per stage; for the filter stage, this
+        is the peak allocation of process_mowas_data as a whole
+        """
+        allocations = dict(self.allocations)
+        allocations["filter"] = allocations.pop("process")
+        return allocations
+
+
+def instrument_mowas_stages(recorder: StageRecorder):
+    """
+    Wraps the stage functions in the MOWAS module with the recorder
+
+    Parameters
+    ==========
+    recorder: 'StageRecorder'
+        Recorder that collects the stage data
+
+    Returns
+    =======
+    originals: 'dict'
+        The original functions; see restore_mowas_stages
+    """
+    originals = {}
+    for stage, function_names in mowas_stage_functions.items():
+        for function_name in function_names:
+            originals[function_name] = getattr(mowas, function_name)
+            setattr(
+                mowas,
+                function_name,
+                recorder.wrap(stage, originals[function_name]),
+            )
+    return originals
+
+
+def restore_mowas_stages(originals: dict):
+    """
+    Removes the recorder from the MOWAS module
+
+    Parameters
+    ==========
+    originals: 'dict'
+        The original functions, see instrument_mowas_stages
+
+    Returns
+    =======
+    """
+    for function_name, function in originals.items():
+        setattr(mowas, function_name, function)
+
+
+def load_demo_feed_data(capture_index: int = 0):
+    """
+    Loads one captured feed per MOWAS category from the 'demo_data' directory
+
+    Parameters
+    ==========
+    capture_index: 'int'
+        Index of the capture that we want to load per category
+
+    Returns
+    =======
+    mowas_feed_data: 'dict'
+        see mowas.get_mowas_feed_data
+    """
+    mowas_feed_data = {}
+    for mowas_category, file_names in demo_data_files.items():
+        file_name = file_names[min(capture_index, len(file_names) - 1)]
+        with open(os.path.join(demo_data_directory, file_name), "r") as f:
+            mowas_feed_data[mowas_category] = json.load(f)
+    return mowas_feed_data
+
+
+def load_demo_captures():
+    """
+    Loads all captured MOWAS feeds from the 'demo_data' directory
+    as raw data (parsing is part of the benchmark)
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    demo_captures: 'list'
+        List of (MOWAS category, file name, raw content) tuples
+    """
+    demo_captures = []
+    for mowas_category, file_names in demo_data_files.items():
+        for file_name in file_names:
+            with open(os.path.join(demo_data_directory, file_name), "rb") as f:
+                demo_captures.append((mowas_category, file_name, f.read()))
+    return demo_captures
+
+
+def scale_feed_data(json_data: list, scale_factor: int):
+    """
+    Creates a synthetic scale-up of a captured MOWAS feed: every
+    message is repeated 'scale_factor' times with unique identifiers
+
+    Parameters
+    ==========
+    json_data: 'list'
+        Parsed MOWAS feed
+    scale_factor: 'int'
+        Number of copies per message
+
+    Returns
+    =======
+    scaled_json_data: 'list'
+        Scaled MOWAS feed
+    """
+    if scale_factor <= 1:
+        return json_data
+    scaled_json_data = []
+    for copy_index in range(scale_factor):
+        for element in json_data:
+            scaled_element = dict(element)
+            scaled_element["identifier"] = f"{element['identifier']}_{copy_index}"
+            scaled_json_data.append(scaled_element)
+    return scaled_json_data
+
+
+def replay_demo_captures(
+    demo_captures: list,
+    coordinates: list,
+    scale_factor: int,
+    recorder: StageRecorder,
+    apprise_config_file: str,
+):
+    """
+    Replays all captured MOWAS feeds through parsing, process_mowas_data
+    and the message dispatch
+
+    Parameters
+    ==========
+    demo_captures: 'list'
+        see load_demo_captures
+    coordinates: 'list'
+        List of [latitude, longitude] watch coordinates
+    scale_factor: 'int'
+        see scale_feed_data
+    recorder: 'StageRecorder'
+        Recorder that collects the stage data
+    apprise_config_file: 'str'
+        see stub_message_senders
+
+    Returns
+    =======
+    message_count: 'int'
+        Number of generated messages
+    """
+    parse = recorder.wrap("parse", json.loads)
+    process = recorder.wrap("process", mowas.process_mowas_data)
+    dispatch = recorder.wrap("dispatch", outputgenerator.dispatch_mowas_messages)
+
+    message_count = 0
+    for mowas_category, _, raw_content in demo_captures:
+        json_data = scale_feed_data(
+            json_data=parse(raw_content), scale_factor=scale_factor
+        )
+        _, mowas_messages_to_send, _ = process(
+            coordinates=coordinates,
+            mowas_cache=ExpiringDict(max_len=1000, max_age_seconds=3600),
+            mowas_active_categories=[mowas_category],
+            generate_sms_messages=True,
+            text_summarizer="internal",
+            mowas_feed_data={mowas_category: json_data},
+        )
+        message_count += len(mowas_messages_to_send)
+        if mowas_messages_to_send:
+            dispatch(
+                mowas_messages_to_send=mowas_messages_to_send,
+                warncell_data={},
+                email_enabled=True,
+                messenger_config_file=apprise_config_file,
+                sms_messenger_config_file=apprise_config_file,
+                sms_message_split=True,
+            )
+    return message_count
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of this process in MiB (or 'None'
+    if the platform does not provide that information)
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    peak_rss: 'float'
+        Peak RSS in MiB
+    """
+    if resource is None:
+        return None
+    # Linux reports KiB, macOS reports bytes
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def benchmark_replay(point_counts: list, scale_factors: list):
+    """
+    Replays the captured MOWAS feeds for a growing number of watch
+    coordinates and reports wall time and allocations per stage
+
+    Parameters
+    ==========
+    point_counts: 'list'
+        Numbers of watch coordinates that we want to benchmark
+    scale_factors: 'list'
+        Synthetic scale-up factors for the captured feeds
+
+    Returns
+    =======
+    """
+    demo_captures = load_demo_captures()
+    apprise_config_file = stub_message_senders()
+
+    header = f"{'scale':>5} {'points':>6} " + " ".join(
+        f"{stage:>10}" for stage in benchmark_stages
+    )
+    header += f" {'total':>8} {'msgs':>6} {'peak alloc':>10} {'peak RSS':>9}"
+
+    try:
+        for scale_factor in scale_factors:
+            print(header)
+            for point_count in point_counts:
+                coordinates = generate_random_coordinates(
+                    count=point_count, seed=point_count
+                )
+
+                # First pass: wall time only
+                recorder = StageRecorder()
+                originals = instrument_mowas_stages(recorder)
+                try:
+                    message_count = replay_demo_captures(
+                        demo_captures=demo_captures,
+                        coordinates=coordinates,
+                        scale_factor=scale_factor,
+                        recorder=recorder,
+                        apprise_config_file=apprise_config_file,
+                    )
+                finally:
+                    restore_mowas_stages(originals)
+                stage_times = recorder.get_stage_times()
+
+                # Second pass: allocations (tracemalloc slows down everything)
+                recorder = StageRecorder()
+                originals = instrument_mowas_stages(recorder)
+                tracemalloc.start()
+                try:
+                    replay_demo_captures(
+                        demo_captures=demo_captures,
+                        coordinates=coordinates,
+                        scale_factor=scale_factor,
+                        recorder=recorder,
+                        apprise_config_file=apprise_config_file,
+                    )
+                    _, peak_allocation = tracemalloc.get_traced_memory()
+                    peak_allocation = max(peak_allocation, recorder.peak_allocation)
+                finally:
+                    tracemalloc.stop()
+                    restore_mowas_stages(originals)
+
+                peak_rss = get_peak_rss()
+                print(
+                    f"{scale_factor:>5} {point_count:>6} "
+                    + " ".join(
+                        f"{stage_times[stage]:>9.3f}s" for stage in benchmark_stages
+                    )
+                    + f" {sum(stage_times.values()):>7.2f}s {message_count:>6}"
+                    + f" {peak_allocation / (1024 * 1024):>7.1f}MiB"
+                    + (f" {peak_rss:>6.1f}MiB" if peak_rss else f" {'-':>9}")
+                )
+                stage_allocations = recorder.get_stage_allocations()
+                print(
+                    f"{'':>12} "
+                    + " ".join(
+                        f"{stage_allocations[stage] / 1024:>7.0f}KiB"
+                        for stage in benchmark_stages
+                    )
+                )
+    finally:
+        os.remove(apprise_config_file)
+
+
+def measure_startup(modules: list, runs: int):
+    """
+    Imports the given modules in a fresh interpreter and measures the
+    wall time and the peak RSS of that interpreter
+
+    Parameters
+    ==========
+    modules: 'list'
+        Names of the modules that we want to import
+    runs: 'int'
+        Number of runs; the median value is returned
+
+    Returns
+    =======
+    startup_time: 'float'
+        Median wall time in seconds
+    peak_rss: 'float'
+        Median peak RSS in MiB (or 'None' if not available)
+    """
+    code = f"import {', '.join(modules)}"
+    if resource is not None:
+        code += "; import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+    startup_times = []
+    peak_rss_values = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+        startup_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        if resource is not None:
+            peak_rss = int(result.stdout.strip().splitlines()[-1])
+            peak_rss_values.append(
+                peak_rss / (1024 * 1024)
+                if sys.platform == "darwin"
+                else peak_rss / 1024
+            )
+
+    return (
+        statistics.median(startup_times),
+        statistics.median(peak_rss_values) if peak_rss_values else None,
+    )
+
+
+def benchmark_startup(runs: int):
+    """
+    Compares the program's startup (imports only) with and without
+    the optional backends
+
+    Parameters
+    ==========
+    runs: 'int'
+        Number of runs per scenario
+
+    Returns
+    =======
+    """
+    scenarios = [("program modules only", startup_modules)]
+    for backend, module in optional_backends.items():
+        scenarios.append((f"+ {backend}", startup_modules + [module]))
+    scenarios.append(
+        ("+ all optional backends", startup_modules + list(optional_backends.values()))
+    )
+
+    print(f"{'scenario':<28} {'startup':>9} {'peak RSS':>10}")
+    for scenario, modules in scenarios:
+        try:
+            startup_time, peak_rss = measure_startup(modules=modules, runs=runs)
+        except RuntimeError as ex:
+            print(f"{scenario:<28} cannot import: {ex}")
+            continue
+        peak_rss = f"{peak_rss:>7.1f}MiB" if peak_rss else f"{'-':>10}"
+        print(f"{scenario:<28} {startup_time:>8.2f}s {peak_rss}")
+
+
+def generate_random_coordinates(count: int, seed: int = 42):
+    """
+    Generates random watch coordinates within Germany
+
+    Parameters
+    ==========
+    count: 'int'
+        Number of coordinates
+    seed: 'int'
+        Random seed
+
+    Returns
+    =======
+    coordinates: 'list'
+        List of [latitude, longitude] coordinates
+    """
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = germany_bbox
+    return [
+        [
+            round(rng.uniform(min_lat, max_lat), 6),
+            round(rng.uniform(min_lon, max_lon), 6),
+        ]
+        for _ in range(count)
+    ]
+
+
+def benchmark_multitenant(
+    subscriber_counts: list, points_per_subscriber: int = 2, naive_limit: int = 200
+):
+    """
+    Runs one multi-tenant cycle for a growing number of synthetic subscribers
+    and compares it against one process_mowas_data run per subscriber
+    (which is what running one process per subscriber boils down to)
+
+    Parameters
+    ==========
+    subscriber_counts: 'list'
+        Numbers of subscribers that we want to benchmark
+    points_per_subscriber: 'int'
+        Number of watch coordinates per subscriber
+    naive_limit: 'int'
+        The per-subscriber comparison is skipped for larger subscriber counts
+
+    Returns
+    =======
+    """
+    mowas_feed_data = load_demo_feed_data()
+    mowas_categories = list(mowas_feed_data.keys())
+
+    print(f"{'subscribers':>12} {'shared join':>12} {'cycle':>10} {'naive':>10}")
+    for subscriber_count in subscriber_counts:
+        coordinates = generate_random_coordinates(
+            count=subscriber_count * points_per_subscriber, seed=subscriber_count
+        )
+        subscriber_profiles = [
+            {
+                "name": f"subscriber_{index}",
+                "watch_areas": coordinates[
+                    index * points_per_subscriber : (index + 1) * points_per_subscriber
+                ],
+                "warning_level": "Minor",
+                "high_prio_level": "Severe",
+                "active_categories": mowas_categories,
+                "target_language": None,
+                "enable_covid_content": False,
+                "email_recipient": None,
+                "messenger_config_file": None,
+                "sms_messenger_config_file": None,
+            }
+            for index in range(subscriber_count)
+        ]
+
+        start = time.perf_counter()
+        build_area_match_table(mowas_feed_data=mowas_feed_data, coordinates=coordinates)
+        join_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_multitenant_cycle(
+            mowas_categories=mowas_categories,
+            subscriber_profiles=subscriber_profiles,
+            subscriber_caches=create_subscriber_caches(
+                subscriber_profiles=subscriber_profiles, time_to_live=60
+            ),
+            warncell_data={},
+            text_summarizer="internal",
+            dispatch_messages=False,
+            mowas_feed_data=mowas_feed_data,
+        )
+        cycle_time = time.perf_counter() - start
+
+        naive_time = "-"
+        if subscriber_count <= naive_limit:
+            start = time.perf_counter()
+            for profile in subscriber_profiles:
+                mowas.process_mowas_data(
+                    coordinates=profile["watch_areas"],
+                    mowas_cache=ExpiringDict(max_len=1000, max_age_seconds=3600),
+                    mowas_active_categories=mowas_categories,
+                    mowas_feed_data=mowas_feed_data,
+                    text_summarizer="internal",
+                )
+            naive_time = f"{time.perf_counter() - start:.2f}s"
+
+        print(
+            f"{subscriber_count:>12} {join_time:>11.2f}s {cycle_time:>9.2f}s {naive_time:>10}"
+        )
+
+
+def generate_dedup_stress_feed(area_count: int):
+    """
+    Creates a synthetic MOWAS feed for the duplicate check stress test:
+    one DISASTERS message with 'area_count' areas which cover all of Germany
+
+    Parameters
+    ==========
+    area_count: 'int'
+        Number of areas of the message
+
+    Returns
+    =======
+    mowas_feed_data: 'dict'
+        see mowas.get_mowas_feed_data
+    """
+    with open(os.path.join(demo_data_directory, "gefahrendurchsagen.json"), "r") as f:
+        element = json.load(f)[1]
+
+    min_lat, min_lon, max_lat, max_lon = germany_bbox
+    polygon = (
+        f"{min_lon},{min_lat} {max_lon},{min_lat} {max_lon},{max_lat} "
+        f"{min_lon},{max_lat} {min_lon},{min_lat}"
+    )
+    info = dict(element["info"][0])
+    info["area"] = [
+        {
+            "areaDesc": f"Area {index}",
+            "polygon": [polygon],
+            "geocode": [{"valueName": f"Area {index}", "value": f"{index:012d}"}],
+        }
+        for index in range(area_count)
+    ]
+    element = dict(element, identifier="DEDUP-STRESS-TEST", msgType="Alert")
+    element["info"] = [info]
+    return {"DISASTERS": [element]}
+
+
+def benchmark_dedup(area_count: int, point_count: int, runs: int):
+    """
+    Stress test for the duplicate checks in process_mowas_data: every
+    watch point matches every area of the message. The geometry stage
+    is bypassed by a precomputed area match table, so the result is
+    dominated by the duplicate checks.
+
+    Parameters
+    ==========
+    area_count: 'int'
+        Number of areas of the message
+    point_count: 'int'
+        Number of watch coordinates
+    runs: 'int'
+        Number of runs; we report the median
+
+    Returns
+    =======
+    """
+    mowas_feed_data = generate_dedup_stress_feed(area_count=area_count)
+    coordinates = generate_random_coordinates(count=point_count)
+    matched = frozenset((coord[0], coord[1]) for coord in coordinates)
+    area_match_table = {
+        ("DISASTERS", "DEDUP-STRESS-TEST", area_index): matched
+        for area_index in range(area_count)
+    }
+
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _, mowas_messages_to_send, _ = mowas.process_mowas_data(
+            coordinates=coordinates,
+            mowas_cache=ExpiringDict(max_len=1000, max_age_seconds=3600),
+            mowas_active_categories=["DISASTERS"],
+            mowas_feed_data=mowas_feed_data,
+            area_match_table=area_match_table,
+            text_summarizer="internal",
+        )
+        durations.append(time.perf_counter() - start)
+
+    message = mowas_messages_to_send["DEDUP-STRESS-TEST"]
+    print(
+        f"{'areas':>6} {'points':>7} {'matches':>8} {'areas kept':>11} {'coords kept':>12} {'median':>9}"
+    )
+    print(
+        f"{area_count:>6} {point_count:>7} {area_count * point_count:>8} "
+        f"{len(message.areas):>11} {len(message.coords_matching_latlon):>12} "
+        f"{statistics.median(durations):>8.2f}s"
+    )
+
+
+def load_sms_texts(file_names: list):
+    """
+    Builds the (unabbreviated) SMS texts of all messages in the given
+    captured MOWAS feeds, see mowas.process_mowas_data
+
+    Parameters
+    ==========
+    file_names: 'list'
+        Names of the captured feeds in the 'demo_data' directory
+
+    Returns
+    =======
+    sms_texts: 'list'
+        One text per message
+    """
+    sms_texts = []
+    for file_name in file_names:
+        with open(os.path.join(demo_data_directory, file_name), "r") as f:
+            json_data = json.load(f)
+        for element in json_data:
+            info = element["info"][0]
+            sms_texts.append(
+                " ".join(
+                    str(remove_html_content(info.get(field)))
+                    for field in ("headline", "description", "instruction")
+                )
+            )
+    return sms_texts
+
+
+def benchmark_sms(max_lengths: list, runs: int):
+    """
+    Splits the SMS texts of 'demo_data/gefahr06.txt' and of all captured
+    MOWAS feeds into SMS-sized chunks (--sms-message-split)
+
+    Parameters
+    ==========
+    max_lengths: 'list'
+        SMS message lengths that we want to benchmark
+    runs: 'int'
+        Number of runs; we report the median
+
+    Returns
+    =======
+    """
+    all_feeds = [name for names in demo_data_files.values() for name in names]
+    text_sets = {
+        "gefahr06.txt": load_sms_texts(["gefahr06.txt"]),
+        "all demo feeds": load_sms_texts(all_feeds),
+    }
+
+    print(
+        f"{'texts':<16} {'count':>6} {'chars':>9} {'max len':>8} {'chunks':>8} {'median':>10}"
+    )
+    for text_set, sms_texts in text_sets.items():
+        for max_len in max_lengths:
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                chunks = sum(
+                    len(make_pretty_sms_messages(message_to_add=text, max_len=max_len))
+                    for text in sms_texts
+                )
+                durations.append(time.perf_counter() - start)
+            print(
+                f"{text_set:<16} {len(sms_texts):>6} {sum(map(len, sms_texts)):>9} "
+                f"{max_len:>8} {chunks:>8} {statistics.median(durations) * 1000:>8.2f}ms"
+            )
+
+
+def make_pretty_sms_messages_reference(
+    message_to_add: str,
+    destination_list: list = None,
+    max_len: int = 67,
+    separator_char: str = " ",
+    add_sep: bool = True,
+    force_outgoing_unicode_messages: bool = False,
+):
+    """
+    Former recursive implementation of utils.make_pretty_sms_messages (one
+    call per word). Kept unchanged as the reference for 'sms --verify';
+    do not use it anywhere else.
+
+    Parameters
+    ==========
+    see utils.make_pretty_sms_messages
+
+    Returns
+    =======
+    destination_list: 'list'
+                    List array, containing 1..n human readable strings with
+                    the "message_to_add' input data
+    """
+    if not destination_list:
+        destination_list = []
+
+    message_to_add = re.sub("[{}|~]+", "", message_to_add)
+
+    if not force_outgoing_unicode_messages:
+        message_to_add = convert_text_to_plain_ascii(message_string=message_to_add)
+
+    if len(message_to_add) > max_len:
+        split_data = message_to_add.split()
+        for split in split_data:
+            if len(split) < max_len:
+                destination_list = make_pretty_sms_messages_reference(
+                    message_to_add=split,
+                    destination_list=destination_list,
+                    max_len=max_len,
+                    separator_char=separator_char,
+                    add_sep=add_sep,
+                    force_outgoing_unicode_messages=force_outgoing_unicode_messages,
+                )
+            else:
+                string_list = split_string_to_string_list(
+                    message_string=split, max_len=max_len
+                )
+                for msg in string_list:
+                    destination_list.append(msg)
+    else:
+        if len(destination_list) > 0:
+            string_from_list = destination_list[-1]
+            if len(string_from_list) + len(message_to_add) + 1 <= max_len:
+                delimiter = ""
+                if len(string_from_list) > 0 and add_sep:
+                    delimiter = separator_char
+                string_from_list = string_from_list + delimiter + message_to_add
+                destination_list[-1] = string_from_list
+            else:
+                destination_list.append(message_to_add)
+        else:
+            destination_list.append(message_to_add)
+
+    return destination_list
+
+
+def verify_sms(case_count: int, seed: int):
+    """
+    Property check: utils.make_pretty_sms_messages must return exactly
+    the same chunks as the former recursive implementation. Inputs are
+    random texts (umlauts, APRS-forbidden characters, emoji, tabs/newlines,
+    words longer than max_len) plus all captured MOWAS texts, with random
+    max lengths, destination lists, separators and unicode settings.
+
+    Parameters
+    ==========
+    case_count: 'int'
+        Number of random test cases
+    seed: 'int'
+        Random seed; the same seed always produces the same test cases
+
+    Returns
+    =======
+    mismatch_count: 'int'
+        Number of test cases with different results
+    """
+    rng = random.Random(seed)
+    special_chars = list("\t\n{}|~äöüÄÖÜß¦éñ€—–“”…😀.,;:-XYZ")
+    plain_chars = list("abcdefghij ")
+
+    all_feeds = [name for names in demo_data_files.values() for name in names]
+    texts = load_sms_texts(["gefahr06.txt"]) + load_sms_texts(all_feeds)
+    for _ in range(case_count):
+        length = rng.choice([0, 1, 5, 20, 70, 150, 400])
+        text = "".join(
+            rng.choice(special_chars) if rng.random() < 0.3 else rng.choice(plain_chars)
+            for _ in range(length)
+        )
+        if rng.random() < 0.2:
+            text += " " + "x" * rng.randint(60, 200)
+        texts.append(text)
+
+    mismatch_count = 0
+    for text in texts:
+        destination_list = rng.choice([None, [], ["abc"], ["", "hello world"]])
+        kwargs = {
+            "max_len": rng.choice([1, 2, 5, 10, 20, 67, 160]),
+            "separator_char": rng.choice([" ", ", "]),
+            "add_sep": rng.random() < 0.8,
+            "force_outgoing_unicode_messages": rng.random() < 0.3,
+        }
+        expected = make_pretty_sms_messages_reference(
+            text,
+            list(destination_list) if destination_list is not None else None,
+            **kwargs,
+        )
+        result = make_pretty_sms_messages(
+            text,
+            list(destination_list) if destination_list is not None else None,
+            **kwargs,
+        )
+        if result != expected:
+            mismatch_count += 1
+            if mismatch_count <= 5:
+                print(f"MISMATCH {text!r} {destination_list} {kwargs}")
+                print(f"  expected: {expected}")
+                print(f"  result:   {result}")
+    print(f"{len(texts)} cases (seed {seed}), {mismatch_count} mismatches")
+    return mismatch_count
+
+
+def benchmark_ascii(runs: int):
+    """
+    Converts the description fields of all captured MOWAS feeds to plain ASCII
+
+    Parameters
+    ==========
+    runs: 'int'
+        Number of runs; we report the median
+
+    Returns
+    =======
+    """
+    descriptions = []
+    for file_names in demo_data_files.values():
+        for file_name in file_names:
+            with open(os.path.join(demo_data_directory, file_name), "r") as f:
+                json_data = json.load(f)
+            descriptions.extend(
+                element["info"][0]["description"]
+                for element in json_data
+                if element["info"][0].get("description")
+            )
+
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for description in descriptions:
+            convert_text_to_plain_ascii(message_string=description)
+        durations.append(time.perf_counter() - start)
+
+    ascii_count = sum(description.isascii() for description in descriptions)
+    print(f"{'texts':>6} {'chars':>9} {'ascii':>6} {'median':>10}")
+    print(
+        f"{len(descriptions):>6} {sum(map(len, descriptions)):>9} {ascii_count:>6} "
+        f"{statistics.median(durations) * 1000:>8.2f}ms"
+    )
+
+
+def benchmark_synthetic(
+    element_count: int,
+    areas_per_element: int,
+    vertices_per_polygon: int,
+    point_count: int,
+    runs: int,
+    seed: int,
+    output_file: str = None,
+):
+    """
+    Runs process_mowas_data on a synthetic MOWAS feed
+
+    Parameters
+    ==========
+    element_count: 'int'
+        Number of MOWAS messages
+    areas_per_element: 'int'
+        Number of areas per MOWAS message
+    vertices_per_polygon: 'int'
+        Number of vertices per polygon
+    point_count: 'int'
+        Number of watch coordinates
+    runs: 'int'
+        Number of runs; we report the median
+    seed: 'int'
+        Seed for the feed and the watch coordinates
+    output_file: 'str'
+        Optional JSON file to which the synthetic feed is written
+
+    Returns
+    =======
+    """
+    feed_settings = {
+        "element_count": element_count,
+        "areas_per_element": areas_per_element,
+        "vertices_per_polygon": vertices_per_polygon,
+        "seed": seed,
+    }
+    start = time.perf_counter()
+    if output_file:
+        json_data = write_synthetic_feed(file_name=output_file, **feed_settings)
+    else:
+        json_data = generate_synthetic_feed(**feed_settings)
+    generation_time = time.perf_counter() - start
+
+    coordinates = generate_random_coordinates(count=point_count, seed=seed)
+    mowas_feed_data = {"TEMPEST": json_data}
+
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _, mowas_messages_to_send, _ = mowas.process_mowas_data(
+            coordinates=coordinates,
+            mowas_cache=ExpiringDict(max_len=100000, max_age_seconds=3600),
+            mowas_active_categories=["TEMPEST"],
+            mowas_feed_data=mowas_feed_data,
+            text_summarizer="internal",
+        )
+        durations.append(time.perf_counter() - start)
+
+    print(
+        f"{'elements':>9} {'areas':>6} {'vertices':>9} {'points':>7} {'matched':>8} {'generate':>9} {'median':>9}"
+    )
+    print(
+        f"{element_count:>9} {element_count * areas_per_element:>6} "
+        f"{vertices_per_polygon:>9} {point_count:>7} {len(mowas_messages_to_send):>8} "
+        f"{generation_time:>8.2f}s {statistics.median(durations):>8.2f}s"
+    )
+
+
+def benchmark_geopool(
+    worker_counts: list,
+    element_count: int,
+    areas_per_element: int,
+    vertices_per_polygon: int,
+    point_count: int,
+    runs: int,
+    seed: int,
+):
+    """
+    Matches a synthetic MOWAS feed against a large watch list, both
+    serially and with a growing number of geometry workers. The results
+    of all runs are compared against the serial results
+
+    Parameters
+    ==========
+    worker_counts: 'list'
+        Numbers of geometry workers that we want to benchmark
+    element_count: 'int'
+        Number of MOWAS messages
+    areas_per_element: 'int'
+        Number of areas per MOWAS message
+    vertices_per_polygon: 'int'
+        Number of vertices per polygon
+    point_count: 'int'
+        Number of watch coordinates
+    runs: 'int'
+        Number of runs; we report the median
+    seed: 'int'
+        Seed for the feed and the watch coordinates
+
+    Returns
+    =======
+    """
+    mowas_feed_data = {
+        "TEMPEST": generate_synthetic_feed(
+            element_count=element_count,
+            areas_per_element=areas_per_element,
+            vertices_per_polygon=vertices_per_polygon,
+            seed=seed,
+        )
+    }
+    coordinates = generate_random_coordinates(count=point_count, seed=seed)
+
+    def run_scenario(geometry_pool: dict):
+        durations = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            area_match_table = build_area_match_table(
+                mowas_feed_data=mowas_feed_data,
+                coordinates=coordinates,
+                geometry_pool=geometry_pool,
+            )
+            durations.append(time.perf_counter() - start)
+        return statistics.median(durations), area_match_table
+
+    serial_time, serial_table = run_scenario(geometry_pool=None)
+    print(
+        f"{'workers':>8} {'median':>9} {'speedup':>8} {'matches':>8} {'identical':>10}"
+    )
+    print(
+        f"{'serial':>8} {serial_time:>8.2f}s {1:>7.2f}x "
+        f"{len(serial_table):>8} {'-':>10}"
+    )
+    for worker_count in worker_counts:
+        geometry_pool = create_geometry_pool(worker_count=worker_count)
+        try:
+            # Start the worker processes before we measure anything
+            run_scenario(geometry_pool=geometry_pool)
+            pool_time, pool_table = run_scenario(geometry_pool=geometry_pool)
+        finally:
+            shutdown_geometry_pool(geometry_pool=geometry_pool)
+        print(
+            f"{worker_count:>8} {pool_time:>8.2f}s {serial_time / pool_time:>7.2f}x "
+            f"{len(pool_table):>8} {str(pool_table == serial_table):>10}"
+        )
+    print(f"(CPU cores: {os.cpu_count()})")
+
+
+def generate_locator_test_coordinates(count: int, seed: int):
+    """
+    Generates the coordinates for 'locators --verify': random coordinates
+    (worldwide and in Germany) plus the edge cases of the UTM and Maidenhead
+    conversions (zone borders, Norway/Svalbard zones, equator, +/-180 deg
+    longitude, latitude limits)
+
+    Parameters
+    ==========
+    count: 'int'
+        Number of random coordinates (half worldwide, half in Germany)
+    seed: 'int'
+        Random seed
+
+    Returns
+    =======
+    latitudes: 'list'
+        Latitude values
+    longitudes: 'list'
+        Longitude values
+    """
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = germany_bbox
+    coordinates = [
+        (rng.uniform(-80, 84), rng.uniform(-180, 180)) for _ in range(count // 2)
+    ] + [
+        (rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+        for _ in range(count - count // 2)
+    ]
+
+    # UTM zone borders on both hemispheres, equator and latitude limits
+    for zone_border in range(-180, 181, 6):
+        for longitude in (zone_border - 1e-9, zone_border, zone_border + 1e-9):
+            if -180 <= longitude <= 180:
+                for latitude in (-80.0, -45.0, -1e-9, -0.0, 0.0, 1e-9, 45.0, 84.0):
+                    coordinates.append((latitude, longitude))
+
+    # Special zones for Norway and Svalbard, including their borders
+    for latitude in (55.99, 56.0, 63.99, 64.0, 71.99, 72.0, 83.99, 84.0):
+        for longitude in (
+            -0.01,
+            0.0,
+            2.99,
+            3.0,
+            8.99,
+            9.0,
+            11.99,
+            12.0,
+            20.99,
+            21.0,
+            32.99,
+            33.0,
+            41.99,
+            42.0,
+        ):
+            coordinates.append((latitude, longitude))
+
+    latitudes = [coordinate[0] for coordinate in coordinates]
+    longitudes = [coordinate[1] for coordinate in coordinates]
+    return latitudes, longitudes
+
+
+def verify_locators(count: int, seed: int):
+    """
+    Checks that the batch conversions (convert_latlon_array_to_utm,
+    convert_latlon_array_to_maidenhead) return exactly the same results
+    as the per-coordinate conversions in geodata
+
+    Parameters
+    ==========
+    count: 'int'
+        Number of random coordinates
+    seed: 'int'
+        Random seed; the same seed always produces the same coordinates
+
+    Returns
+    =======
+    mismatch_count: 'int'
+        Number of coordinates with different results
+    """
+    latitudes, longitudes = generate_locator_test_coordinates(count=count, seed=seed)
+    mismatch_count = 0
+
+    zone_numbers, zone_letters, eastings, northings = convert_latlon_array_to_utm(
+        latitudes=np.array(latitudes), longitudes=np.array(longitudes)
+    )
+    for index, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+        expected = convert_latlon_to_utm(latitude=latitude, longitude=longitude)
+        result = (
+            int(zone_numbers[index]),
+            str(zone_letters[index]),
+            int(eastings[index]),
+            int(northings[index]),
+        )
+        if result != expected:
+            mismatch_count += 1
+            if mismatch_count <= 5:
+                print(f"UTM MISMATCH {latitude}, {longitude}: {expected} / {result}")
+    print(f"UTM: {len(latitudes)} coordinates")
+
+    # Maidenhead also supports the poles and reports invalid coordinates
+    latitudes += [90.0, -90.0, 90.0, -90.0, 90.9, 91.0, -91.0, 45.0, 45.0, 45.0]
+    longitudes += [180.0, -180.0, -180.0, 180.0, 0.0, 0.0, 0.0, 180.9, 181.0, -181.0]
+    for output_precision in range(1, 7):
+        results = convert_latlon_array_to_maidenhead(
+            latitudes=np.array(latitudes),
+            longitudes=np.array(longitudes),
+            output_precision=output_precision,
+        )
+        for latitude, longitude, result in zip(latitudes, longitudes, results):
+            expected = convert_latlon_to_maidenhead(
+                latitude=latitude,
+                longitude=longitude,
+                output_precision=output_precision,
+            )
+            if result != expected:
+                mismatch_count += 1
+                if mismatch_count <= 5:
+                    print(
+                        f"MAIDENHEAD MISMATCH {latitude}, {longitude} "
+                        f"(precision {output_precision}): {expected} / {result}"
+                    )
+    print(f"Maidenhead: {len(latitudes)} coordinates, precision 1..6")
+    print(f"seed {seed}: {mismatch_count} mismatches")
+    return mismatch_count
+
+
+def benchmark_locators(point_counts: list, seed: int):
+    """
+    Converts random watch coordinates to UTM and Maidenhead, one by one
+    and with the batch conversions
+
+    Parameters
+    ==========
+    point_counts: 'list'
+        Number of watch coordinates that we want to benchmark
+    seed: 'int'
+        Random seed
+
+    Returns
+    =======
+    """
+    print(f"{'points':>8} {'scalar':>10} {'batch':>10} {'speedup':>8}")
+    for point_count in point_counts:
+        coordinates = generate_random_coordinates(count=point_count, seed=seed)
+        latitudes = np.array([coordinate[0] for coordinate in coordinates])
+        longitudes = np.array([coordinate[1] for coordinate in coordinates])
+
+        start = time.perf_counter()
+        for latitude, longitude in coordinates:
+            convert_latlon_to_utm(latitude=latitude, longitude=longitude)
+            convert_latlon_to_maidenhead(latitude=latitude, longitude=longitude)
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert_latlon_array_to_utm(latitudes=latitudes, longitudes=longitudes)
+        convert_latlon_array_to_maidenhead(latitudes=latitudes, longitudes=longitudes)
+        batch_time = time.perf_counter() - start
+        print(
+            f"{point_count:>8} {scalar_time * 1000:>8.2f}ms {batch_time * 1000:>8.2f}ms "
+            f"{scalar_time / batch_time:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay the captured MOWAS feeds through the full cycle"
+    )
+    replay_parser.add_argument(
+        "--points", nargs="+", type=int, default=[1, 10, 100, 1000]
+    )
+    replay_parser.add_argument("--scale", nargs="+", type=int, default=[1])
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="Program startup with and without the optional backends"
+    )
+    startup_parser.add_argument("--runs", type=int, default=5)
+
+    multitenant_parser = subparsers.add_parser(
+        "multitenant", help="Multi-tenant mode with synthetic subscribers"
+    )
+    multitenant_parser.add_argument(
+        "--subscribers", nargs="+", type=int, default=[10, 100, 1000, 5000]
+    )
+    multitenant_parser.add_argument("--points-per-subscriber", type=int, default=2)
+
+    dedup_parser = subparsers.add_parser(
+        "dedup", help="Duplicate checks with many areas and watch points"
+    )
+    dedup_parser.add_argument("--areas", type=int, default=1000)
+    dedup_parser.add_argument("--points", type=int, default=500)
+    dedup_parser.add_argument("--runs", type=int, default=3)
+
+    sms_parser = subparsers.add_parser(
+        "sms", help="SMS message splitting of the captured MOWAS texts"
+    )
+    sms_parser.add_argument("--max-len", nargs="+", type=int, default=[67, 160])
+    sms_parser.add_argument("--runs", type=int, default=5)
+    sms_parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare the results with the former recursive implementation",
+    )
+    sms_parser.add_argument("--cases", type=int, default=30000)
+    sms_parser.add_argument("--seed", type=int, default=0)
+
+    ascii_parser = subparsers.add_parser(
+        "ascii", help="ASCII conversion of the captured MOWAS descriptions"
+    )
+    ascii_parser.add_argument("--runs", type=int, default=15)
+
+    synthetic_parser = subparsers.add_parser(
+        "synthetic", help="Full matching cycle on a synthetic MOWAS feed"
+    )
+    synthetic_parser.add_argument("--elements", type=int, default=1000)
+    synthetic_parser.add_argument("--areas", type=int, default=5)
+    synthetic_parser.add_argument("--vertices", type=int, default=200)
+    synthetic_parser.add_argument("--points", type=int, default=1000)
+    synthetic_parser.add_argument("--runs", type=int, default=3)
+    synthetic_parser.add_argument("--seed", type=int, default=42)
+    synthetic_parser.add_argument(
+        "--output", type=str, default=None, help="Write the synthetic feed to this file"
+    )
+
+    geopool_parser = subparsers.add_parser(
+        "geopool", help="Area matching with 1..n geometry worker processes"
+    )
+    geopool_parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    geopool_parser.add_argument("--elements", type=int, default=200)
+    geopool_parser.add_argument("--areas", type=int, default=5)
+    geopool_parser.add_argument("--vertices", type=int, default=2000)
+    geopool_parser.add_argument("--points", type=int, default=20000)
+    geopool_parser.add_argument("--runs", type=int, default=3)
+    geopool_parser.add_argument("--seed", type=int, default=42)
+
+    locators_parser = subparsers.add_parser(
+        "locators", help="UTM / Maidenhead conversion of the watch coordinates"
+    )
+    locators_parser.add_argument(
+        "--points", nargs="+", type=int, default=[10, 100, 1000, 10000]
+    )
+    locators_parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Compare the batch conversions with the per-coordinate conversions",
+    )
+    locators_parser.add_argument("--cases", type=int, default=40000)
+    locators_parser.add_argument("--seed", type=int, default=7)
+
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    stub_network_enrichers()
+
+    if args.benchmark == "replay":
+        benchmark_replay(point_counts=args.points, scale_factors=args.scale)
+    elif args.benchmark == "startup":
+        benchmark_startup(runs=args.runs)
+    elif args.benchmark == "multitenant":
+        benchmark_multitenant(
+            subscriber_counts=args.subscribers,
+            points_per_subscriber=args.points_per_subscriber,
+        )
+    elif args.benchmark == "dedup":
+        benchmark_dedup(area_count=args.areas, point_count=args.points, runs=args.runs)
+    elif args.benchmark == "sms":
+        if args.verify:
+            sys.exit(1 if verify_sms(case_count=args.cases, seed=args.seed) else 0)
+        benchmark_sms(max_lengths=args.max_len, runs=args.runs)
+    elif args.benchmark == "ascii":
+        benchmark_ascii(runs=args.runs)
+    elif args.benchmark == "synthetic":
+        benchmark_synthetic(
+            element_count=args.elements,
+            areas_per_element=args.areas,
+            vertices_per_polygon=args.vertices,
+            point_count=args.points,
+            runs=args.runs,
+            seed=args.seed,
+            output_file=args.output,
+        )
+    elif args.benchmark == "geopool":
+        benchmark_geopool(
+            worker_counts=args.workers,
+            element_count=args.elements,
+            areas_per_element=args.areas,
+            vertices_per_polygon=args.vertices,
+            point_count=args.points,
+            runs=args.runs,
+            seed=args.seed,
+        )
+    elif args.benchmark == "locators":
+        if args.verify:
+            sys.exit(1 if verify_locators(count=args.cases, seed=args.seed) else 0)
+        benchmark_locators(point_counts=args.points, seed=args.seed)
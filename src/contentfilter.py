@@ -0,0 +1,182 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: content filters which suppress MOWAS messages
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# A content filter consists of 1..n rules; each rule has a list of
+# keywords (case-insensitive substrings) and/or regular expressions
+# which are checked against a set of message fields. All rules for
+# the same field are compiled into one combined regular expression,
+# so every field is scanned exactly once - regardless of the number
+# of rules. A message which matches any rule gets suppressed.
+#
+import functools
+import logging
+import re
+from typing import NamedTuple
+from metrics import increment_counter
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Message fields which can be checked by a content filter rule
+content_filter_fields = ("headline", "description", "instruction", "contact", "sender")
+
+# Fields which are checked if a rule does not specify any
+content_filter_default_fields = ("headline", "description", "instruction")
+
+
+class ContentFilterRule(NamedTuple):
+    name: str
+    keywords: tuple = ()
+    patterns: tuple = ()
+    fields: tuple = content_filter_default_fields
+
+
+# Numeric backreferences ("\1", "(?(1)...)") and inline global flags
+# ("(?i)"); neither of them survives the combination of several patterns
+numeric_backreference_pattern = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d)")
+inline_global_flags_pattern = re.compile(r"(?<!\\)(?:\\\\)*\(\?[aiLmsux]+\)")
+
+# Built-in rule; active unless the user has enabled Covid content
+covid_filter_rule = ContentFilterRule(
+    name="covid", keywords=("covid", "corona", "impfung")
+)
+
+
+@functools.lru_cache(maxsize=32)
+def compile_content_filter(content_filter_rules: tuple):
+    """
+    Compiles the content filter rules into one combined
+    regular expression per message field
+
+    Parameters
+    ==========
+    content_filter_rules: 'tuple'
+        Tuple of ContentFilterRule elements
+
+    Returns
+    =======
+    content_filter: 'dict'
+        'regex': combined regular expression per message field
+        'rule_names': rule name per regex group name
+    """
+    alternatives = {}
+    rule_names = {}
+    for rule_index, rule in enumerate(content_filter_rules):
+        expression = "|".join(
+            [re.escape(keyword) for keyword in rule.keywords] + list(rule.patterns)
+        )
+        if not expression:
+            continue
+        group_name = f"rule{rule_index}"
+        rule_names[group_name] = rule.name
+        for field in rule.fields:
+            alternatives.setdefault(field, []).append(f"(?P<{group_name}>{expression})")
+
+    regex = {
+        field: re.compile("|".join(expressions), re.IGNORECASE)
+        for field, expressions in alternatives.items()
+    }
+    return {"regex": regex, "rule_names": rule_names}
+
+
+def check_content_filter_pattern(pattern: str):
+    """
+    Checks if a user-defined regular expression can be combined with other
+    regular expressions, see compile_content_filter
+
+    Parameters
+    ==========
+    pattern: 'str'
+        The regular expression
+
+    Returns
+    =======
+    error_message: 'str'
+        Reason why the pattern cannot be used or 'None' if it is valid
+    """
+    try:
+        regex = re.compile(f"(?P<rule>{pattern})")
+    except re.error as ex:
+        return str(ex)
+    if len(regex.groupindex) > 1:
+        return "named groups are not supported"
+    if numeric_backreference_pattern.search(pattern):
+        return "numeric backreferences are not supported"
+    if inline_global_flags_pattern.search(pattern):
+        return "inline global flags are not supported"
+    return None
+
+
+def get_content_filter(
+    enable_covid_messaging: bool = False, content_filter_rules: list = None
+):
+    """
+    Returns the (compiled) content filter for a set of rules
+
+    Parameters
+    ==========
+    enable_covid_messaging: 'bool'
+        If False, the built-in Covid rule is added to the content filter
+    content_filter_rules: 'list'
+        Optional list of user-defined ContentFilterRule elements
+
+    Returns
+    =======
+    content_filter: 'dict'
+        see compile_content_filter
+    """
+    rules = [] if enable_covid_messaging else [covid_filter_rule]
+    if content_filter_rules:
+        rules.extend(content_filter_rules)
+    return compile_content_filter(tuple(rules))
+
+
+def match_content_filter(content_filter: dict, content: dict):
+    """
+    Checks a message's content against the content filter
+
+    Parameters
+    ==========
+    content_filter: 'dict'
+        see get_content_filter
+    content: 'dict'
+        Message content per message field; 'None' values are ignored
+
+    Returns
+    =======
+    rule_name: 'str'
+        Name of the first matching rule or 'None' if no rule matches
+    """
+    for field, regex in content_filter["regex"].items():
+        text = content.get(field)
+        if not text:
+            continue
+        match = regex.search(text)
+        if match:
+            rule_name = content_filter["rule_names"][match.lastgroup]
+            increment_counter("mowas_content_filter_hits_total", rule=rule_name)
+            logger.debug(msg=f"Content filter '{rule_name}' matches field '{field}'")
+            return rule_name
+    return None
+
+
+if __name__ == "__main__":
+    pass
@@ -17,10 +17,12 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-from geopy.geocoders import Nominatim
 import logging
+import math
+import numpy as np
 import utm
 import maidenhead
+from metrics import increment_counter, measure_duration
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
@@ -30,6 +32,22 @@ logger = logging.getLogger(__name__)
 # Default user agent which is used by the program for sending requests to aprs.fi
 default_user_agent = f"mowas-pwb (+https://github.com/joergschultzelutter/mowas-pwb/)"
 
+# Nominatim server (can be overridden, e.g. for a mock server)
+nominatim_scheme = "https"
+nominatim_domain = "nominatim.openstreetmap.org"
+
+# Metric CRS for all geometric operations: UTM zone 32 (northern hemisphere),
+# which is also used for all of Germany by the German authorities (EPSG:25832)
+metric_crs_zone_number = 32
+metric_crs_zone_letter = "U"
+
+# Latitude range supported by UTM
+utm_min_latitude = -80.0
+utm_max_latitude = 84.0
+
+# UTM latitude bands (8 degrees each, starting at 80 deg S; band X covers 12 degrees)
+utm_zone_letters = "CDEFGHJKLMNPQRSTUVWXX"
+
 
 def get_reverse_geopy_data(latitude: float, longitude: float, language: str = "de"):
     """
@@ -52,21 +70,28 @@ def get_reverse_geopy_data(latitude: float, longitude: float, language: str = "d
     address = city = country = country_code = county = None
     zipcode = state = street = street_number = district = None
 
+    # geopy is only imported if we need to look up an address
+    from geopy.geocoders import Nominatim
+
     # Geopy Nominatim user agent
-    geolocator = Nominatim(user_agent=default_user_agent)
+    geolocator = Nominatim(
+        user_agent=default_user_agent, domain=nominatim_domain, scheme=nominatim_scheme
+    )
 
     success = False
     try:
         # Lookup with zoom level 18 (building)
-        location = geolocator.reverse(
-            query=f"{latitude} {longitude}",
-            language=language,
-            zoom=18,
-            addressdetails=True,
-            exactly_one=True,
-        )
+        with measure_duration("mowas_geocoder_seconds"):
+            location = geolocator.reverse(
+                query=f"{latitude} {longitude}",
+                language=language,
+                zoom=18,
+                addressdetails=True,
+                exactly_one=True,
+            )
     except Exception as ex:
         location = None
+        increment_counter("mowas_geocoder_errors_total")
     if location:
         address = location.address
         if "address" in location.raw:
@@ -175,5 +200,234 @@ def convert_latlon_to_maidenhead(
     return maidenhead_coordinates
 
 
+def get_utm_zone_numbers(latitudes: np.ndarray, longitudes: np.ndarray):
+    """
+    Returns the UTM zone numbers for arrays of latitude / longitude
+    coordinates, including the special zones for Norway and Svalbard
+    (same rules as utm.latlon_to_zone_number)
+    Parameters
+    ==========
+    latitudes : 'np.ndarray'
+        Latitude values
+    longitudes : 'np.ndarray'
+        Longitude values
+    Returns
+    =======
+    zone_numbers: 'np.ndarray'
+        UTM zone number per coordinate
+    """
+    longitudes = (longitudes % 360 + 540) % 360 - 180
+    zone_numbers = ((longitudes + 180) / 6).astype(np.int64) + 1
+
+    # Special zone for Norway
+    zone_numbers[
+        (latitudes >= 56) & (latitudes < 64) & (longitudes >= 3) & (longitudes < 12)
+    ] = 32
+
+    # Special zones for Svalbard
+    svalbard = (latitudes >= 72) & (latitudes <= 84) & (longitudes >= 0)
+    for max_longitude, zone_number in ((9, 31), (21, 33), (33, 35), (42, 37)):
+        zone_mask = svalbard & (longitudes < max_longitude)
+        zone_numbers[zone_mask] = zone_number
+        svalbard &= ~zone_mask
+    return zone_numbers
+
+
+def convert_latlon_array_to_utm(latitudes, longitudes):
+    """
+    Convert arrays of latitude / longitude coordinates to UTM
+    (Universal Transverse Mercator) coordinates. Same results as
+    convert_latlon_to_utm, but each UTM zone is converted in one
+    vectorized call
+    Parameters
+    ==========
+    latitudes : 'np.ndarray'
+        Latitude values
+    longitudes : 'np.ndarray'
+        Longitude values
+    Returns
+    =======
+    zone_numbers: 'np.ndarray'
+        UTM zone number per coordinate
+    zone_letters: 'np.ndarray'
+        UTM zone letter per coordinate
+    eastings: 'np.ndarray'
+        UTM easting (int) per coordinate
+    northings: 'np.ndarray'
+        UTM northing (int) per coordinate
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    zone_numbers = get_utm_zone_numbers(latitudes=latitudes, longitudes=longitudes)
+    northern = latitudes >= 0
+    eastings = np.zeros(latitudes.shape, dtype=np.int64)
+    northings = np.zeros(latitudes.shape, dtype=np.int64)
+
+    # utm.from_latlon can only convert coordinates of the same zone and
+    # hemisphere in one call
+    for zone_number, is_northern in set(zip(zone_numbers.tolist(), northern.tolist())):
+        mask = (zone_numbers == zone_number) & (northern == is_northern)
+        zone_eastings, zone_northings, _, _ = utm.from_latlon(
+            latitudes[mask],
+            longitudes[mask],
+            force_zone_number=zone_number,
+            force_northern=is_northern,
+        )
+        # np.rint rounds half to even, just like round()
+        eastings[mask] = np.rint(zone_eastings)
+        northings[mask] = np.rint(zone_northings)
+
+    # All latitudes are within the UTM range (see utm.from_latlon)
+    zone_letters = np.array(list(utm_zone_letters))[
+        (latitudes + 80).astype(np.int64) >> 3
+    ]
+    return zone_numbers, zone_letters, eastings, northings
+
+
+def convert_latlon_array_to_maidenhead(
+    latitudes, longitudes, output_precision: int = 4
+):
+    """
+    Convert arrays of latitude / longitude coordinates to Maidenhead
+    coordinates. Same results as convert_latlon_to_maidenhead (vectorized
+    version of maidenhead.to_maiden)
+    Parameters
+    ==========
+    latitudes : 'np.ndarray'
+        Latitude values
+    longitudes : 'np.ndarray'
+        Longitude values
+    output_precision: 'int'
+        Output precision for lat/lon
+    Returns
+    =======
+    maidenhead_coordinates: 'list'
+        Maidenhead coordinates per coordinate with the specified
+        precision ('None' for invalid coordinates)
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.size == 0:
+        return []
+
+    # Mixed radix integer numbers (18 fields, 10 squares, 24 subsquares, ...)
+    radix = [18] + [24 if i % 2 else 10 for i in range(output_precision - 1)]
+    multiplier = math.prod(radix)
+    divisor = math.prod(radix[:2])
+    int_lat = np.floor((latitudes + 90) * multiplier + 0.5).astype(np.int64)
+    int_lon = np.floor(((longitudes + 180) % 360) * (multiplier // 2) + 0.5)
+    int_lat = int_lat // divisor
+    int_lon = int_lon.astype(np.int64) // divisor
+
+    # Convert both numbers digit by digit, starting with the least
+    # significant one; each pair is prefixed with its longitude digit
+    maidenhead_array = np.full(latitudes.shape, "", dtype=object)
+    for position in range(len(radix), 0, -1):
+        position_radix = radix[position - 1]
+        if position_radix == 10:
+            alphabet = "0123456789"
+        elif position == 3:
+            alphabet = "abcdefghijklmnopqrstuvwx"
+        else:
+            alphabet = "ABCDEFGHIJKLMNOPQRSTUVWX"
+        alphabet = np.array(list(alphabet), dtype=object)
+        int_lat, lat_digits = np.divmod(int_lat, position_radix)
+        int_lon, lon_digits = np.divmod(int_lon, position_radix)
+        maidenhead_array = (
+            alphabet[lon_digits] + alphabet[lat_digits] + maidenhead_array
+        )
+
+    valid = (np.abs(np.trunc(latitudes)) <= 90) & (np.abs(np.trunc(longitudes)) <= 180)
+    return [
+        maidenhead_coordinates if is_valid else None
+        for maidenhead_coordinates, is_valid in zip(
+            maidenhead_array.tolist(), valid.tolist()
+        )
+    ]
+
+
+def project_latlon_to_metric(latitudes, longitudes):
+    """
+    Projects arrays of latitude / longitude coordinates to our
+    metric CRS (see metric_crs_zone_number) in one vectorized call
+    Parameters
+    ==========
+    latitudes : 'np.ndarray'
+        Latitude values
+    longitudes : 'np.ndarray'
+        Longitude values
+    Returns
+    =======
+    eastings: 'np.ndarray'
+        Easting values in meters
+    northings: 'np.ndarray'
+        Northing values in meters
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.size == 0:
+        return latitudes.copy(), longitudes.copy()
+
+    # Coordinates outside of the UTM range are far away from any MOWAS area;
+    # we simply move them to the range's border
+    latitudes = np.clip(latitudes, utm_min_latitude, utm_max_latitude)
+    eastings, northings, _, _ = utm.from_latlon(
+        latitudes,
+        longitudes,
+        force_zone_number=metric_crs_zone_number,
+        force_zone_letter=metric_crs_zone_letter,
+    )
+    return eastings, northings
+
+
+def get_metric_scale_factors(eastings):
+    """
+    Returns the point scale factors of our metric CRS, i.e. the ratio
+    between projected and true distances at the given eastings
+    Parameters
+    ==========
+    eastings : 'np.ndarray'
+        Easting values in meters (see project_latlon_to_metric)
+    Returns
+    =======
+    scale_factors: 'np.ndarray'
+        Scale factor per easting value
+    """
+    # UTM: scale factor 0.9996 on the central meridian (easting 500km)
+    offsets = (np.asarray(eastings, dtype=np.float64) - 500000.0) / 0.9996
+    return 0.9996 * (1.0 + offsets**2 / (2 * 6371008.8**2))
+
+
+def get_distance_in_meters(
+    latitude1: float, longitude1: float, latitude2: float, longitude2: float
+):
+    """
+    Calculates the great-circle distance between two lat/lon coordinates
+    Parameters
+    ==========
+    latitude1 : 'float'
+        Latitude value of the first position
+    longitude1 : 'float'
+        Longitude value of the first position
+    latitude2 : 'float'
+        Latitude value of the second position
+    longitude2 : 'float'
+        Longitude value of the second position
+    Returns
+    =======
+    distance: 'float'
+        Distance in meters
+    """
+    lat1, lon1, lat2, lon2 = map(
+        math.radians, (latitude1, longitude1, latitude2, longitude2)
+    )
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    # mean earth radius in meters
+    return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,706 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: match watch coordinates against MOWAS area polygons
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import hashlib
+import logging
+import math
+import numpy as np
+import shapely
+from expiringdict import ExpiringDict
+from geodata import get_metric_scale_factors, project_latlon_to_metric
+from geopool import geometry_pool_min_tests, match_polygon_candidates, run_geometry_jobs
+from metrics import increment_counter
+from shapely.geometry import Polygon
+from shapely.strtree import STRtree
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Safety margin (in degrees) around the bounding box of all watch
+# coordinates; areas outside of this envelope are discarded early on
+watch_envelope_buffer = 0.01
+
+# Meters per degree of latitude (mean earth radius)
+meters_per_degree = 6371008.8 * math.pi / 180
+
+# Safety margin for the envelope of all watch zones (the radii
+# are converted to degrees with a spherical approximation)
+watch_zone_envelope_factor = 1.01
+
+# Max number of areas and their max age (in seconds) in the geocode index
+geocode_index_max_len = 10000
+geocode_index_max_age = 24 * 60 * 60
+
+
+def convert_polygon_to_latlon(polygon_string: str):
+    """
+    Converts a MOWAS polygon string to a list of lat/lon tuples
+
+    Parameters
+    ==========
+    polygon_string: 'str'
+        MOWAS polygon string; format: "lon1,lat1 lon2,lat2 ... lonn,latn"
+
+    Returns
+    =======
+    latlon_array: 'list'
+        List of (latitude, longitude) tuples
+    """
+    # fmt: off
+    # First, convert original MOWAS data to an array list
+    lonlat_array = [point.split(",") for point in polygon_string.split(" ")]
+    # and then convert it from lon/lat to lat/lon as we need that format later
+    latlon_array = [(float(val[1]), float(val[0])) for val in lonlat_array]
+    # fmt: on
+    return latlon_array
+
+
+def get_polygon_bounds(polygon_string: str):
+    """
+    Returns the bounding box of a MOWAS polygon string. Single pass over
+    the points; neither lat/lon tuples nor lists of float values are built
+
+    Parameters
+    ==========
+    polygon_string: 'str'
+        MOWAS polygon string; format: "lon1,lat1 lon2,lat2 ... lonn,latn"
+
+    Returns
+    =======
+    bounds: 'tuple'
+        (min_lat, min_lon, max_lat, max_lon) tuple
+    """
+    min_lat = min_lon = math.inf
+    max_lat = max_lon = -math.inf
+    for point in polygon_string.split():
+        longitude, _, latitude = point.partition(",")
+        latitude = float(latitude)
+        longitude = float(longitude)
+        if latitude < min_lat:
+            min_lat = latitude
+        if latitude > max_lat:
+            max_lat = latitude
+        if longitude < min_lon:
+            min_lon = longitude
+        if longitude > max_lon:
+            max_lon = longitude
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def get_watch_envelope(coordinates: list, buffer: float = watch_envelope_buffer):
+    """
+    Returns the (buffered) bounding box of all watch coordinates
+
+    Parameters
+    ==========
+    coordinates: 'list'
+        List of [latitude, longitude] coordinates
+    buffer: 'float'
+        Safety margin in degrees
+
+    Returns
+    =======
+    watch_envelope: 'tuple'
+        (min_lat, min_lon, max_lat, max_lon) tuple or 'None' if
+        there are no coordinates
+    """
+    if len(coordinates) == 0:
+        return None
+    latitudes = [coord[0] for coord in coordinates]
+    longitudes = [coord[1] for coord in coordinates]
+    return (
+        min(latitudes) - buffer,
+        min(longitudes) - buffer,
+        max(latitudes) + buffer,
+        max(longitudes) + buffer,
+    )
+
+
+def do_bounds_intersect(bounds: tuple, other_bounds: tuple):
+    """
+    Checks if two (min_lat, min_lon, max_lat, max_lon) bounding boxes intersect
+    """
+    return (
+        bounds[0] <= other_bounds[2]
+        and other_bounds[0] <= bounds[2]
+        and bounds[1] <= other_bounds[3]
+        and other_bounds[1] <= bounds[3]
+    )
+
+
+def get_watch_zone(coord: list):
+    """
+    Returns the watch zone of a watch coordinate
+
+    Parameters
+    ==========
+    coord: 'list'
+        [latitude, longitude] or [latitude, longitude, radius] coordinate;
+        the radius is in meters
+
+    Returns
+    =======
+    watch_zone: 'tuple'
+        (latitude, longitude, radius) tuple or 'None' if the
+        coordinate does not have a radius
+    """
+    if len(coord) > 2 and coord[2] > 0:
+        return coord[0], coord[1], coord[2]
+    return None
+
+
+def get_polygon_array(polygon_string: str):
+    """
+    Converts a MOWAS polygon string to a numpy array
+
+    Parameters
+    ==========
+    polygon_string: 'str'
+        MOWAS polygon string; format: "lon1,lat1 lon2,lat2 ... lonn,latn"
+
+    Returns
+    =======
+    lonlat_array: 'np.ndarray'
+        (n, 2) array of longitude / latitude values
+    """
+    return np.array(polygon_string.replace(",", " ").split(), dtype=np.float64).reshape(
+        -1, 2
+    )
+
+
+def project_polygons(polygon_strings: list):
+    """
+    Projects a list of MOWAS polygons to our metric CRS; all
+    polygons are projected in one vectorized call
+
+    Parameters
+    ==========
+    polygon_strings: 'list'
+        List of MOWAS polygon strings
+
+    Returns
+    =======
+    polygon_arrays: 'list'
+        One (n, 2) array of easting / northing values per polygon
+    """
+    if len(polygon_strings) == 0:
+        return []
+    lonlat_arrays = [
+        get_polygon_array(polygon_string) for polygon_string in polygon_strings
+    ]
+    lonlat_array = np.concatenate(lonlat_arrays)
+    eastings, northings = project_latlon_to_metric(
+        latitudes=lonlat_array[:, 1], longitudes=lonlat_array[:, 0]
+    )
+    vertex_offsets = np.cumsum([len(array) for array in lonlat_arrays])[:-1]
+    return np.split(np.column_stack((eastings, northings)), vertex_offsets)
+
+
+def project_coordinates(coordinates_array: np.ndarray):
+    """
+    Projects watch coordinates to our metric CRS
+
+    Parameters
+    ==========
+    coordinates_array: 'np.ndarray'
+        (n, 2) array of latitude / longitude values
+
+    Returns
+    =======
+    metric_array: 'np.ndarray'
+        (n, 2) array of easting / northing values
+    """
+    eastings, northings = project_latlon_to_metric(
+        latitudes=coordinates_array[:, 0], longitudes=coordinates_array[:, 1]
+    )
+    return np.column_stack((eastings, northings))
+
+
+def create_watch_zone_index(coordinates: list):
+    """
+    Creates a spatial index of the centers of all watch zones. The
+    centers and radii are converted to our metric CRS
+
+    Parameters
+    ==========
+    coordinates: 'list'
+        List of [latitude, longitude] and [latitude, longitude, radius]
+        coordinates. Coordinates without a radius are ignored
+
+    Returns
+    =======
+    watch_zone_index: 'dict'
+        The watch zone index or 'None' if there are no watch zones
+    """
+    watch_zones = list(
+        dict.fromkeys(
+            watch_zone
+            for watch_zone in map(get_watch_zone, coordinates)
+            if watch_zone is not None
+        )
+    )
+    if len(watch_zones) == 0:
+        return None
+
+    zone_array = np.array(watch_zones, dtype=np.float64)
+    latitudes, longitudes, radii = zone_array[:, 0], zone_array[:, 1], zone_array[:, 2]
+    eastings, northings = project_latlon_to_metric(
+        latitudes=latitudes, longitudes=longitudes
+    )
+    # Projected distances differ slightly from true distances
+    metric_radii = radii * get_metric_scale_factors(eastings)
+    zone_centers = shapely.points(eastings, northings)
+
+    # Envelope (latitude / longitude) of all zones; used for
+    # discarding far away areas before their polygons are projected
+    lat_radii = radii * watch_zone_envelope_factor / meters_per_degree
+    lon_radii = lat_radii / np.cos(np.radians(np.clip(latitudes, -89.0, 89.0)))
+    return {
+        "zones": watch_zones,
+        "centers": zone_centers,
+        "radii": metric_radii,
+        "tree": STRtree(zone_centers),
+        "envelope": (
+            float((latitudes - lat_radii).min()),
+            float((longitudes - lon_radii).min()),
+            float((latitudes + lat_radii).max()),
+            float((longitudes + lon_radii).max()),
+        ),
+    }
+
+
+def get_zone_matching_coordinates(polygon_array: np.ndarray, watch_zone_index: dict):
+    """
+    Returns all watch zones which intersect with a MOWAS polygon, i.e.
+    whose center is located within the zone's radius of the polygon
+
+    Parameters
+    ==========
+    polygon_array: 'np.ndarray'
+        The area's polygon in our metric CRS, see project_polygons
+    watch_zone_index: 'dict'
+        Watch zone index, see create_watch_zone_index
+
+    Returns
+    =======
+    matching_zones: 'list'
+        (latitude, longitude, radius) tuples of all matching
+        watch zones in index order
+    """
+    try:
+        poly = Polygon(polygon_array)
+        # Pre-select all zones within the largest radius, then
+        # compare their exact distances with their own radii
+        zone_indices = np.sort(
+            watch_zone_index["tree"].query(
+                poly,
+                predicate="dwithin",
+                distance=float(watch_zone_index["radii"].max()),
+            )
+        )
+        distances = shapely.distance(poly, watch_zone_index["centers"][zone_indices])
+    except Exception as ex:
+        logger.info(msg=f"Cannot match watch zones against polygon: {ex}")
+        return []
+    return [
+        watch_zone_index["zones"][index]
+        for index in zone_indices[distances <= watch_zone_index["radii"][zone_indices]]
+    ]
+
+
+def get_warncell_ids(geocode_value: str):
+    """
+    Returns the DWD warncell IDs which may represent a MOWAS geocode.
+    MOWAS uses 12-digit regional keys (ARS) whereas the DWD uses the
+    9-digit warncell IDs ("1" + district key, "8" + municipality key)
+
+    Parameters
+    ==========
+    geocode_value: 'str'
+        MOWAS geocode value, e.g. "031530000000"
+
+    Returns
+    =======
+    warncell_ids: 'list'
+        List of possible warncell IDs (including the original value)
+    """
+    warncell_ids = [geocode_value]
+    if len(geocode_value) == 12 and geocode_value.isdigit():
+        warncell_ids.append("1" + geocode_value[:5] + "000")
+        warncell_ids.append("8" + geocode_value[:5] + geocode_value[9:])
+    return warncell_ids
+
+
+def create_geocode_index(warncell_data=None):
+    """
+    Creates an (empty) index which maps MOWAS areas with geocodes to the
+    watch coordinates located in these areas. The index is filled while
+    the program is running and gets reset whenever the set of watch
+    coordinates changes.
+
+    MOWAS uses the same geocode for a whole district and for any of its
+    parts (e.g. "Kreis Harz" vs. "Kreis Harz - Bergland (Oberharz)").
+    Therefore, each entry is keyed by the area's geocodes AND a
+    fingerprint of its polygon.
+
+    Next to the index, a memo of the exact polygon tests is kept for
+    all areas (with or without geocodes): polygon fingerprint -> polygon
+    bounding box and inside/outside result per watch point. The memo is
+    not reset if the watch coordinates change; only the new watch points
+    need to be tested. It shares the index's size and age limits.
+
+    Parameters
+    ==========
+    warncell_data: 'WarncellStore'
+        warncell data, see warncell.read_warncell_info. If present, only
+        areas whose geocodes are known warncells are added to the index.
+
+    Returns
+    =======
+    geocode_index: 'dict'
+        The geocode index
+    """
+    return {
+        "coordinates": None,
+        "warncell_data": warncell_data,
+        "known_geocodes": {},
+        "areas": ExpiringDict(
+            max_len=geocode_index_max_len, max_age_seconds=geocode_index_max_age
+        ),
+        "polygons": ExpiringDict(
+            max_len=geocode_index_max_len, max_age_seconds=geocode_index_max_age
+        ),
+    }
+
+
+def prepare_geocode_index(geocode_index: dict, coordinates: list):
+    """
+    Resets the geocode index in case the watch coordinates have changed
+    since the index was filled (e.g. because of follow-the-ham). The
+    polygon memo is kept; it is still valid for all unchanged watch points.
+    Results for watch points that are no longer in use are dropped so
+    that the memo does not grow with every position change
+
+    Parameters
+    ==========
+    geocode_index: 'dict'
+        The geocode index, see create_geocode_index
+    coordinates: 'list'
+        List of [latitude, longitude] coordinates that we want to check
+
+    Returns
+    =======
+    """
+    coordinate_set = frozenset((coord[0], coord[1]) for coord in coordinates)
+    if coordinate_set != geocode_index["coordinates"]:
+        if geocode_index["coordinates"] is not None:
+            logger.debug(msg="Watch coordinates have changed; resetting geocode index")
+        geocode_index["coordinates"] = coordinate_set
+        geocode_index["areas"].clear()
+        for memo_entry in geocode_index["polygons"].values():
+            points = memo_entry["points"]
+            for point in [point for point in points if point not in coordinate_set]:
+                del points[point]
+
+
+def get_geocode_index_key(area: dict, geocode_index: dict):
+    """
+    Returns the geocode index key for a MOWAS area
+
+    Parameters
+    ==========
+    area: 'dict'
+        MOWAS area
+    geocode_index: 'dict'
+        The geocode index, see create_geocode_index
+
+    Returns
+    =======
+    key: 'tuple'
+        (geocodes, polygon fingerprint) tuple or 'None' if the area
+        does not carry any (known) geocodes
+    """
+    geocodes = tuple(sorted(geocode["value"] for geocode in area.get("geocode", [])))
+    if len(geocodes) == 0:
+        return None
+
+    warncell_data = geocode_index["warncell_data"]
+    if warncell_data:
+        known_geocodes = geocode_index["known_geocodes"]
+        for geocode_value in geocodes:
+            if geocode_value not in known_geocodes:
+                known_geocodes[geocode_value] = any(
+                    warncell_id in warncell_data
+                    for warncell_id in get_warncell_ids(geocode_value)
+                )
+            if not known_geocodes[geocode_value]:
+                return None
+
+    return geocodes, get_polygon_fingerprint(area["polygon"][0])
+
+
+def get_polygon_fingerprint(polygon_string: str):
+    """
+    Returns the fingerprint (content hash) of a MOWAS polygon
+
+    Parameters
+    ==========
+    polygon_string: 'str'
+        MOWAS polygon string
+
+    Returns
+    =======
+    fingerprint: 'bytes'
+        16 byte polygon fingerprint
+    """
+    return hashlib.blake2b(polygon_string.encode("utf-8"), digest_size=16).digest()
+
+
+def create_polygon_memo_entry(polygon_string: str):
+    """
+    Creates an (empty) polygon memo entry for a polygon
+
+    Parameters
+    ==========
+    polygon_string: 'str'
+        MOWAS polygon string
+
+    Returns
+    =======
+    memo_entry: 'dict'
+        Polygon bounding box and (empty) inside/outside results
+        per (latitude, longitude) watch point
+    """
+    return {"bounds": get_polygon_bounds(polygon_string), "points": {}}
+
+
+def build_area_match_table(
+    mowas_feed_data: dict,
+    coordinates: list,
+    geocode_index: dict = None,
+    geometry_pool: dict = None,
+):
+    """
+    Matches a (potentially large) set of coordinates against all areas
+    of all MOWAS messages. Every polygon is built only once, regardless
+    of the number of users who are interested in that area.
+
+    Parameters
+    ==========
+    mowas_feed_data: 'dict'
+        MOWAS data, see mowas.get_mowas_feed_data
+    coordinates: 'list'
+        List of [latitude, longitude] coordinates that we want to check.
+        Watch zones are given as [latitude, longitude, radius] coordinates
+    geocode_index: 'dict'
+        Optional geocode index, see create_geocode_index
+    geometry_pool: 'dict'
+        Optional geometry worker pool, see geopool.create_geometry_pool.
+        If present, the exact polygon tests of large workloads are
+        distributed across the pool's worker processes
+
+    Returns
+    =======
+    area_match_table: 'dict'
+        Key: (MOWAS category, MOWAS identifier, area index) tuple
+        Value: set of (latitude, longitude) tuples which are located
+        in that area plus the (latitude, longitude, radius) tuples of
+        all watch zones which intersect with it. Areas without any
+        matches are not part of the table
+    """
+    area_match_table = {}
+
+    # Remove all duplicate coordinates
+    unique_coordinates = list(
+        dict.fromkeys((coord[0], coord[1]) for coord in coordinates)
+    )
+    if len(unique_coordinates) == 0:
+        return area_match_table
+    coordinates_array = np.array(unique_coordinates, dtype=np.float64)
+    watch_envelope = get_watch_envelope(coordinates=unique_coordinates)
+    watch_zone_index = create_watch_zone_index(coordinates=coordinates)
+    if geocode_index is not None:
+        prepare_geocode_index(
+            geocode_index=geocode_index, coordinates=unique_coordinates
+        )
+
+    # First, collect all areas and the polygon tests which are required
+    areas = []
+    jobs = []
+    zone_jobs = []
+    scheduled_memo_entries = set()
+    for mowas_category in mowas_feed_data:
+        for element in mowas_feed_data[mowas_category]:
+            if len(element["info"]) == 0:
+                continue
+            mowas_identifier = element["identifier"]
+            for area_index, area in enumerate(element["info"][0]["area"]):
+                key = (mowas_category, mowas_identifier, area_index)
+                polygon_string = area["polygon"][0]
+
+                # Do we already know this area (and its polygon)?
+                matched = None
+                index_key = None
+                memo_entry = None
+                if geocode_index is not None:
+                    index_key = get_geocode_index_key(
+                        area=area, geocode_index=geocode_index
+                    )
+                    if index_key is not None:
+                        matched = geocode_index["areas"].get(index_key)
+                        increment_counter(
+                            "mowas_geocode_index_lookups_total",
+                            result="miss" if matched is None else "hit",
+                        )
+                    fingerprint = (
+                        index_key[1]
+                        if index_key
+                        else get_polygon_fingerprint(polygon_string)
+                    )
+                    memo_entry = geocode_index["polygons"].get(fingerprint)
+                    if matched is None:
+                        increment_counter(
+                            "mowas_polygon_memo_lookups_total",
+                            result="miss" if memo_entry is None else "hit",
+                        )
+                    if memo_entry is None:
+                        memo_entry = create_polygon_memo_entry(
+                            polygon_string=polygon_string
+                        )
+                        geocode_index["polygons"][fingerprint] = memo_entry
+                else:
+                    memo_entry = create_polygon_memo_entry(
+                        polygon_string=polygon_string
+                    )
+
+                # Watch zones are matched via their own index
+                if watch_zone_index is not None and do_bounds_intersect(
+                    memo_entry["bounds"], watch_zone_index["envelope"]
+                ):
+                    zone_jobs.append((key, polygon_string))
+
+                if matched is not None:
+                    if matched:
+                        area_match_table[key] = set(matched)
+                    continue
+
+                # Discard areas outside of the envelope of all coordinates and
+                # pre-select all coordinates within the polygon's bounding box
+                if not do_bounds_intersect(memo_entry["bounds"], watch_envelope):
+                    if index_key is not None:
+                        geocode_index["areas"][index_key] = frozenset()
+                    continue
+                min_lat, min_lon, max_lat, max_lon = memo_entry["bounds"]
+                candidates = np.flatnonzero(
+                    (coordinates_array[:, 0] >= min_lat)
+                    & (coordinates_array[:, 0] <= max_lat)
+                    & (coordinates_array[:, 1] >= min_lon)
+                    & (coordinates_array[:, 1] <= max_lon)
+                )
+                points = memo_entry["points"]
+                areas.append((key, index_key, candidates, points))
+
+                # Identical polygons share their memo entry and only
+                # need to be tested once per cycle
+                if id(points) in scheduled_memo_entries:
+                    continue
+                scheduled_memo_entries.add(id(points))
+                unknown_candidates = candidates
+                if points:
+                    unknown_candidates = np.array(
+                        [
+                            index
+                            for index in candidates
+                            if unique_coordinates[index] not in points
+                        ],
+                        dtype=np.int64,
+                    )
+                if len(unknown_candidates) > 0:
+                    jobs.append((polygon_string, unknown_candidates, points))
+
+    # Project all polygons that we need to test and our coordinates
+    # to our metric CRS (one call each)
+    polygon_strings = list(
+        dict.fromkeys(
+            [job[0] for job in jobs] + [zone_job[1] for zone_job in zone_jobs]
+        )
+    )
+    polygon_arrays = dict(
+        zip(polygon_strings, project_polygons(polygon_strings=polygon_strings))
+    )
+    metric_array = project_coordinates(coordinates_array=coordinates_array)
+
+    # Then run the polygon tests, either here or in the geometry pool
+    for polygon_string, _, _ in jobs:
+        increment_counter(
+            "mowas_polygon_vertices_total", len(polygon_arrays[polygon_string])
+        )
+    test_count = sum(len(job[1]) for job in jobs)
+    if geometry_pool is not None and test_count >= geometry_pool_min_tests:
+        job_results = run_geometry_jobs(
+            geometry_pool=geometry_pool,
+            polygon_arrays=[polygon_arrays[job[0]] for job in jobs],
+            candidate_lists=[job[1] for job in jobs],
+            coordinates_array=metric_array,
+        )
+    else:
+        job_results = [
+            match_polygon_candidates(
+                polygon_array=polygon_arrays[polygon_string],
+                coordinates_array=metric_array,
+                candidates=candidates,
+            )
+            for polygon_string, candidates, _ in jobs
+        ]
+
+    # Add the results to the polygon memo
+    for (_, candidates, points), matching_indices in zip(jobs, job_results):
+        for index in candidates:
+            points[unique_coordinates[index]] = False
+        for index in matching_indices:
+            points[unique_coordinates[index]] = True
+
+    # and merge them in feed order
+    for key, index_key, candidates, points in areas:
+        matching_coordinates = [
+            unique_coordinates[index]
+            for index in candidates
+            if points[unique_coordinates[index]]
+        ]
+        if index_key is not None:
+            geocode_index["areas"][index_key] = frozenset(matching_coordinates)
+        if matching_coordinates:
+            area_match_table[key] = set(matching_coordinates)
+
+    # Finally, add the watch zones
+    for key, polygon_string in zone_jobs:
+        matching_zones = get_zone_matching_coordinates(
+            polygon_array=polygon_arrays[polygon_string],
+            watch_zone_index=watch_zone_index,
+        )
+        if matching_zones:
+            area_match_table.setdefault(key, set()).update(matching_zones)
+
+    return area_match_table
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,350 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: optional worker pool for the exact point-in-polygon tests
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Each job consists of one MOWAS area polygon and the watch coordinates
+# within that polygon's bounding box. The jobs of a polling cycle are
+# written to shared memory blocks (polygon vertices, watch coordinates,
+# candidate indices and a job table) and then split into contiguous
+# shards of similar cost. The workers attach to the shared memory
+# blocks, build their polygons from the coordinate buffers and return
+# the indices of the matching coordinates. No Shapely objects are
+# pickled; the shard results are merged in job order, so the outcome
+# is identical to serial mode.
+#
+import logging
+import multiprocessing
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from shapely.geometry import Polygon
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Min. number of point-in-polygon tests per cycle for which the pool
+# gets used. Smaller workloads are processed in the calling thread
+geometry_pool_min_tests = 1000
+
+# Number of shards per worker; more shards give a better load balance
+# if a few polygons are much more expensive than the others
+geometry_pool_shards_per_worker = 4
+
+
+def create_geometry_pool(worker_count: int):
+    """
+    Creates the geometry worker pool. The worker processes are
+    started on demand (and then kept alive)
+
+    Parameters
+    ==========
+    worker_count: 'int'
+        Number of worker processes
+
+    Returns
+    =======
+    geometry_pool: 'dict'
+        The geometry pool
+    """
+    # "spawn" rather than "fork" as the pool is shared by the
+    # scheduler's threads
+    executor = ProcessPoolExecutor(
+        max_workers=worker_count, mp_context=multiprocessing.get_context("spawn")
+    )
+    logger.debug(msg=f"Created geometry pool with {worker_count} worker(s)")
+    return {"executor": executor, "worker_count": worker_count}
+
+
+def shutdown_geometry_pool(geometry_pool: dict):
+    """
+    Terminates the worker processes of a geometry pool
+
+    Parameters
+    ==========
+    geometry_pool: 'dict'
+        The geometry pool, see create_geometry_pool
+
+    Returns
+    =======
+    """
+    geometry_pool["executor"].shutdown(wait=True, cancel_futures=True)
+
+
+def create_shared_array(array: np.ndarray):
+    """
+    Copies a numpy array to a new shared memory block
+
+    Parameters
+    ==========
+    array: 'np.ndarray'
+        The array that is to be shared
+
+    Returns
+    =======
+    shm: 'SharedMemory'
+        The shared memory block (needs to be closed and unlinked by the caller)
+    descriptor: 'tuple'
+        (block name, shape, dtype) tuple for attach_shared_array
+    """
+    # Zero-sized blocks are not supported
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_shared_array(descriptor: tuple):
+    """
+    Attaches to a shared memory block which was created by create_shared_array
+
+    Parameters
+    ==========
+    descriptor: 'tuple'
+        (block name, shape, dtype) tuple
+
+    Returns
+    =======
+    shm: 'SharedMemory'
+        The shared memory block (needs to be closed by the caller)
+    array: 'np.ndarray'
+        Array view on the shared memory block
+    """
+    name, shape, dtype = descriptor
+    # The block is owned (and unlinked) by the parent process. The pool's
+    # workers share the parent's resource tracker, so attaching does not
+    # cause any additional cleanup (Python 3.13+ skips the tracker anyway)
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def match_polygon_candidates(
+    polygon_array: np.ndarray, coordinates_array: np.ndarray, candidates: np.ndarray
+):
+    """
+    Returns all candidate coordinates which are either inside of
+    the polygon or touch its borders. Used by the workers and
+    by geomatch.build_area_match_table (serial mode)
+
+    Parameters
+    ==========
+    polygon_array: 'np.ndarray'
+        The area's polygon as (n, 2) array of projected coordinates
+    coordinates_array: 'np.ndarray'
+        All watch coordinates as (n, 2) array of projected coordinates
+    candidates: 'np.ndarray'
+        Indices of the coordinates that we want to check
+
+    Returns
+    =======
+    matching_indices: 'np.ndarray'
+        Indices of all matching coordinates in the order of 'candidates'
+    """
+    try:
+        poly = Polygon(polygon_array)
+        shapely.prepare(poly)
+        mask = shapely.intersects_xy(
+            poly,
+            coordinates_array[candidates, 0],
+            coordinates_array[candidates, 1],
+        )
+        return candidates[mask]
+    except Exception as ex:
+        logger.info(msg=f"Cannot match coordinates against polygon: {ex}")
+        return candidates[:0]
+
+
+def run_geometry_shard(
+    job_descriptor: tuple,
+    vertex_descriptor: tuple,
+    coordinate_descriptor: tuple,
+    candidate_descriptor: tuple,
+    first_job: int,
+    last_job: int,
+):
+    """
+    Worker function: runs the jobs first_job..last_job-1
+
+    Parameters
+    ==========
+    job_descriptor: 'tuple'
+        Shared job table; one (vertex start, vertex end, candidate start,
+        candidate end) row per job
+    vertex_descriptor: 'tuple'
+        Shared polygon vertices (all jobs)
+    coordinate_descriptor: 'tuple'
+        Shared watch coordinates
+    candidate_descriptor: 'tuple'
+        Shared candidate indices (all jobs)
+    first_job: 'int'
+        First job of this shard
+    last_job: 'int'
+        Last job of this shard (exclusive)
+
+    Returns
+    =======
+    shard_results: 'list'
+        One array of matching coordinate indices per job
+    """
+    blocks = []
+    try:
+        arrays = []
+        for descriptor in (
+            job_descriptor,
+            vertex_descriptor,
+            coordinate_descriptor,
+            candidate_descriptor,
+        ):
+            shm, array = attach_shared_array(descriptor)
+            blocks.append(shm)
+            arrays.append(array)
+        job_table, vertices, coordinates_array, candidate_indices = arrays
+
+        shard_results = []
+        for vertex_start, vertex_end, candidate_start, candidate_end in job_table[
+            first_job:last_job
+        ]:
+            # Copy the results; the shared memory goes away after this shard
+            shard_results.append(
+                match_polygon_candidates(
+                    polygon_array=vertices[vertex_start:vertex_end],
+                    coordinates_array=coordinates_array,
+                    candidates=candidate_indices[candidate_start:candidate_end],
+                ).copy()
+            )
+        # Release our array views before closing the blocks
+        del arrays, job_table, vertices, coordinates_array, candidate_indices
+        return shard_results
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+def get_shard_boundaries(job_costs: np.ndarray, shard_count: int):
+    """
+    Splits a list of jobs into contiguous shards of similar cost
+
+    Parameters
+    ==========
+    job_costs: 'np.ndarray'
+        Estimated cost per job
+    shard_count: 'int'
+        Max. number of shards
+
+    Returns
+    =======
+    boundaries: 'list'
+        List of (first job, last job (exclusive)) tuples
+    """
+    cumulative_costs = np.cumsum(job_costs, dtype=np.float64)
+    targets = cumulative_costs[-1] * np.arange(1, shard_count) / shard_count
+    split_points = np.unique(
+        np.searchsorted(cumulative_costs, targets, side="right")
+    ).tolist()
+    edges = [0] + [point for point in split_points if 0 < point < len(job_costs)]
+    edges.append(len(job_costs))
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def run_geometry_jobs(
+    geometry_pool: dict,
+    polygon_arrays: list,
+    candidate_lists: list,
+    coordinates_array: np.ndarray,
+):
+    """
+    Runs the point-in-polygon tests for a list of jobs in the
+    geometry pool
+
+    Parameters
+    ==========
+    geometry_pool: 'dict'
+        The geometry pool, see create_geometry_pool
+    polygon_arrays: 'list'
+        One (n, 2) array of projected coordinates per job, see
+        geomatch.project_polygons
+    candidate_lists: 'list'
+        One array of candidate coordinate indices per job
+    coordinates_array: 'np.ndarray'
+        All watch coordinates as (n, 2) array of projected coordinates
+
+    Returns
+    =======
+    job_results: 'list'
+        One array of matching coordinate indices per job, in job order
+    """
+    if len(polygon_arrays) == 0:
+        return []
+
+    vertex_counts = np.array([len(array) for array in polygon_arrays], np.int64)
+    candidate_counts = np.array([len(array) for array in candidate_lists], np.int64)
+    vertex_ends = np.cumsum(vertex_counts)
+    candidate_ends = np.cumsum(candidate_counts)
+    job_table = np.column_stack(
+        (
+            vertex_ends - vertex_counts,
+            vertex_ends,
+            candidate_ends - candidate_counts,
+            candidate_ends,
+        )
+    )
+
+    # Building and preparing a polygon is linear in its vertices,
+    # each test is roughly logarithmic
+    job_costs = vertex_counts + candidate_counts * np.log2(vertex_counts + 2)
+    boundaries = get_shard_boundaries(
+        job_costs=job_costs,
+        shard_count=geometry_pool["worker_count"] * geometry_pool_shards_per_worker,
+    )
+
+    blocks = []
+    try:
+        descriptors = []
+        for array in (
+            job_table,
+            np.concatenate(polygon_arrays).astype(np.float64, copy=False),
+            np.ascontiguousarray(coordinates_array, dtype=np.float64),
+            np.concatenate(candidate_lists).astype(np.int64, copy=False),
+        ):
+            shm, descriptor = create_shared_array(array)
+            blocks.append(shm)
+            descriptors.append(descriptor)
+
+        futures = [
+            geometry_pool["executor"].submit(
+                run_geometry_shard, *descriptors, first_job, last_job
+            )
+            for first_job, last_job in boundaries
+        ]
+        # Deterministic merge: shards are contiguous and collected in order
+        job_results = []
+        for future in futures:
+            job_results.extend(future.result())
+        return job_results
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == "__main__":
+    pass
@@ -26,7 +26,7 @@ import re
 import datetime
 
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
 )
 logger = logging.getLogger(__name__)
 
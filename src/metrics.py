@@ -0,0 +1,326 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: per-cycle and per-stage metrics
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# All modules record their counters and durations in one process-wide
+# registry. The metrics can be exposed in two ways:
+#
+# - Prometheus text format via a small HTTP endpoint (--metrics-port)
+# - one JSON line per polling cycle, written to a rotating file
+#   (--metrics-file); each line contains that cycle's metric deltas
+#
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Max size of a metrics file and number of rotated files that we keep
+metrics_file_max_bytes = 10 * 1024 * 1024
+metrics_file_backup_count = 5
+
+# Registry lock; metrics are recorded from the scheduler's worker threads
+metrics_lock = threading.Lock()
+
+# Metric values; key: (metric name, labels tuple)
+metrics_values = {}
+
+# Metric types (counter, gauge, summary) per metric name
+metrics_types = {}
+
+# Currently running polling cycle (if any)
+metrics_cycle = {"cycle_id": 0, "start": None, "snapshot": None, "categories": None}
+
+# Logger for the JSON lines file; 'None' if disabled
+metrics_file_logger = None
+
+
+def get_metric_key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment_counter(name: str, value: float = 1, **labels):
+    """
+    Increments a counter metric
+
+    Parameters
+    ==========
+    name: 'str'
+        Metric name, e.g. "mowas_fetch_bytes_total"
+    value: 'float'
+        Value that we want to add to the counter
+    labels: 'dict'
+        Optional metric labels, e.g. category="TEMPEST"
+
+    Returns
+    =======
+    """
+    key = get_metric_key(name, labels)
+    with metrics_lock:
+        metrics_types.setdefault(name, "counter")
+        metrics_values[key] = metrics_values.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """
+    Sets a gauge metric
+
+    Parameters
+    ==========
+    name: 'str'
+        Metric name
+    value: 'float'
+        New value of the gauge
+    labels: 'dict'
+        Optional metric labels
+
+    Returns
+    =======
+    """
+    key = get_metric_key(name, labels)
+    with metrics_lock:
+        metrics_types.setdefault(name, "gauge")
+        metrics_values[key] = value
+
+
+def observe_duration(name: str, seconds: float, **labels):
+    """
+    Records a duration; exposed as '<name>_sum' and '<name>_count'
+
+    Parameters
+    ==========
+    name: 'str'
+        Metric name, e.g. "mowas_render_seconds"
+    seconds: 'float'
+        Duration in seconds
+    labels: 'dict'
+        Optional metric labels
+
+    Returns
+    =======
+    """
+    sum_key = get_metric_key(f"{name}_sum", labels)
+    count_key = get_metric_key(f"{name}_count", labels)
+    with metrics_lock:
+        metrics_types.setdefault(name, "summary")
+        metrics_values[sum_key] = metrics_values.get(sum_key, 0) + seconds
+        metrics_values[count_key] = metrics_values.get(count_key, 0) + 1
+
+
+@contextmanager
+def measure_duration(name: str, **labels):
+    """
+    Context manager which records the duration of its block,
+    see observe_duration
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_duration(name, time.perf_counter() - start, **labels)
+
+
+def start_cycle(mowas_categories: list):
+    """
+    Marks the start of a polling cycle
+
+    Parameters
+    ==========
+    mowas_categories: 'list'
+        MOWAS categories which are processed in this cycle
+
+    Returns
+    =======
+    cycle_id: 'int'
+        Unique (per process) ID of this cycle
+    """
+    with metrics_lock:
+        metrics_cycle["cycle_id"] += 1
+        metrics_cycle["start"] = time.perf_counter()
+        metrics_cycle["categories"] = list(mowas_categories)
+        metrics_cycle["snapshot"] = (
+            dict(metrics_values) if metrics_file_logger else None
+        )
+        return metrics_cycle["cycle_id"]
+
+
+def finish_cycle(got_alert_or_update: bool = False):
+    """
+    Marks the end of the current polling cycle and writes the cycle's
+    metrics to the metrics file (if enabled)
+
+    Parameters
+    ==========
+    got_alert_or_update: 'bool'
+        True if the cycle has sent at least one Alert or Update message
+
+    Returns
+    =======
+    """
+    if metrics_cycle["start"] is None:
+        return
+    duration = time.perf_counter() - metrics_cycle["start"]
+    categories = metrics_cycle["categories"]
+    observe_duration("mowas_cycle_seconds", duration)
+    set_gauge("mowas_last_cycle_seconds", duration)
+    set_gauge("mowas_last_cycle_timestamp_seconds", time.time())
+
+    with metrics_lock:
+        snapshot = metrics_cycle["snapshot"]
+        metrics_cycle["start"] = metrics_cycle["snapshot"] = None
+        if metrics_file_logger is None or snapshot is None:
+            return
+        cycle_metrics = {}
+        for key, value in metrics_values.items():
+            delta = value - snapshot.get(key, 0)
+            if delta and metrics_types.get(key[0]) != "gauge":
+                cycle_metrics[format_metric_name(*key)] = delta
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "cycle_id": metrics_cycle["cycle_id"],
+            "categories": categories,
+            "duration": round(duration, 6),
+            "got_alert_or_update": got_alert_or_update,
+            "metrics": cycle_metrics,
+        }
+    metrics_file_logger.info(json.dumps(record))
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metric_name(name: str, labels: tuple):
+    if not labels:
+        return name
+    label_string = ",".join(
+        f'{label}="{escape_label_value(value)}"' for label, value in labels
+    )
+    return f"{name}{{{label_string}}}"
+
+
+def format_prometheus_metrics():
+    """
+    Returns all metrics in Prometheus' text exposition format
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    metrics_text: 'str'
+        Metrics in Prometheus' text format
+    """
+    with metrics_lock:
+        values = sorted(
+            metrics_values.items(), key=lambda item: (item[0][0], str(item[0][1]))
+        )
+        types = dict(metrics_types)
+
+    lines = []
+    type_written = set()
+    for (name, labels), value in values:
+        base_name = name
+        if name not in types:
+            base_name = name.rsplit("_", 1)[0]
+        if base_name not in type_written:
+            lines.append(f"# TYPE {base_name} {types.get(base_name, 'untyped')}")
+            type_written.add(base_name)
+        lines.append(f"{format_metric_name(name, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        content = format_prometheus_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug(msg=f"Metrics request from {self.address_string()}")
+
+
+def start_metrics_server(port: int, address: str = ""):
+    """
+    Starts the Prometheus metrics endpoint in a background thread
+
+    Parameters
+    ==========
+    port: 'int'
+        TCP port of the metrics endpoint
+    address: 'str'
+        Address that the endpoint binds to (default: all interfaces)
+
+    Returns
+    =======
+    metrics_server: 'ThreadingHTTPServer'
+        The metrics server
+    """
+    metrics_server = ThreadingHTTPServer((address, port), MetricsRequestHandler)
+    metrics_server.daemon_threads = True
+    threading.Thread(
+        target=metrics_server.serve_forever, name="metrics_server", daemon=True
+    ).start()
+    logger.info(msg=f"Serving metrics on port {port}")
+    return metrics_server
+
+
+def enable_metrics_file(file_name: str):
+    """
+    Enables the per-cycle JSON lines metrics file
+
+    Parameters
+    ==========
+    file_name: 'str'
+        Name of the metrics file; the file gets rotated once
+        it reaches 'metrics_file_max_bytes'
+
+    Returns
+    =======
+    """
+    global metrics_file_logger
+
+    handler = logging.handlers.RotatingFileHandler(
+        filename=file_name,
+        maxBytes=metrics_file_max_bytes,
+        backupCount=metrics_file_backup_count,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    file_logger = logging.getLogger(f"{__name__}.file")
+    file_logger.setLevel(logging.INFO)
+    file_logger.propagate = False
+    file_logger.addHandler(handler)
+    metrics_file_logger = file_logger
+
+
+if __name__ == "__main__":
+    pass
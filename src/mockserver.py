@@ -0,0 +1,563 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: local stand-in server for MOWAS, aprs.fi, Nominatim, DWD and deepl.com
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The mock server serves the MOWAS captures from the 'demo_data' directory
+# at their real warnung.bund.de paths and mocks the aprs.fi, Nominatim,
+# DWD warncell and deepl.com endpoints. Start mowas-pwb with
+# '--base-url http://<host>:<port>' and all of its requests go to this
+# server, which allows for long-running soak and throughput tests of the
+# full program cycle without any access to the real services.
+#
+# Usage: python mockserver.py --port 8080 --latency 0.2 --error-rate 0.05
+#        python mowas-pwb.py --base-url http://127.0.0.1:8080 ...
+#
+import argparse
+import hashlib
+import http.server
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime
+import aprsdotfi
+import geodata
+import mowas
+import translate
+import warncell
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Paths of the mocked services (relative to the mock server's base URL)
+mock_aprsdotfi_path = "/api/get"
+mock_nominatim_path = "/nominatim"
+mock_warncell_path = "/warncell/cap_warncellids_csv.csv"
+# The deepl.com client ignores the path of its server URL
+mock_deepl_path = ""
+
+# MOWAS categories and the file name prefix of their captures in 'demo_data'
+# Categories without captures return an empty feed
+mock_capture_prefixes = {
+    "TEMPEST": "unwetter",
+    "FLOOD": "hochwassermeldungen",
+    "DISASTERS": "gefahrendurchsagen",
+}
+
+# Default directory for the MOWAS captures
+mock_demo_data_directory = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "demo_data"
+)
+
+# Area around which the mocked APRS positions are located (lat, lon, degrees)
+mock_aprs_center = (51.82, 9.51)
+mock_aprs_spread = 0.2
+
+# Response for failed requests which still return HTTP 200
+# (e.g. a maintenance page after a redirect)
+mock_error_page = b"<html><body>Wartungsarbeiten</body></html>"
+
+
+def get_etag(content: bytes):
+    """
+    Returns the ETag for a response body
+
+    Parameters
+    ==========
+    content: 'bytes'
+        Response body
+
+    Returns
+    =======
+    etag: 'str'
+        Quoted ETag value
+    """
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def load_mowas_captures(demo_data_directory: str = mock_demo_data_directory):
+    """
+    Reads the MOWAS captures for each MOWAS category
+
+    Parameters
+    ==========
+    demo_data_directory: 'str'
+        Directory which contains the captured MOWAS JSON files
+
+    Returns
+    =======
+    mowas_captures: 'dict'
+        List of (content, ETag) tuples per MOWAS URL path
+    """
+    file_names = sorted(os.listdir(demo_data_directory), key=lambda x: (len(x), x))
+
+    mowas_captures = {}
+    for mowas_category, url_path in mowas.mowas_dictionary.items():
+        prefix = mock_capture_prefixes.get(mowas_category)
+        contents = [
+            open(os.path.join(demo_data_directory, file_name), "rb").read()
+            for file_name in file_names
+            if prefix and file_name.startswith(prefix) and file_name.endswith(".json")
+        ]
+        if not contents:
+            contents = [b"[]"]
+        mowas_captures[url_path] = [
+            (content, get_etag(content)) for content in contents
+        ]
+    return mowas_captures
+
+
+def create_warncell_csv(mowas_captures: dict):
+    """
+    Creates a DWD warncell CSV file which contains all geocodes
+    (and their area names) of our MOWAS captures
+
+    Parameters
+    ==========
+    mowas_captures: 'dict'
+        see load_mowas_captures
+
+    Returns
+    =======
+    warncell_csv: 'bytes'
+        CSV content in DWD format
+    """
+    warncells = {}
+    for captures in mowas_captures.values():
+        for content, _ in captures:
+            for element in json.loads(content):
+                for info in element.get("info", []):
+                    for area in info.get("area", []):
+                        for geocode in area.get("geocode", []):
+                            warncells.setdefault(geocode["value"], area["areaDesc"])
+
+    lines = ["WARNCELLID;NAME;NUTS;KURZNAME;KFZ-KENNZEICHEN"]
+    for warncellid, area_desc in warncells.items():
+        lines.append(f"{warncellid};{area_desc};;{area_desc[:30]};")
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def create_mock_config(
+    demo_data_directory: str = mock_demo_data_directory,
+    latency: float = 0.0,
+    latency_jitter: float = 0.0,
+    error_rate: float = 0.0,
+    rotation_interval: float = 0.0,
+    aprs_drift: float = 0.0,
+    seed: int = 42,
+):
+    """
+    Creates the mock server's configuration and state
+
+    Parameters
+    ==========
+    demo_data_directory: 'str'
+        Directory which contains the captured MOWAS JSON files
+    latency: 'float'
+        Response delay in seconds
+    latency_jitter: 'float'
+        Max. random delay (seconds) which is added to the latency
+    error_rate: 'float'
+        Probability (0..1) that a request fails
+    rotation_interval: 'float'
+        Switch to the next MOWAS capture of a category every x seconds
+        (0 = always serve the first capture)
+    aprs_drift: 'float'
+        Max. movement (meters) of a mocked APRS position per request
+    seed: 'int'
+        Seed for the random generator (errors, latency, APRS positions)
+
+    Returns
+    =======
+    mock_config: 'dict'
+        The mock server's configuration
+    """
+    mowas_captures = load_mowas_captures(demo_data_directory=demo_data_directory)
+    warncell_csv = create_warncell_csv(mowas_captures=mowas_captures)
+    return {
+        "mowas_captures": mowas_captures,
+        "warncell_csv": (warncell_csv, get_etag(warncell_csv)),
+        "latency": latency,
+        "latency_jitter": latency_jitter,
+        "error_rate": error_rate,
+        "rotation_interval": rotation_interval,
+        "aprs_drift": aprs_drift,
+        "aprs_positions": {},
+        "random": random.Random(seed),
+        "start_time": time.monotonic(),
+        "request_counts": {},
+        "lock": threading.Lock(),
+    }
+
+
+def get_mock_aprs_position(mock_config: dict, callsign: str):
+    """
+    Returns the (mocked) position of an APRS call sign. Each call
+    sign starts at its own fixed position and then drifts randomly
+
+    Parameters
+    ==========
+    mock_config: 'dict'
+        see create_mock_config
+    callsign: 'str'
+        The call sign
+
+    Returns
+    =======
+    latitude: 'float'
+        Call sign's latitude
+    longitude: 'float'
+        Call sign's longitude
+    """
+    positions = mock_config["aprs_positions"]
+    if callsign not in positions:
+        checksum = zlib.crc32(callsign.encode("utf-8"))
+        positions[callsign] = (
+            mock_aprs_center[0]
+            + ((checksum & 0xFFFF) / 0xFFFF - 0.5) * mock_aprs_spread,
+            mock_aprs_center[1] + ((checksum >> 16) / 0xFFFF - 0.5) * mock_aprs_spread,
+        )
+    elif mock_config["aprs_drift"]:
+        # one degree of latitude is ~111 km
+        drift = mock_config["aprs_drift"] / 111000
+        latitude, longitude = positions[callsign]
+        positions[callsign] = (
+            latitude + mock_config["random"].uniform(-drift, drift),
+            longitude + mock_config["random"].uniform(-drift, drift),
+        )
+    return positions[callsign]
+
+
+class MockRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Request handler for all mocked services; the mock
+    # configuration is attached to the server object
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(msg=format % args)
+
+    def send_content(self, status: int, content: bytes, content_type: str, **headers):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+    def send_versioned_content(self, content: bytes, content_type: str, etag: str):
+        # Answers with HTTP 304 if the client already has this version
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_content(200, content, content_type, ETag=etag)
+
+    def send_json(self, data, status: int = 200):
+        self.send_content(
+            status, json.dumps(data).encode("utf-8"), "application/json; charset=utf-8"
+        )
+
+    def simulate_network(self):
+        """
+        Delays the request and decides whether it fails. Returns
+        True if the request has been answered with an error
+        """
+        mock_config = self.server.mock_config
+        with mock_config["lock"]:
+            url_path = urllib.parse.urlsplit(self.path).path
+            request_counts = mock_config["request_counts"]
+            request_counts[url_path] = request_counts.get(url_path, 0) + 1
+            delay = mock_config["latency"] + mock_config["random"].uniform(
+                0, mock_config["latency_jitter"]
+            )
+            failure = mock_config["random"].random() < mock_config["error_rate"]
+            html_error = mock_config["random"].random() < 0.5
+
+        if delay > 0:
+            time.sleep(delay)
+        if not failure:
+            return False
+        if html_error:
+            self.send_content(200, mock_error_page, "text/html; charset=utf-8")
+        else:
+            self.send_content(503, b"Service Unavailable", "text/plain")
+        return True
+
+    def do_GET(self):
+        if self.simulate_network():
+            return
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        mock_config = self.server.mock_config
+
+        if url.path in mock_config["mowas_captures"]:
+            self.handle_mowas(url_path=url.path)
+        elif url.path == mock_aprsdotfi_path:
+            self.handle_aprsdotfi(query=query)
+        elif url.path == f"{mock_nominatim_path}/reverse":
+            self.handle_nominatim(query=query)
+        elif url.path == mock_warncell_path:
+            content, etag = mock_config["warncell_csv"]
+            self.send_versioned_content(content, "text/csv; charset=utf-8", etag)
+        elif url.path == f"{mock_deepl_path}/v2/usage":
+            self.send_json({"character_count": 0, "character_limit": 500000})
+        else:
+            self.send_content(404, b"Not Found", "text/plain")
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(content_length)
+        if self.simulate_network():
+            return
+        url = urllib.parse.urlsplit(self.path)
+
+        if url.path == f"{mock_deepl_path}/v2/translate":
+            self.handle_deepl(body=body)
+        else:
+            self.send_content(404, b"Not Found", "text/plain")
+
+    def handle_mowas(self, url_path: str):
+        mock_config = self.server.mock_config
+        captures = mock_config["mowas_captures"][url_path]
+
+        # Serve the category's captures one after another
+        index = 0
+        if mock_config["rotation_interval"] > 0:
+            elapsed = time.monotonic() - mock_config["start_time"]
+            index = int(elapsed / mock_config["rotation_interval"]) % len(captures)
+        content, etag = captures[index]
+
+        self.send_versioned_content(content, "application/json", etag)
+
+    def handle_aprsdotfi(self, query: dict):
+        if not query.get("apikey"):
+            self.send_json({"result": "fail", "description": "apikey missing"})
+            return
+
+        callsigns = [name for name in query.get("name", "").upper().split(",") if name]
+        entries = []
+        with self.server.mock_config["lock"]:
+            for callsign in callsigns[: aprsdotfi.aprsdotfi_max_names_per_request]:
+                latitude, longitude = get_mock_aprs_position(
+                    mock_config=self.server.mock_config, callsign=callsign
+                )
+                entries.append(
+                    {
+                        "name": callsign,
+                        "type": "l",
+                        "time": str(int(time.time())),
+                        "lasttime": str(int(time.time())),
+                        "lat": f"{latitude:.5f}",
+                        "lng": f"{longitude:.5f}",
+                    }
+                )
+        self.send_json(
+            {
+                "command": "get",
+                "result": "ok",
+                "what": "loc",
+                "found": len(entries),
+                "entries": entries,
+            }
+        )
+
+    def handle_nominatim(self, query: dict):
+        try:
+            latitude = float(query["lat"])
+            longitude = float(query["lon"])
+        except (KeyError, ValueError):
+            self.send_json({"error": "Unable to geocode"})
+            return
+
+        address = {
+            "road": "Mockstraße",
+            "house_number": str(int(abs(latitude * 1000)) % 100 + 1),
+            "city": "Mockstadt",
+            "county": "Landkreis Mock",
+            "state": "Niedersachsen",
+            "postcode": "37603",
+            "country": "Deutschland",
+            "country_code": "de",
+        }
+        self.send_json(
+            {
+                "place_id": zlib.crc32(f"{latitude}/{longitude}".encode("utf-8")),
+                "lat": str(latitude),
+                "lon": str(longitude),
+                "display_name": f"{address['road']} {address['house_number']}, "
+                f"{address['postcode']} {address['city']}, {address['country']}",
+                "address": address,
+            }
+        )
+
+    def handle_deepl(self, body: bytes):
+        # deepl.com accepts JSON and form-encoded requests
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            request_data = json.loads(body or b"{}")
+            texts = request_data.get("text", [])
+            target_language = request_data.get("target_lang", "")
+        else:
+            request_data = urllib.parse.parse_qs(body.decode("utf-8"))
+            texts = request_data.get("text", [])
+            target_language = request_data.get("target_lang", [""])[0]
+        if isinstance(texts, str):
+            texts = [texts]
+
+        self.send_json(
+            {
+                "translations": [
+                    {
+                        "detected_source_language": "DE",
+                        "text": f"[{target_language.upper()}] {text}",
+                        "billed_characters": len(text),
+                    }
+                    for text in texts
+                ]
+            }
+        )
+
+
+def override_service_urls(base_url: str):
+    """
+    Sends all requests to external services (MOWAS, aprs.fi, Nominatim,
+    DWD warncell and deepl.com) to a mock server at the given base URL.
+    The warncell data is kept in a separate database file so that the
+    local copy of the real data remains untouched.
+
+    Parameters
+    ==========
+    base_url: 'str'
+        Base URL of the mock server, e.g. http://localhost:8080
+
+    Returns
+    =======
+    """
+    base_url = base_url.rstrip("/")
+    url = urllib.parse.urlsplit(base_url)
+
+    mowas.mowas_base_url = base_url
+    aprsdotfi.aprsdotfi_api_url = f"{base_url}{mock_aprsdotfi_path}"
+    geodata.nominatim_scheme = url.scheme
+    geodata.nominatim_domain = f"{url.netloc}{url.path}{mock_nominatim_path}"
+    warncell.warncell_url = f"{base_url}{mock_warncell_path}"
+    warncell.warncell_database_file = (
+        os.path.splitext(warncell.warncell_database_file)[0] + "-mock.db"
+    )
+    translate.deepl_server_url = f"{base_url}{mock_deepl_path}"
+    logger.info(msg=f"All external service requests are sent to {base_url}")
+
+
+def run_mock_server(host: str, port: int, mock_config: dict):
+    """
+    Runs the mock server until it gets interrupted
+
+    Parameters
+    ==========
+    host: 'str'
+        Host name / address that the server binds to
+    port: 'int'
+        TCP port
+    mock_config: 'dict'
+        see create_mock_config
+
+    Returns
+    =======
+    """
+    server = http.server.ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.mock_config = mock_config
+    logger.info(msg=f"Mock server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(
+            msg=f"Requests per path since {datetime.now():%H:%M:%S}: {mock_config['request_counts']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1", type=str)
+    parser.add_argument("--port", default=8080, type=int)
+    parser.add_argument(
+        "--demo-data",
+        default=mock_demo_data_directory,
+        dest="demo_data",
+        type=str,
+        help="Directory with the captured MOWAS JSON files",
+    )
+    parser.add_argument(
+        "--latency", default=0.0, type=float, help="Response delay in seconds"
+    )
+    parser.add_argument(
+        "--latency-jitter",
+        default=0.0,
+        dest="latency_jitter",
+        type=float,
+        help="Max. random delay in seconds which is added to the latency",
+    )
+    parser.add_argument(
+        "--error-rate",
+        default=0.0,
+        dest="error_rate",
+        type=float,
+        help="Probability (0..1) that a request fails with HTTP 503 or an HTML page",
+    )
+    parser.add_argument(
+        "--rotation-interval",
+        default=0.0,
+        dest="rotation_interval",
+        type=float,
+        help="Serve the next MOWAS capture of a category every x seconds (0 = first capture only)",
+    )
+    parser.add_argument(
+        "--aprs-drift",
+        default=0.0,
+        dest="aprs_drift",
+        type=float,
+        help="Max. movement in meters of a mocked APRS position per request",
+    )
+    parser.add_argument("--seed", default=42, type=int)
+    args = parser.parse_args()
+
+    run_mock_server(
+        host=args.host,
+        port=args.port,
+        mock_config=create_mock_config(
+            demo_data_directory=args.demo_data,
+            latency=args.latency,
+            latency_jitter=args.latency_jitter,
+            error_rate=args.error_rate,
+            rotation_interval=args.rotation_interval,
+            aprs_drift=args.aprs_drift,
+            seed=args.seed,
+        ),
+    )
@@ -20,26 +20,46 @@
 import logging
 import signal
 from mowas import process_mowas_data
-from warncell import read_warncell_info
+from warncell import (
+    read_warncell_info,
+    refresh_warncell_database,
+    warncell_refresh_interval,
+)
 from utils import (
     get_program_config_from_file,
+    get_subscriber_profiles_from_file,
+    get_content_filter_rules_from_file,
     signal_term_handler,
     get_command_line_params,
+    image_garbage_collector,
 )
 from outputgenerator import (
     generate_email_messages,
     generate_apprise_message,
+    dispatch_mowas_messages,
+)
+from aprsdotfi import (
+    create_position_tracker,
+    update_position_tracker,
+    get_tracked_positions,
 )
-from aprsdotfi import get_position_on_aprsfi
+from records import WatchPoint
+from mockserver import override_service_urls
 from mail import send_email_message
 from staticmap import render_png_map
 from expiringdict import ExpiringDict
-import time
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 import apscheduler.schedulers.base
 from mail import imap_garbage_collector
+from polling import add_polling_jobs
+from multitenant import create_subscriber_caches, run_multitenant_cycle
+from geomatch import create_geocode_index
+from geopool import create_geometry_pool, shutdown_geometry_pool
+from metrics import enable_metrics_file, start_metrics_server
+from profiling import enable_profiling
 from test_data_generator import generate_test_data
-import copy
+import datetime
+import functools
 import asyncio
 import os
 
@@ -50,29 +70,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def image_garbage_collector(mowas_messages_to_send: dict):
-    """
-    Garbage collector; deletes all images which we may have created
-    on the user's hard drive.
-
-    Parameters
-    ==========
-    mowas_messages_to_send: 'dict'
-                    Our MOWAS messages dictionary
-
-    Returns
-    =======
-    """
-    logger.debug(msg="Starting image files garbage collector")
-
-    for mowas_message_id in mowas_messages_to_send:
-        file_name = mowas_messages_to_send[mowas_message_id]["static_image"]
-        if os.path.isfile(file_name):
-            os.remove(file_name)
-
-    logger.debug(msg="Finishing image files garbage collector")
-
-
 if __name__ == "__main__":
     logger.info(msg="Startup ...")
 
@@ -95,11 +92,25 @@ if __name__ == "__main__":
         mowas_text_summarizer,
         mowas_sms_message_length,
         mowas_sms_message_split,
+        mowas_subscriber_file,
+        mowas_metrics_port,
+        mowas_metrics_file,
+        mowas_profile_directory,
+        mowas_aprs_poll_interval,
+        mowas_aprs_min_distance,
+        mowas_base_url,
+        mowas_geometry_workers,
     ) = get_command_line_params()
 
+    # Send all requests for external data to a mock server?
+    if mowas_base_url:
+        override_service_urls(base_url=mowas_base_url)
+
     # Check if the user has specified ANY messaging configuration
+    # (in multi-tenant mode, the messaging targets are part of the subscriber file)
     if (
-        mowas_email_recipient == None
+        not mowas_subscriber_file
+        and mowas_email_recipient == None
         and mowas_sms_messenger_configfile == None
         and mowas_messenger_configfile == None
     ):
@@ -131,6 +142,14 @@ if __name__ == "__main__":
         logger.info(msg="Error while parsing the program config file; exiting...")
         exit(0)
 
+    # get the user-defined content filters (if any)
+    success, mowas_content_filter_rules = get_content_filter_rules_from_file(
+        config_filename=mowas_configfile
+    )
+    if not success:
+        logger.info(msg="Error while parsing the content filter rules; exiting...")
+        exit(0)
+
     # Define some boolean hints on what is enabled and what is not
     # fmt: off
     mowas_openai_enabled = False if mowas_openai_api_key == "NOT_CONFIGURED" else True
@@ -140,13 +159,40 @@ if __name__ == "__main__":
     mowas_imap_gc_enabled = False if (mowas_imap_server_port == 0 or mowas_imap_server_address == "NOT_CONFIGURED" or mowas_imap_mail_retention_max_days == 0 or not mowas_email_enabled) else True
     # fmt: on
 
+    # Multi-tenant mode? Then read our subscribers' profiles
+    mowas_subscriber_profiles = []
+    if mowas_subscriber_file:
+        success, mowas_subscriber_profiles = get_subscriber_profiles_from_file(
+            subscriber_filename=mowas_subscriber_file,
+            default_active_categories=mowas_active_categories,
+            default_warning_level=mowas_warning_level,
+            default_high_prio_level=mowas_high_prio_level,
+        )
+        if not success:
+            logger.info(msg="Error while parsing the subscriber file; exiting...")
+            exit(0)
+        logger.info(
+            msg=f"Multi-tenant mode; serving {len(mowas_subscriber_profiles)} subscriber(s)"
+        )
+
+        if mowas_follow_the_ham or mowas_generate_test_message:
+            logger.info(
+                msg="'follow-the-ham' and 'generate-test-message' are not supported in multi-tenant mode; exiting..."
+            )
+            exit(0)
+
     # some basic checks on whether the user wants us to do the impossible :-)
-    if mowas_email_enabled and mowas_email_recipient is None:
+    if (
+        mowas_email_enabled
+        and mowas_email_recipient is None
+        and not mowas_subscriber_file
+    ):
         logger.info(msg="Valid destination email is missing; disabling Email")
         mowas_email_enabled = False
 
     if (
-        mowas_email_enabled
+        not mowas_subscriber_file
+        and mowas_email_enabled
         and not mowas_sms_messenger_configfile
         and not mowas_messenger_configfile
     ):
@@ -158,7 +204,7 @@ if __name__ == "__main__":
     # Check if the user asks us to track a ham radio user but has not configured aprs.fi credentials
     if not mowas_aprsdotfi_enabled and mowas_follow_the_ham:
         logger.info(
-            msg=f"Cannot track call sign for {mowas_follow_the_ham} - aprs.fi credentials are not configured; exiting..."
+            msg=f"Cannot track call sign(s) {', '.join(mowas_follow_the_ham)} - aprs.fi credentials are not configured; exiting..."
         )
         exit(0)
 
@@ -169,30 +215,42 @@ if __name__ == "__main__":
         )
         exit(0)
 
-    # If the user wants us to track a ham radio user AND has configured
+    # If the user wants us to track ham radio users AND has configured
     # the aprs.fi credentials, verify if we can access aprs.fi and if
-    # that user's call sign can be found via the API
+    # at least one call sign can be found via the API. The tracker's
+    # positions are then updated in the background (see scheduler setup)
 
-    success = False
-    latitude = longitude = 0.0
+    aprs_position_tracker = None
 
     if mowas_aprsdotfi_enabled and mowas_follow_the_ham:
-        success, latitude, longitude = get_position_on_aprsfi(
-            aprsfi_callsign=mowas_follow_the_ham,
+        aprs_position_tracker = create_position_tracker(
+            aprsfi_callsigns=mowas_follow_the_ham,
             aprsdotfi_api_key=mowas_aprsdotfi_api_key,
+            min_distance=mowas_aprs_min_distance,
         )
-        if not success:
+        if not update_position_tracker(position_tracker=aprs_position_tracker):
             logger.info(
-                msg=f"Cannot find call sign {mowas_follow_the_ham} or aprs.fi or its API access key is misconfigured/invalid; exiting ..."
+                msg=f"Cannot find call sign(s) {', '.join(mowas_follow_the_ham)} on aprs.fi or its API access key is misconfigured/invalid; exiting ..."
             )
             exit(0)
 
     # Read the "Warncell" data which will later enables us to come up with proper
-    # (short) names for MOWAS areas in question
+    # (short) names for MOWAS areas in question. The data is cached locally and
+    # only downloaded if there is no local copy yet
     success, warncell_data = read_warncell_info()
     if not success:
-        logger.info("Cannot read Warncell data from the DWD site; cannot continue")
-        exit(0)
+        logger.info(
+            "Cannot read Warncell data from the DWD site; will retry in the background"
+        )
+
+    # MOWAS areas with known geocodes are only matched once
+    # against our watch coordinates (and then looked up)
+    geocode_index = create_geocode_index(warncell_data=warncell_data)
+
+    # Optional worker processes for the exact polygon tests
+    geometry_pool = None
+    if mowas_geometry_workers > 0:
+        geometry_pool = create_geometry_pool(worker_count=mowas_geometry_workers)
 
     # Check if the user wants to use OpenAI as port processor: do we have an API key?
     if mowas_text_summarizer == "openai" and not mowas_openai_enabled:
@@ -288,16 +346,37 @@ if __name__ == "__main__":
         max_len=1000, max_age_seconds=mowas_time_to_live * 60
     )
 
+    # Expose our metrics, if requested
+    if mowas_metrics_port:
+        start_metrics_server(port=mowas_metrics_port)
+    if mowas_metrics_file:
+        enable_metrics_file(file_name=mowas_metrics_file)
+
+    # Enable the on-demand profiling of polling cycles, if requested
+    if mowas_profile_directory:
+        enable_profiling(profile_directory=mowas_profile_directory)
+
+    # Set up the scheduler. It runs both the MOWAS polling jobs and
+    # the (optional) IMAP garbage collector
+    mowas_scheduler = BlockingScheduler()
+
+    # Refresh the local Warncell data in the background (starting now); the
+    # data is only downloaded if it has changed on the DWD site
+    mowas_scheduler.add_job(
+        refresh_warncell_database,
+        "interval",
+        id="warncell_refresh",
+        hours=warncell_refresh_interval,
+        kwargs={"warncell_store": warncell_data},
+        next_run_time=datetime.datetime.now(),
+    )
+
     # Check if we need to install/activate the Email garbage collector
-    mail_gc_scheduler = None
     if mowas_imap_gc_enabled:
         logger.info(msg="Spinning up the IMAP garbage collector per our user's request")
 
-        # Set up the scheduler
-        mail_gc_scheduler = BackgroundScheduler()
-
-        # Then add the Garbage Collector process as scheduler task
-        mail_gc.scheduler.add_job(
+        # Add the Garbage Collector process as scheduler task
+        mowas_scheduler.add_job(
             imap_garbage_collector,
             "interval",
             id="imap_garbage_collector",
@@ -311,140 +390,196 @@ if __name__ == "__main__":
                 mowas_imap_mailbox_name,
             ],
         )
-
-        # And finally start the scheduler
-        mail_gc_scheduler.start()
         logger.info(msg="IMAP garbage collector has been activated")
 
-    logger.debug(msg="Entering processing loop...")
-    while True:
-        # Set the program's run interval to default settings
-        mowas_run_interval = mowas_standard_run_interval
-
-        # use a deep copy of the watch areas as we may need to amend
-        # this static information my adding the user's APRS
-        # position data to it
-        mowas_watch_areas = copy.deepcopy(mowas_watch_areas_config)
-
-        # Do we need to track the user's config on aprs.fi?
-        if mowas_follow_the_ham:
-            logger.debug(
-                msg=f"Trying to get lat/lon for {mowas_follow_the_ham} on aprs.fi ..."
-            )
-            # yes; let's get the latitude and longitude info
-            success, latitude, longitude = get_position_on_aprsfi(
-                aprsfi_callsign=mowas_follow_the_ham,
-                aprsdotfi_api_key=mowas_aprsdotfi_api_key,
+    # Track the call signs' positions on aprs.fi independently of the MOWAS polling
+    # cycles. A new position is only published if a call sign has moved far enough
+    if aprs_position_tracker:
+        mowas_scheduler.add_job(
+            update_position_tracker,
+            "interval",
+            id="aprs_position_tracker",
+            minutes=mowas_aprs_poll_interval,
+            kwargs={"position_tracker": aprs_position_tracker},
+        )
+
+    # Our current watch list: the configured watch areas plus the tracked
+    # APRS positions (if any). The list is only rebuilt if the tracker has
+    # published a new position; otherwise, all cycles share the same list
+    mowas_watch_list = {
+        "version": None,
+        "watch_areas": mowas_watch_areas_config,
+        "aprs_positions": None,
+    }
+
+    def run_mowas_cycle(mowas_categories: list):
+        """
+        Runs one processing cycle for the given MOWAS categories and
+        sends out all new messages to the user.
+
+        Parameters
+        ==========
+        mowas_categories: 'list'
+            MOWAS categories that we are supposed to process
+
+        Returns
+        =======
+        got_alert_or_update: 'bool'
+            True if at least one Alert or Update message was sent to the user
+        mowas_content_hashes: 'dict'
+            content hash per processed MOWAS category
+        """
+        # Did any of the tracked positions change since the last cycle?
+        if aprs_position_tracker:
+            version, positions = get_tracked_positions(
+                position_tracker=aprs_position_tracker
             )
-            # Add the lat/lon combination to our copied watch list
-            # If we were unable to find the call sign on aprs.fi,
-            # we will NOT trigger an error
-            if success:
-                logger.debug(
-                    msg=f"APRS.fi coordinate retrieval successful; adding coordinates to watchlist ..."
-                )
-                latlon = [latitude, longitude]
-                mowas_watch_areas.append(latlon)
-                logger.debug(msg=f"Amended watchlist: {mowas_watch_areas}")
-            else:
+            if version != mowas_watch_list["version"]:
+                # Label each position with its call sign(s); call
+                # signs can share the same position
+                aprs_positions = {}
+                for callsign, position in positions.items():
+                    watch_point = WatchPoint(
+                        latitude=position["latitude"],
+                        longitude=position["longitude"],
+                    )
+                    aprs_positions.setdefault(watch_point, []).append(callsign)
+                mowas_watch_list["watch_areas"] = mowas_watch_areas_config + [
+                    [watch_point.latitude, watch_point.longitude]
+                    for watch_point in aprs_positions
+                ]
+                mowas_watch_list["aprs_positions"] = {
+                    watch_point: ", ".join(callsigns)
+                    for watch_point, callsigns in aprs_positions.items()
+                }
+                mowas_watch_list["version"] = version
                 logger.debug(
-                    msg=f"Unable to retrieve coordinates on aprs.fi; user's coordinates will not be watched ..."
+                    msg=f"Amended watchlist: {mowas_watch_list['watch_areas']}"
                 )
-        try:
-            logger.debug(msg=f"Processing MOWAS data ...")
-            (
-                mowas_message_cache,
-                mowas_messages_to_send,
-                got_alert_or_update,
-            ) = process_mowas_data(
-                coordinates=mowas_watch_areas,
-                mowas_cache=mowas_message_cache,
-                minimal_mowas_severity=mowas_warning_level,
-                mowas_high_prio_level=mowas_high_prio_level,
-                mowas_active_categories=mowas_active_categories,
-                enable_covid_messaging=mowas_enable_covid_content,
-                local_file_name=mowas_localfile,
-                generate_sms_messages=generate_sms_messages,
-                text_summarizer=mowas_text_summarizer,
-                text_summarizer_api_key=mowas_text_summarizer_api_key,
-            )
 
-            # Did we find some new message updates that we need to send to the user?
-            if len(mowas_messages_to_send.keys()) > 0:
-                logger.info(msg=f"{len(mowas_messages_to_send)} new message(s) found")
-
-                # Use the emergency run interval setting for the sleep
-                # if we have received at least one alert or update msg
-                if got_alert_or_update:
-                    mowas_run_interval = mowas_emergency_run_interval
-
-                # Check if we need to send something via Email
-                if mowas_email_enabled:
-                    logger.debug(msg="Generating Email notifications")
-                    success = generate_email_messages(
-                        mowas_messages_to_send=mowas_messages_to_send,
-                        warncell_data=warncell_data,
-                        smtpimap_email_address=mowas_smtpimap_email_address,
-                        smtpimap_email_password=mowas_smtpimap_email_password,
-                        mail_recipient=mowas_email_recipient,
-                        smtp_server_address=mowas_smtp_server_address,
-                        smtp_server_port=mowas_smtp_server_port,
-                    )
-                    logger.debug(msg=f"Email message success: {success}")
-
-                # Check if we need to send something via Apprise 'full msg' config
-                if mowas_messenger_configfile:
-                    logger.debug(msg="Generating Apprise 'full msg' notifications")
-                    success = generate_apprise_message(
-                        mowas_messages_to_send=mowas_messages_to_send,
-                        warncell_data=warncell_data,
-                        apprise_config_file=mowas_messenger_configfile,
-                        abbreviated_message_format=False,
-                    )
-                    logger.info(msg=f"Apprise 'full msg' success: {success}")
-
-                # Check if we need to send something via Apprise 'SMS msg' config
-                if mowas_sms_messenger_configfile:
-                    logger.debug(msg="Generating Apprise 'SMS msg' notifications")
-                    success = generate_apprise_message(
-                        mowas_messages_to_send=mowas_messages_to_send,
-                        warncell_data=warncell_data,
-                        apprise_config_file=mowas_sms_messenger_configfile,
-                        abbreviated_message_format=True,
-                        sms_message_split=mowas_sms_message_split,
-                        sms_message_length=mowas_sms_message_length,
-                    )
-                    logger.info(msg=f"Apprise 'SMS msg' success: {success}")
-
-                # Remove all local image files
-                image_garbage_collector(mowas_messages_to_send=mowas_messages_to_send)
-            else:
-                logger.debug(msg="No new messages found")
-
-            # Exit the loop if we were testing with a local file
-            if mowas_localfile:
-                break
-
-            # Finally, go to sleep
-            logger.debug(msg=f"Entering sleep mode for {mowas_run_interval} mins...")
-            time.sleep(mowas_run_interval * 60)
-            logger.debug(msg="Recovered from sleep mode ...")
-        except (KeyboardInterrupt, SystemExit):
-            logger.info(
-                msg="Received KeyboardInterrupt or SystemExit in progress; shutting down ..."
+        logger.debug(msg=f"Processing MOWAS data for {mowas_categories} ...")
+        mowas_content_hashes = {}
+        (
+            _,
+            mowas_messages_to_send,
+            got_alert_or_update,
+        ) = process_mowas_data(
+            coordinates=mowas_watch_list["watch_areas"],
+            aprs_positions=mowas_watch_list["aprs_positions"],
+            mowas_cache=mowas_message_cache,
+            minimal_mowas_severity=mowas_warning_level,
+            mowas_high_prio_level=mowas_high_prio_level,
+            mowas_active_categories=mowas_categories,
+            enable_covid_messaging=mowas_enable_covid_content,
+            local_file_name=mowas_localfile,
+            generate_sms_messages=generate_sms_messages,
+            text_summarizer=mowas_text_summarizer,
+            text_summarizer_api_key=mowas_text_summarizer_api_key,
+            mowas_content_hashes=mowas_content_hashes,
+            geocode_index=geocode_index,
+            content_filter_rules=mowas_content_filter_rules,
+            geometry_pool=geometry_pool,
+        )
+
+        # Did we find some new message updates that we need to send to the user?
+        if len(mowas_messages_to_send.keys()) == 0:
+            logger.debug(msg="No new messages found")
+            return False, mowas_content_hashes
+
+        logger.info(msg=f"{len(mowas_messages_to_send)} new message(s) found")
+
+        # Send the messages to all of our messaging targets
+        dispatch_mowas_messages(
+            mowas_messages_to_send=mowas_messages_to_send,
+            warncell_data=warncell_data,
+            email_enabled=mowas_email_enabled,
+            smtpimap_email_address=mowas_smtpimap_email_address,
+            smtpimap_email_password=mowas_smtpimap_email_password,
+            smtp_server_address=mowas_smtp_server_address,
+            smtp_server_port=mowas_smtp_server_port,
+            mail_recipient=mowas_email_recipient,
+            messenger_config_file=mowas_messenger_configfile,
+            sms_messenger_config_file=mowas_sms_messenger_configfile,
+            sms_message_length=mowas_sms_message_length,
+            sms_message_split=mowas_sms_message_split,
+        )
+
+        # Remove all local image files
+        image_garbage_collector(mowas_messages_to_send=mowas_messages_to_send)
+
+        # Use the emergency run interval setting for the next run(s)
+        # if we have received at least one alert or update msg
+        return got_alert_or_update, mowas_content_hashes
+
+    # In multi-tenant mode, all subscribers share the same cycle
+    polling_function = run_mowas_cycle
+    if mowas_subscriber_file:
+        mowas_active_categories = [
+            category
+            for category in mowas_active_categories
+            if any(
+                category in profile["active_categories"]
+                for profile in mowas_subscriber_profiles
             )
-            # Check if we need to terminate the garbage collector scheduler
-            if mowas_imap_gc_enabled and mail_gc_scheduler:
-                logger.info(msg="Pausing IMAP Garbage Collector")
-                mail_gc_scheduler.pause()
-                mail_gc_scheduler.remove_all_jobs()
-                logger.info(msg="Stopping IMAP Garbage Collector")
-                if mail_gc_scheduler.state != apscheduler.schedulers.base.STATE_STOPPED:
-                    try:
-                        mail_gc_scheduler.shutdown()
-                    except Exception as ex:
-                        logger.info(
-                            msg="Exception occurred during shutdown SystemExit loop"
-                        )
-            # Finally, terminate the loop
-            break
+        ]
+        polling_function = functools.partial(
+            run_multitenant_cycle,
+            subscriber_profiles=mowas_subscriber_profiles,
+            subscriber_caches=create_subscriber_caches(
+                subscriber_profiles=mowas_subscriber_profiles,
+                time_to_live=mowas_time_to_live,
+            ),
+            warncell_data=warncell_data,
+            email_enabled=mowas_email_enabled,
+            smtpimap_email_address=mowas_smtpimap_email_address,
+            smtpimap_email_password=mowas_smtpimap_email_password,
+            smtp_server_address=mowas_smtp_server_address,
+            smtp_server_port=mowas_smtp_server_port,
+            deepl_api_key=mowas_deepldotcom_api_key,
+            text_summarizer=mowas_text_summarizer,
+            text_summarizer_api_key=mowas_text_summarizer_api_key,
+            sms_message_length=mowas_sms_message_length,
+            sms_message_split=mowas_sms_message_split,
+            local_file_name=mowas_localfile,
+            geocode_index=geocode_index,
+            content_filter_rules=mowas_content_filter_rules,
+            geometry_pool=geometry_pool,
+        )
+
+    # Testing with a local file? Then run exactly one cycle and exit
+    if mowas_localfile:
+        polling_function(mowas_active_categories)
+        if geometry_pool:
+            shutdown_geometry_pool(geometry_pool=geometry_pool)
+        logger.info(msg="Local file test cycle complete; exiting")
+        exit(0)
+
+    # Add one polling job per MOWAS category. Each category
+    # adapts its run interval on its own
+    add_polling_jobs(
+        scheduler=mowas_scheduler,
+        mowas_active_categories=mowas_active_categories,
+        polling_function=polling_function,
+        standard_run_interval=mowas_standard_run_interval,
+        emergency_run_interval=mowas_emergency_run_interval,
+    )
+
+    logger.debug(msg="Entering processing loop...")
+    try:
+        mowas_scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info(
+            msg="Received KeyboardInterrupt or SystemExit in progress; shutting down ..."
+        )
+        # Terminate the scheduler (polling jobs and garbage collector)
+        logger.info(msg="Stopping the scheduler")
+        if mowas_scheduler.state != apscheduler.schedulers.base.STATE_STOPPED:
+            try:
+                mowas_scheduler.shutdown(wait=False)
+            except Exception as ex:
+                logger.info(msg="Exception occurred during shutdown SystemExit loop")
+
+        # and the geometry workers
+        if geometry_pool:
+            logger.info(msg="Stopping the geometry workers")
+            shutdown_geometry_pool(geometry_pool=geometry_pool)
@@ -18,22 +18,28 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 import logging
-import numpy as np
-from shapely.geometry import Point, Polygon
 from expiringdict import ExpiringDict
-from utils import remove_html_content
+from text_normalizer import remove_html_content
 from translate import translate_text_list
 from geodata import (
     get_reverse_geopy_data,
-    convert_latlon_to_utm,
-    convert_latlon_to_maidenhead,
+    convert_latlon_array_to_utm,
+    convert_latlon_array_to_maidenhead,
 )
 from staticmap import render_png_map
+from geomatch import (
+    build_area_match_table,
+    convert_polygon_to_latlon,
+    get_watch_zone,
+)
 import requests
-import sys
-from pprint import pformat
 import json
+import hashlib
+import time
+from metrics import increment_counter, observe_duration
 from text_post_processor import create_text_summary
+from records import Alert, Area, Match, WatchPoint
+from contentfilter import get_content_filter, match_content_filter
 
 # Set up the global logger variable
 logging.basicConfig(
@@ -41,8 +47,443 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# These are the official MOWAS URLs which our code will try to query
+# Some of these URLs have no (longer?) any content
+mowas_dictionary = {
+    "TEMPEST": "/bbk.dwd/unwetter.json",
+    "FLOOD_OLD": "/bbk.wsv/hochwasser.json",
+    "FLOOD": "/bbk.lhp/hochwassermeldungen.json",
+    "WILDFIRE": "/bbk.dwd/waldbrand.json",
+    "EARTHQUAKE": "/bbk.bgr/erdbeben.json",
+    "DISASTERS": "/bbk.mowas/gefahrendurchsagen.json",
+}
+
+# MOWAS server (can be overridden, e.g. for a mock server)
+mowas_base_url = "https://warnung.bund.de"
+
+# Address and Maidenhead / UTM coordinates per watch point. Watch points
+# rarely change (a tracked APRS position only changes if the station has
+# moved), so these details don't need to be looked up again for each cycle
+watch_point_details_cache = ExpiringDict(max_len=1000, max_age_seconds=24 * 60 * 60)
+
+# Definitions for all possible MOWAS severity values
+# Important:
+# 'typedef_mowas_severity' requires value changes to be added in increasing
+# severity levels - we use this list for quite a few queries
+typedef_mowas_severity = ["Minor", "Moderate", "Severe", "Extreme"]
+
+
+def create_alert_records():
+    """
+    Creates the per-cycle store for all subscriber-independent parts of
+    the MOWAS messages: the matching areas per watch point plus content
+    filter results, cleaned texts, map polygon, SMS summary and translations
+    per message. Every part is created once per cycle (on first use), no
+    matter how many subscribers receive that message.
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    alert_records: 'dict'
+        'watch_point_areas': list of (MOWAS category, MOWAS identifier,
+                             area index) tuples per matching (latitude,
+                             longitude) watch point and watch zone; 'None'
+                             until set_alert_area_matches has been called
+        'contents': message contents per (MOWAS category, MOWAS identifier),
+                    see get_alert_content
+    """
+    return {"watch_point_areas": None, "contents": {}}
+
+
+def set_alert_area_matches(alert_records: dict, area_match_table: dict):
+    """
+    Adds the matching areas per watch point to the cycle's alert records
+
+    Parameters
+    ==========
+    alert_records: 'dict'
+        The cycle's alert records, see create_alert_records
+    area_match_table: 'dict'
+        Matching coordinates per area, see geomatch.build_area_match_table
+
+    Returns
+    =======
+    """
+    watch_point_areas = {}
+    for area_key, matched in area_match_table.items():
+        for watch_point in matched:
+            watch_point_areas.setdefault(watch_point, []).append(area_key)
+    alert_records["watch_point_areas"] = watch_point_areas
+
+
+def get_area_matches(alert_records: dict, coordinates: list):
+    """
+    Returns the matching areas for a list of watch coordinates
+
+    Parameters
+    ==========
+    alert_records: 'dict'
+        The cycle's alert records, see create_alert_records
+    coordinates: 'list'
+        List of [latitude, longitude] and [latitude, longitude, radius]
+        coordinates
 
-def download_mowas_data(base_url: str, url_path: str):
+    Returns
+    =======
+    area_matches: 'dict'
+        Key: (MOWAS category, MOWAS identifier) tuple
+        Value: sorted list of the indices of all matching areas
+    """
+    watch_point_areas = alert_records["watch_point_areas"]
+    area_keys = set()
+    for coord in coordinates:
+        area_keys.update(watch_point_areas.get((coord[0], coord[1]), ()))
+        watch_zone = get_watch_zone(coord)
+        if watch_zone is not None:
+            area_keys.update(watch_point_areas.get(watch_zone, ()))
+
+    area_matches = {}
+    for mowas_category, mowas_identifier, area_index in sorted(area_keys):
+        area_matches.setdefault((mowas_category, mowas_identifier), []).append(
+            area_index
+        )
+    return area_matches
+
+
+def get_alert_content(alert_records: dict, mowas_category: str, mowas_identifier: str):
+    """
+    Returns the (possibly still empty) subscriber-independent content of
+    a MOWAS message, see create_alert_records
+
+    Parameters
+    ==========
+    alert_records: 'dict'
+        The cycle's alert records
+    mowas_category: 'str'
+        MOWAS category, e.g. TEMPEST
+    mowas_identifier: 'str'
+        MOWAS message identifier
+
+    Returns
+    =======
+    alert_content: 'dict'
+        'suppressed': content filter result per content filter key
+        'texts': (headline, description, instruction, contact) tuple
+                 without HTML content (or 'None')
+        'latlon_polygon': map polygon (or 'None')
+        'sms_messages': SMS summary per text summarizer
+        'lang_contents': translated content per (target language, SMS summary)
+    """
+    key = (mowas_category, mowas_identifier)
+    alert_content = alert_records["contents"].get(key)
+    if alert_content is None:
+        alert_content = {
+            "suppressed": {},
+            "texts": None,
+            "latlon_polygon": None,
+            "sms_messages": {},
+            "lang_contents": {},
+        }
+        alert_records["contents"][key] = alert_content
+    return alert_content
+
+
+def is_alert_suppressed(
+    alert_records: dict,
+    mowas_category: str,
+    element: dict,
+    enable_covid_messaging: bool = False,
+    content_filter_rules: list = None,
+):
+    """
+    Checks if a MOWAS message matches the content filter. The result
+    is stored in the cycle's alert records, see get_alert_content.
+    Note that the filter checks the raw text (incl. HTML markup)
+
+    Parameters
+    ==========
+    alert_records: 'dict'
+        The cycle's alert records, see create_alert_records
+    mowas_category: 'str'
+        MOWAS category, e.g. TEMPEST
+    element: 'dict'
+        MOWAS message
+    enable_covid_messaging: 'bool'
+        Enables Covid messages (usually, they get suppressed)
+    content_filter_rules: 'list'
+        Optional user-defined content filter rules, see contentfilter.py
+
+    Returns
+    =======
+    suppressed: 'bool'
+        True if the message needs to be suppressed
+    """
+    alert_content = get_alert_content(
+        alert_records=alert_records,
+        mowas_category=mowas_category,
+        mowas_identifier=element["identifier"],
+    )
+    content_filter_key = (
+        enable_covid_messaging,
+        tuple(content_filter_rules) if content_filter_rules else (),
+    )
+    suppressed = alert_content["suppressed"].get(content_filter_key)
+    if suppressed is None:
+        info = element["info"][0]
+        content = {
+            "headline": info.get("headline"),
+            "description": info.get("description"),
+            "instruction": info.get("instruction"),
+            "contact": info.get("contact"),
+            "sender": element.get("sender"),
+        }
+        content_filter = get_content_filter(
+            enable_covid_messaging=enable_covid_messaging,
+            content_filter_rules=content_filter_rules,
+        )
+        suppressed = bool(match_content_filter(content_filter, content))
+        alert_content["suppressed"][content_filter_key] = suppressed
+    return suppressed
+
+
+def is_cache_candidate(element: dict, mowas_cache: ExpiringDict):
+    """
+    Checks if the message cache permits a MOWAS message to be sent. Same
+    rules as in process_mowas_data, but the cache remains unchanged
+
+    Parameters
+    ==========
+    element: 'dict'
+        MOWAS message
+    mowas_cache: 'ExpiringDict'
+        Message cache, see process_mowas_data
+
+    Returns
+    =======
+    is_candidate: 'bool'
+        True if process_mowas_data may send this message
+    """
+    mowas_identifier = element["identifier"]
+    mowas_msgtype = element["msgType"]
+    if mowas_msgtype == "Cancel":
+        return mowas_identifier in mowas_cache
+    if mowas_msgtype == "Update":
+        mowas_payload = mowas_cache.get(mowas_identifier)
+        return mowas_payload is None or (
+            mowas_payload["msgtype"] == mowas_msgtype
+            and mowas_payload["sent"] != element["sent"]
+        )
+    return mowas_identifier not in mowas_cache
+
+
+def get_candidate_feed_data(
+    mowas_feed_data: dict,
+    mowas_active_categories: list,
+    mowas_caches: list,
+    minimal_mowas_severity: str,
+    covid_messaging_settings: set,
+    content_filter_rules: list,
+    alert_records: dict,
+):
+    """
+    Returns the MOWAS messages which may lead to an outgoing message: the
+    message cache, severity and content filter checks of process_mowas_data
+    are done before any geometry work, and only the remaining messages
+    need to be matched against our coordinates. With more than one message
+    cache (multi-tenant mode), a message is kept if at least one cache
+    permits it.
+
+    Parameters
+    ==========
+    mowas_feed_data: 'dict'
+        MOWAS data, see get_mowas_feed_data
+    mowas_active_categories: 'list'
+        List of active categories
+    mowas_caches: 'list'
+        List of message caches, see process_mowas_data
+    minimal_mowas_severity: 'str'
+        Lowest severity level that we need to process
+    covid_messaging_settings: 'set'
+        'enable_covid_messaging' values in use; a message is only
+        discarded if all of these settings suppress it
+    content_filter_rules: 'list'
+        Optional user-defined content filter rules, see contentfilter.py
+    alert_records: 'dict'
+        The cycle's alert records (stores the content filter results),
+        see create_alert_records
+
+    Returns
+    =======
+    candidate_feed_data: 'dict'
+        MOWAS data, reduced to the messages which may need to be sent
+    """
+    active_feed_data = {
+        mowas_category: mowas_feed_data[mowas_category]
+        for mowas_category in mowas_feed_data
+        if mowas_category in mowas_active_categories
+    }
+
+    # A message whose identifier shows up more than once may change the
+    # cache for the other copies; these messages are always kept
+    identifier_counts = {}
+    for json_data in active_feed_data.values():
+        for element in json_data:
+            mowas_identifier = element["identifier"]
+            identifier_counts[mowas_identifier] = (
+                identifier_counts.get(mowas_identifier, 0) + 1
+            )
+
+    minimal_severity_index = typedef_mowas_severity.index(minimal_mowas_severity)
+    candidate_feed_data = {}
+    for mowas_category, json_data in active_feed_data.items():
+        candidate_feed_data[mowas_category] = [
+            element
+            for element in json_data
+            if len(element["info"]) > 0
+            and (
+                identifier_counts[element["identifier"]] > 1
+                or any(
+                    is_cache_candidate(element=element, mowas_cache=mowas_cache)
+                    for mowas_cache in mowas_caches
+                )
+            )
+            and typedef_mowas_severity.index(element["info"][0]["severity"])
+            >= minimal_severity_index
+            and not all(
+                is_alert_suppressed(
+                    alert_records=alert_records,
+                    mowas_category=mowas_category,
+                    element=element,
+                    enable_covid_messaging=enable_covid_messaging,
+                    content_filter_rules=content_filter_rules,
+                )
+                for enable_covid_messaging in covid_messaging_settings
+            )
+        ]
+    return candidate_feed_data
+
+
+def get_watch_point_locators(watch_points: list):
+    """
+    Returns the Maidenhead / UTM coordinates for a list of watch points.
+    All watch points are converted in one go.
+
+    Parameters
+    ==========
+    watch_points: 'list'
+        List of watch points
+
+    Returns
+    =======
+    watch_point_locators: 'dict'
+        Key: watch point
+        Value: (Maidenhead coordinates, UTM coordinates) tuple
+    """
+    latitudes = [watch_point.latitude for watch_point in watch_points]
+    longitudes = [watch_point.longitude for watch_point in watch_points]
+    maidenhead_list = convert_latlon_array_to_maidenhead(
+        latitudes=latitudes, longitudes=longitudes
+    )
+    zone_numbers, zone_letters, eastings, northings = convert_latlon_array_to_utm(
+        latitudes=latitudes, longitudes=longitudes
+    )
+    return {
+        watch_point: (maidenhead, f"{zone_number} {zone_letter} {easting} {northing}")
+        for watch_point, maidenhead, zone_number, zone_letter, easting, northing in zip(
+            watch_points,
+            maidenhead_list,
+            zone_numbers.tolist(),
+            zone_letters.tolist(),
+            eastings.tolist(),
+            northings.tolist(),
+        )
+    }
+
+
+def get_matching_watch_point_locators(coordinates: list, area_match_table: dict):
+    """
+    Returns the Maidenhead / UTM coordinates of all watch points which
+    match with at least one MOWAS area and whose details are not cached yet
+
+    Parameters
+    ==========
+    coordinates: 'list'
+        List of [latitude, longitude] and [latitude, longitude, radius]
+        coordinates
+    area_match_table: 'dict'
+        Matching coordinates per area, see geomatch.build_area_match_table
+
+    Returns
+    =======
+    watch_point_locators: 'dict'
+        Key: watch point
+        Value: (Maidenhead coordinates, UTM coordinates) tuple
+    """
+    matched = set().union(*area_match_table.values())
+    watch_points = dict.fromkeys(
+        WatchPoint(latitude=coord[0], longitude=coord[1])
+        for coord in coordinates
+        if (coord[0], coord[1]) in matched or get_watch_zone(coord) in matched
+    )
+    return get_watch_point_locators(
+        watch_points=[
+            watch_point
+            for watch_point in watch_points
+            if watch_point not in watch_point_details_cache
+        ]
+    )
+
+
+def get_watch_point_details(watch_point: WatchPoint, watch_point_locators: dict = None):
+    """
+    Returns the address and the Maidenhead / UTM coordinates for a watch
+    point. Results are cached unless the address could not be determined.
+
+    Parameters
+    ==========
+    watch_point: 'WatchPoint'
+        The watch point's coordinates
+    watch_point_locators: 'dict'
+        Optional Maidenhead / UTM coordinates which have already been
+        determined for this cycle, see get_watch_point_locators
+
+    Returns
+    =======
+    address: 'str'
+        The watch point's address
+    maidenhead: 'str'
+        Maidenhead coordinates
+    utm: 'str'
+        UTM coordinates
+    """
+    details = watch_point_details_cache.get(watch_point)
+    if details:
+        increment_counter("mowas_geocoder_cache_hits_total")
+        return details
+
+    # get the address details so that we don't need to retrieve it
+    # for each communication method, Note that the target language will
+    # always be "de" - we will not translate this content
+    success, response_data = get_reverse_geopy_data(
+        latitude=watch_point.latitude, longitude=watch_point.longitude
+    )
+    address = response_data["address"] if success else "Cannot determine address data"
+
+    # get the maidenhead and UTM coordinates
+    if not watch_point_locators or watch_point not in watch_point_locators:
+        watch_point_locators = get_watch_point_locators(watch_points=[watch_point])
+    maidenhead, utm = watch_point_locators[watch_point]
+
+    details = (address, maidenhead, utm)
+    # Don't cache failed lookups; we will retry them during the next cycle
+    if success:
+        watch_point_details_cache[watch_point] = details
+    return details
+
+
+def download_mowas_data(base_url: str, url_path: str, mowas_category: str = None):
     """
     Function which (tries to) download content from the MOWAS servers
     Parameters
@@ -51,22 +492,39 @@ def download_mowas_data(base_url: str, url_path: str):
             Server base URL (usually fixed, e.g. https://warnung.bund.de)
     url_path : 'str'
             Server URL path (dependent on the MOWAS category that we intend to download)
+    mowas_category : 'str'
+            MOWAS category (only used for the metrics)
     Returns
     =======
     success : 'bool'
             True if operation was successful
     json_response: 'dict'
             Dictionary which contains the corresponding JSON object
+    content_hash: 'str'
+            SHA-256 hash of the downloaded content (or None). Allows us to
+            detect whether the content has changed since the previous download
     """
 
     url = f"{base_url}{url_path}"
     json_response = None
+    content_hash = None
 
+    fetch_start = time.perf_counter()
     try:
         resp = requests.get(url)
     except Exception as ex:
         resp = None
+    observe_duration(
+        "mowas_fetch_seconds",
+        time.perf_counter() - fetch_start,
+        category=mowas_category,
+    )
+    if resp is None or resp.status_code != 200:
+        increment_counter("mowas_fetch_errors_total", category=mowas_category)
     if resp:
+        increment_counter(
+            "mowas_fetch_bytes_total", len(resp.content), category=mowas_category
+        )
         if resp.status_code == 200:
             # Crude yet effective check. MOWAS does perform redirects and the
             # requests library's "history" flag does not seem to be set for these
@@ -76,6 +534,7 @@ def download_mowas_data(base_url: str, url_path: str):
             if resp.text.startswith("[") and resp.text.endswith("]"):
                 try:
                     json_response = resp.json()
+                    content_hash = hashlib.sha256(resp.content).hexdigest()
                 except Exception as ex:
                     json_response = None
             else:
@@ -84,7 +543,73 @@ def download_mowas_data(base_url: str, url_path: str):
             json_response = None
 
     success = True if json_response else False
-    return success, json_response
+    return success, json_response, content_hash
+
+
+def get_mowas_feed_data(
+    mowas_active_categories: list,
+    local_file_name: str = None,
+    mowas_content_hashes: dict = None,
+):
+    """
+    Downloads the MOWAS data for all active categories
+
+    Parameters
+    ==========
+    mowas_active_categories: 'list'
+        List of active categories (from the program config file)
+    local_file_name: 'str"
+        For local testing; digests local file instead of online content
+        (if filename has been supplied). The file's content is assigned
+        to the first active category
+    mowas_content_hashes: 'dict'
+        Optional dictionary. If present, the function stores the content
+        hash of each downloaded MOWAS category in this dictionary
+
+    Returns
+    =======
+    mowas_feed_data: 'dict'
+        Dictionary with the MOWAS category as key and the category's
+        JSON content as value. Categories whose content could not be
+        downloaded are not part of the dictionary
+    """
+    mowas_feed_data = {}
+
+    # For each of our own categories, try to download the MOWAS data
+    for mowas_category in mowas_dictionary:
+        # Only process this category if it is set as "active"
+        # in the program config file
+        if mowas_category not in mowas_active_categories:
+            continue
+
+        # Check if we have a local file name for testing
+        if local_file_name:
+            logger.info(msg=f"Entering local file test mode; file '{local_file_name}'")
+            with open(f"{local_file_name}", "rb") as f:
+                file_content = f.read()
+            json_data = json.loads(file_content)
+            content_hash = hashlib.sha256(file_content).hexdigest()
+            success = True
+        else:
+            # do the real thing
+            # OK, let's try to get that data from the government server
+            success, json_data, content_hash = download_mowas_data(
+                base_url=mowas_base_url,
+                url_path=mowas_dictionary[mowas_category],
+                mowas_category=mowas_category,
+            )
+            logger.debug(msg=f"Processing mowas_category {mowas_category}: {success}")
+
+        if mowas_content_hashes is not None:
+            mowas_content_hashes[mowas_category] = content_hash
+        if success:
+            mowas_feed_data[mowas_category] = json_data
+
+        # We only process the local file once
+        if local_file_name:
+            break
+
+    return mowas_feed_data
 
 
 def process_mowas_data(
@@ -96,19 +621,28 @@ def process_mowas_data(
     enable_covid_messaging: bool = False,
     target_language: str = None,
     deepl_api_key: str = None,
-    aprs_latitude: float = None,
-    aprs_longitude: float = None,
+    aprs_positions: dict = None,
     local_file_name: str = None,
     text_summarizer: str = None,
     text_summarizer_api_key: str = None,
     generate_sms_messages: bool = False,
+    mowas_content_hashes: dict = None,
+    mowas_feed_data: dict = None,
+    area_match_table: dict = None,
+    geocode_index: dict = None,
+    content_filter_rules: list = None,
+    geometry_pool: dict = None,
+    watch_point_locators: dict = None,
+    alert_records: dict = None,
 ):
     """
     Process our MOWAS data and return a dictionary with messages that are to be sent to the user
     Parameters
     ==========
     coordinates : 'list'
-        List item, containing 0..n dictionaries with lat/lon coordinates that we are supposed to check
+        List item, containing 0..n dictionaries with lat/lon coordinates that we are supposed to check.
+        Watch zones are given as [latitude, longitude, radius] (radius in meters) and match
+        all areas within that distance
     mowas_cache : 'ExpiringDict'
         ExpiringDict which contains the "Alert" and "Update" messages from a previous run that were
         sent to the user. "Cancel" messages are not included - they may only be sent out once.
@@ -123,6 +657,9 @@ def process_mowas_data(
         List of active categories (from the program's config file)
     enable_covid_messaging: 'bool'
         Enables Covid messages (usually, they get suppressed)
+    content_filter_rules: 'list'
+        Optional user-defined content filter rules, see contentfilter.py.
+        Messages which match any of these rules get suppressed
     local_file_name: 'str"
         For local testing; digests local file instead of online content
         (if filename has been supplied)
@@ -130,23 +667,52 @@ def process_mowas_data(
         If not 'None', this is the language that we need to supply in addition to the German data
     deepl_api_key: 'str'
         deepl.com API key
-    aprs_latitude: 'float'
-        optional APRS latitude
-    aprs_longitude: 'float'
-        optional aprs_longitude
+    aprs_positions: 'dict'
+        optional call sign label per WatchPoint for the tracked APRS positions
     text_summarizer: 'str'
         One of the supported text summarizer identifiers, see text_post_processor.py (or None)
     text_summarizer_api_key: 'str'
         Associated API key (or None)
     generate_sms_messages: 'bool'
         if True, text summarizer needs to be defined
+    mowas_content_hashes: 'dict'
+        Optional dictionary. If present, the function stores the content
+        hash of each downloaded MOWAS category in this dictionary
+    mowas_feed_data: 'dict'
+        Optional MOWAS data, see get_mowas_feed_data. If 'None', the
+        function downloads the data on its own
+    area_match_table: 'dict'
+        Optional precomputed matches between the MOWAS areas and
+        the coordinates, see geomatch.build_area_match_table. Must
+        have been built from 'mowas_feed_data' (or from the result of
+        get_candidate_feed_data for less restrictive settings) for a
+        superset of 'coordinates'. If 'None', the function matches the
+        areas of all messages which pass our cache, severity and
+        content filter checks on its own
+    geocode_index: 'dict'
+        Optional geocode index, see geomatch.create_geocode_index. Only
+        used if no 'area_match_table' has been provided
+    geometry_pool: 'dict'
+        Optional geometry worker pool, see geopool.create_geometry_pool.
+        Only used if no 'area_match_table' has been provided. If present,
+        the exact polygon tests are distributed across the pool's workers
+    watch_point_locators: 'dict'
+        Optional Maidenhead / UTM coordinates of the matching watch points,
+        see get_matching_watch_point_locators. If 'None', the function
+        converts the coordinates on its own
+    alert_records: 'dict'
+        Optional per-cycle alert records, see create_alert_records. Must
+        contain the area matches of 'area_match_table', see
+        set_alert_area_matches. All calls which share these records need
+        to use the same text summarizer and API keys. If 'None', the
+        function creates its own records
 
     Returns
     =======
     mowas_cache : 'ExpiringDict'
             (Potentially) updated version of the mowas_cache input parameter
     mowas_messages_to_send: 'dict'
-            Dictionary which contains the messages that we may need to send to the user
+            Dictionary which contains the messages (records.Alert) that we may need to send to the user
     """
 
     if mowas_active_categories == None:
@@ -169,22 +735,20 @@ def process_mowas_data(
     # Dictionary which may contain our outgoing messages (if present)
     mowas_messages_to_send = {}
 
-    # These are the official MOWAS URLs which our code will try to query
-    # Some of these URLs have no (longer?) any content
-    mowas_dictionary = {
-        "TEMPEST": "/bbk.dwd/unwetter.json",
-        "FLOOD_OLD": "/bbk.wsv/hochwasser.json",
-        "FLOOD": "/bbk.lhp/hochwassermeldungen.json",
-        "WILDFIRE": "/bbk.dwd/waldbrand.json",
-        "EARTHQUAKE": "/bbk.bgr/erdbeben.json",
-        "DISASTERS": "/bbk.mowas/gefahrendurchsagen.json",
-    }
+    # Watch points which are already part of an outgoing message
+    # (key: MOWAS identifier); used for our duplicate checks
+    mowas_messages_points = {}
+
+    # Hashable watch points; they are used for our duplicate checks.
+    # Watch zones (coordinates with a radius) are matched separately
+    watch_coordinates = coordinates
+    watch_zones = [get_watch_zone(coord) for coord in coordinates]
+    coordinates = [
+        WatchPoint(latitude=coord[0], longitude=coord[1]) for coord in coordinates
+    ]
 
     # Definitions for all possible valid values that MOWAS may provide us with
-    # Important:
-    # 'typedef_mowas_security' requires value changes to be added in increasing
-    # severity levels - we use this list for quite a few queries
-    typedef_mowas_severity = ["Minor", "Moderate", "Severe", "Extreme"]
+    # (see typedef_mowas_severity for the severity levels)
     typedef_mowas_msgtype = ["Alert", "Cancel", "Update"]
     typdef_mowas_status = ["Actual"]
     typedef_mowas_scope = ["Public"]
@@ -200,498 +764,461 @@ def process_mowas_data(
     # Alert or Update message
     got_alert_or_update = False
 
-    # Boolean marker for quick-and-dirty file handler
-    processed_our_file = False
+    # Get the MOWAS data for all of our active categories (unless
+    # the caller has already done this for us)
+    if mowas_feed_data is None:
+        mowas_feed_data = get_mowas_feed_data(
+            mowas_active_categories=mowas_active_categories,
+            local_file_name=local_file_name,
+            mowas_content_hashes=mowas_content_hashes,
+        )
 
-    # For each of our own categories, try to download the MOWAS data
-    for mowas_category in mowas_dictionary:
+    # Subscriber-independent message contents
+    if alert_records is None:
+        alert_records = create_alert_records()
+
+    # Messages which are already known, below our severity level or
+    # suppressed by the content filter are discarded before we look at
+    # their geometry. All remaining areas are matched in one go; the
+    # polygons and our coordinates are projected to a metric CRS once per call
+    if area_match_table is None:
+        area_match_table = build_area_match_table(
+            mowas_feed_data=get_candidate_feed_data(
+                mowas_feed_data=mowas_feed_data,
+                mowas_active_categories=mowas_active_categories,
+                mowas_caches=[mowas_cache],
+                minimal_mowas_severity=minimal_mowas_severity,
+                covid_messaging_settings={enable_covid_messaging},
+                content_filter_rules=content_filter_rules,
+                alert_records=alert_records,
+            ),
+            coordinates=watch_coordinates,
+            geocode_index=geocode_index,
+            geometry_pool=geometry_pool,
+        )
+
+    # Convert the coordinates of all matching watch points in one go
+    if watch_point_locators is None:
+        watch_point_locators = get_matching_watch_point_locators(
+            coordinates=watch_coordinates, area_match_table=area_match_table
+        )
+
+    if alert_records["watch_point_areas"] is None:
+        set_alert_area_matches(
+            alert_records=alert_records, area_match_table=area_match_table
+        )
+    area_matches = get_area_matches(
+        alert_records=alert_records, coordinates=watch_coordinates
+    )
+
+    for mowas_category in mowas_feed_data:
         # Only process this category if it is set as "active"
         # in the program config file
-        if mowas_category in mowas_active_categories:
-            # Check if we have a local file name for testing
-            if local_file_name:
-                # VERY quick and dirty handler - needs refactoring :)
-                # did we already get through this loop?
-                # yes => exit loop
-                if processed_our_file:
-                    break
-                logger.info(
-                    msg=f"Entering local file test mode; file '{local_file_name}'"
-                )
-                with open(f"{local_file_name}", "r") as f:
-                    if f.mode == "r":
-                        json_data = json.load(f)
-                processed_our_file = True
-                success = True
-            else:
-                # do the real thing
-                # OK, let's try to get that data from the government server
-                success, json_data = download_mowas_data(
-                    base_url="https://warnung.bund.de",
-                    url_path=mowas_dictionary[mowas_category],
-                )
-                logger.debug(
-                    msg=f"Processing mowas_category {mowas_category}: {success}"
-                )
-            if success:
-                for element in json_data:
-                    # general marker which tells us whether we should send this message
-                    # if it meets all criteria
-                    process_this_message = False
-
-                    # Extract the message's identifier - this is our message's primary key
-                    mowas_identifier = element["identifier"]
-
-                    # get the message's msgtype. Can either be Alert, Update or Cancel
-                    mowas_msgtype = element["msgType"]
-                    assert mowas_msgtype in typedef_mowas_msgtype
-
-                    # Get the timestamp when this message was sent
-                    mowas_sent = element["sent"]
-
-                    # Now let's check what we are supposed to do with this message
-                    # If the message is of type "Cancel", remove it from our ExpiringDict
-                    # (if present). The program guarantees that only the message types
-                    # "Alert" and "Update" are present in our list
-                    if mowas_msgtype == "Cancel":
-                        # Check if this message is present in our dict and remove it
-                        if mowas_identifier in mowas_cache:
-                            mowas_cache.pop(mowas_identifier)
-                            # We still want to send this "Cancel" message to the user
-                            # so let's ensure that we remember to do so. Still, the
-                            # cancel message is only sent if the message's geocoordinates
-                            # match with what the user has provided us with
-                            process_this_message = True
+        if mowas_category not in mowas_active_categories:
+            continue
+        json_data = mowas_feed_data[mowas_category]
 
-                    # If we deal with an "Update", there are a few situations that need
-                    # to be taken upder advisement:
-                    # 1) Key does not yet exist in our dictionary. ACTION: we will add it
-                    # 	 The entry may never have been added to the dictionary OR was
-                    # 	 present in the past but did experience its end-of-life
-                    # 2) Key does exist within our dictionary, but msgtype is not "Update"
-                    # 	 In this particular case, we might switch from "Action" to "Update".
-                    # 	 As the message's coordinate ranges may have changed, we will remove
-                    # 	 the entry from our dictionary and re-add it
-                    # 3) Key does exist within our dictionary AND msgtype is "Update". This
-                    # 	 will trigger no action on our end UNLESS the old "Update" message's
-                    # 	 time stamp differs with the one from the new message
-                    elif mowas_msgtype == "Update":
-                        # Do we have this entry in our expiring cache?
-                        if mowas_identifier in mowas_cache:
-                            # get the payload
-                            mowas_payload = mowas_cache[mowas_identifier]
-
-                            # then extract the msgtype from the payload
-                            mowas_cache_msgtype = mowas_payload["msgtype"]
-                            # Does its new status differ from the previous one? Then remove it
-                            # from our dictionary. This entry is either an Alert > Update or
-                            # Update > Alert (the latter should never happen)
-                            if mowas_cache_msgtype != mowas_msgtype:
-                                mowas_cache.pop(mowas_identifier)
-                            else:
-                                # message types are both "Update"
-                                # Get the timestamp on when the data was sent
-                                mowas_cache_sent = mowas_payload["sent"]
-                                # See if the timestamps differ. Hint: this is a string comparison
-                                # If both entries differ, then let's get rid of the previous entry
-                                if mowas_sent != mowas_cache_sent:
-                                    mowas_cache.pop(mowas_identifier)
-                                    # As the time stamps differ, remember that we may need to send
-                                    # this message if it fits our criteria
-                                    process_this_message = True
-                        else:
-                            # msgtype is "Update" but the message is not within our cache
-                            # Potential root causes:
-                            # 1) message was in the cache but has expired (and got removed)
-                            # 2) message was never in the case (e.g. due to a program restart)
-                            process_this_message = True
-                    elif mowas_msgtype == "Alert":
-                        # Is this entry NOT in our expiring cache? Then let's process it
-                        # Assumptions:
-                        # 1) Message status cannot move back from "Update" to "Alert"
-                        # 2) Whenever an "Alert" gets updated, its msgtype changes to "Update"
-                        if mowas_identifier not in mowas_cache:
-                            process_this_message = True
+        # Number of elements per processing result (for our metrics)
+        element_counts = dict.fromkeys(
+            ("seen", "unchanged", "below_severity", "matched", "suppressed"), 0
+        )
 
-                    # Now that we have determined if we should process this message or not,
-                    # let's have a look at the actual message itself - that is, if
-                    # we are supposed to process it.
-                    if process_this_message:
-                        mowas_status = element["status"]
-
-                        # All MOWAS messages only seen to have one (1) sub element only
-                        # but let's ensure that our present message actually has one.
-                        # Future program versions may also need to process elements 2..n
-                        # in case they are present.
-                        if len(element["info"]) > 0:
-                            # Get the Severity
-                            mowas_severity = element["info"][0]["severity"]
-
-                            # Crash for now if we encounter an unknown severity
-                            assert mowas_severity in typedef_mowas_severity
-
-                            # Loop to the next element in case our current message's
-                            # severity level is too low (based on the user's input parameters)
-                            # fmt: off
-                            if typedef_mowas_severity.index(mowas_severity) < typedef_mowas_severity.index(minimal_mowas_severity):
+        for element in json_data:
+            # general marker which tells us whether we should send this message
+            # if it meets all criteria
+            process_this_message = False
+            element_counts["seen"] += 1
+
+            # Extract the message's identifier - this is our message's primary key
+            mowas_identifier = element["identifier"]
+
+            # get the message's msgtype. Can either be Alert, Update or Cancel
+            mowas_msgtype = element["msgType"]
+            assert mowas_msgtype in typedef_mowas_msgtype
+
+            # Get the timestamp when this message was sent
+            mowas_sent = element["sent"]
+
+            # Now let's check what we are supposed to do with this message
+            # If the message is of type "Cancel", remove it from our ExpiringDict
+            # (if present). The program guarantees that only the message types
+            # "Alert" and "Update" are present in our list
+            if mowas_msgtype == "Cancel":
+                # Check if this message is present in our dict and remove it
+                if mowas_identifier in mowas_cache:
+                    mowas_cache.pop(mowas_identifier)
+                    # We still want to send this "Cancel" message to the user
+                    # so let's ensure that we remember to do so. Still, the
+                    # cancel message is only sent if the message's geocoordinates
+                    # match with what the user has provided us with
+                    process_this_message = True
+
+            # If we deal with an "Update", there are a few situations that need
+            # to be taken upder advisement:
+            # 1) Key does not yet exist in our dictionary. ACTION: we will add it
+            # 	 The entry may never have been added to the dictionary OR was
+            # 	 present in the past but did experience its end-of-life
+            # 2) Key does exist within our dictionary, but msgtype is not "Update"
+            # 	 In this particular case, we might switch from "Action" to "Update".
+            # 	 As the message's coordinate ranges may have changed, we will remove
+            # 	 the entry from our dictionary and re-add it
+            # 3) Key does exist within our dictionary AND msgtype is "Update". This
+            # 	 will trigger no action on our end UNLESS the old "Update" message's
+            # 	 time stamp differs with the one from the new message
+            elif mowas_msgtype == "Update":
+                # Do we have this entry in our expiring cache?
+                if mowas_identifier in mowas_cache:
+                    # get the payload
+                    mowas_payload = mowas_cache[mowas_identifier]
+
+                    # then extract the msgtype from the payload
+                    mowas_cache_msgtype = mowas_payload["msgtype"]
+                    # Does its new status differ from the previous one? Then remove it
+                    # from our dictionary. This entry is either an Alert > Update or
+                    # Update > Alert (the latter should never happen)
+                    if mowas_cache_msgtype != mowas_msgtype:
+                        mowas_cache.pop(mowas_identifier)
+                    else:
+                        # message types are both "Update"
+                        # Get the timestamp on when the data was sent
+                        mowas_cache_sent = mowas_payload["sent"]
+                        # See if the timestamps differ. Hint: this is a string comparison
+                        # If both entries differ, then let's get rid of the previous entry
+                        if mowas_sent != mowas_cache_sent:
+                            mowas_cache.pop(mowas_identifier)
+                            # As the time stamps differ, remember that we may need to send
+                            # this message if it fits our criteria
+                            process_this_message = True
+                else:
+                    # msgtype is "Update" but the message is not within our cache
+                    # Potential root causes:
+                    # 1) message was in the cache but has expired (and got removed)
+                    # 2) message was never in the case (e.g. due to a program restart)
+                    process_this_message = True
+            elif mowas_msgtype == "Alert":
+                # Is this entry NOT in our expiring cache? Then let's process it
+                # Assumptions:
+                # 1) Message status cannot move back from "Update" to "Alert"
+                # 2) Whenever an "Alert" gets updated, its msgtype changes to "Update"
+                if mowas_identifier not in mowas_cache:
+                    process_this_message = True
+
+            # Now that we have determined if we should process this message or not,
+            # let's have a look at the actual message itself - that is, if
+            # we are supposed to process it.
+            if not process_this_message:
+                element_counts["unchanged"] += 1
+            if process_this_message:
+                mowas_status = element["status"]
+
+                # All MOWAS messages only seen to have one (1) sub element only
+                # but let's ensure that our present message actually has one.
+                # Future program versions may also need to process elements 2..n
+                # in case they are present.
+                if len(element["info"]) > 0:
+                    # Get the Severity
+                    mowas_severity = element["info"][0]["severity"]
+
+                    # Crash for now if we encounter an unknown severity
+                    assert mowas_severity in typedef_mowas_severity
+
+                    # Loop to the next element in case our current message's
+                    # severity level is too low (based on the user's input parameters)
+                    # fmt: off
+                    if typedef_mowas_severity.index(mowas_severity) < typedef_mowas_severity.index(minimal_mowas_severity):
+                        element_counts["below_severity"] += 1
+                        continue
+                    #fmt: on
+
+                    # Check the priority level of the future message and bump it up if necessary
+                    # but lower its priority if we deal with a "Cancel" message
+                    # fmt: off
+                    if mowas_msgtype != "Cancel":
+                        high_prio_msg = True if typedef_mowas_severity.index(mowas_high_prio_level) >= typedef_mowas_severity.index(mowas_severity) else False
+                    else:
+                        high_prio_msg = False
+                    #fmt: on
+
+                    # Now let's extract the remaining information before we take a look at the message's geometric structure
+                    #fmt: off
+                    mowas_headline = element["info"][0]["headline"] if "headline" in element["info"][0] else None
+                    mowas_urgency = element["info"][0]["urgency"] if "urgency" in element["info"][0] else None
+                    mowas_severity = element["info"][0]["severity"] if "severity" in element["info"][0] else None
+                    mowas_contact = element["info"][0]["contact"] if "contact" in element["info"][0] else None
+                    mowas_description = element["info"][0]["description"] if "description" in element["info"][0] else None
+                    mowas_instruction = element["info"][0]["instruction"] if "instruction" in element["info"][0] else None
+                    # fmt:on
+
+                    # Check if the message needs to be suppressed (e.g. Covid content)
+                    if is_alert_suppressed(
+                        alert_records=alert_records,
+                        mowas_category=mowas_category,
+                        element=element,
+                        enable_covid_messaging=enable_covid_messaging,
+                        content_filter_rules=content_filter_rules,
+                    ):
+                        element_counts["suppressed"] += 1
+                        continue
+                    alert_content = get_alert_content(
+                        alert_records=alert_records,
+                        mowas_category=mowas_category,
+                        mowas_identifier=mowas_identifier,
+                    )
+
+                    # Extract the list of areas from the element
+                    areas = element["info"][0]["area"]
+
+                    # If any of the given lat/lon coordinates from the user match with
+                    # any of the given areas from this message, then we may want to send out
+                    # this message to the user
+                    area_matches_with_user_latlon = False
+
+                    # If we find a match then this list will contain all areas for
+                    # which we found a match related to our lat/lon coordinates
+                    # (dicts are used as insertion-ordered sets)
+                    areas_matching_latlon = {}
+                    coords_matching_latlon = {}
+                    latlon_array = []
+
+                    # Only the areas with at least one match need to be checked
+                    for area_index in area_matches.get(
+                        (mowas_category, mowas_identifier), ()
+                    ):
+                        area = areas[area_index]
+                        matched = area_match_table[
+                            (mowas_category, mowas_identifier, area_index)
+                        ]
+
+                        # Get all coordinates which are either inside of the polygon or
+                        # touch its borders (or whose watch zone intersects with it)
+                        matching_coordinates = [
+                            coord
+                            for coord, watch_zone in zip(coordinates, watch_zones)
+                            if coord in matched or watch_zone in matched
+                        ]
+
+                        if not matching_coordinates:
+                            continue
+
+                        # and set our global marker as we have found something
+                        area_matches_with_user_latlon = True
+
+                        # let's remember the area for which we had a match
+                        geocode_value = None
+                        area_desc = area["areaDesc"]
+                        if "geocode" in area:
+                            geocodes = area["geocode"]
+                            for geocode in geocodes:
+                                geocode_value = geocode["value"]
+
+                        # We have a match? Then let's remember what we have
+                        # The geocode is our primary mean of identification;
+                        # area_desc will only be used of the geocode cannot be found
+                        # (MOWAS does seem to use incorrect geocodes from time to time)
+                        areas_matching_latlon[
+                            Area(area_desc=area_desc, geocode=geocode_value)
+                        ] = None
+
+                        # Coord has the format latitude,longitude
+                        for coord in matching_coordinates:
+                            latitude = coord.latitude
+                            longitude = coord.longitude
+
+                            # Coordinates which have already matched with another area
+                            # of this message don't need to be looked up again
+                            if coord in coords_matching_latlon:
                                 continue
-                            #fmt: on
 
-                            # Check the priority level of the future message and bump it up if necessary
-                            # but lower its priority if we deal with a "Cancel" message
-                            # fmt: off
-                            if mowas_msgtype != "Cancel":
-                                high_prio_msg = True if typedef_mowas_severity.index(mowas_high_prio_level) >= typedef_mowas_severity.index(mowas_severity) else False
+                            # get the address and the Maidenhead / UTM coordinates
+                            address, maidenhead, utm = get_watch_point_details(
+                                watch_point=coord,
+                                watch_point_locators=watch_point_locators,
+                            )
+
+                            # check if these coordinates are one of the tracked APRS positions
+                            aprs_callsign = (
+                                aprs_positions.get(coord) if aprs_positions else None
+                            )
+
+                            # Remember the set of coordinates which caused that match
+                            coords_matching_latlon[coord] = Match(
+                                latitude=latitude,
+                                longitude=longitude,
+                                address=address,
+                                maidenhead=maidenhead,
+                                utm=utm,
+                                aprs_coordinates=aprs_callsign is not None,
+                                aprs_callsign=aprs_callsign,
+                            )
+
+                    # We went through all areas - now let's see of we found something
+                    if area_matches_with_user_latlon:
+                        element_counts["matched"] += 1
+
+                        # remove any HTML content (if present); we only need
+                        # to do this for messages which we may send to the user
+                        if alert_content["texts"] is None:
+                            alert_content["texts"] = (
+                                remove_html_content(mowas_headline),
+                                remove_html_content(mowas_description),
+                                remove_html_content(mowas_instruction),
+                                remove_html_content(mowas_contact),
+                            )
+                        (
+                            mowas_headline,
+                            mowas_description,
+                            mowas_instruction,
+                            mowas_contact,
+                        ) = alert_content["texts"]
+
+                        # The map shows the polygon of the very last area
+                        if alert_content["latlon_polygon"] is None:
+                            alert_content["latlon_polygon"] = convert_polygon_to_latlon(
+                                areas[-1]["polygon"][0]
+                            )
+                        latlon_array = alert_content["latlon_polygon"]
+
+                        # Add to the expiring dict unless it is a "Cancel" msg
+                        if mowas_msgtype != "Cancel":
+                            # Create the expiring dictionary's payload...
+                            mowas_cache_payload = {
+                                "msgtype": mowas_msgtype,
+                                "sent": mowas_sent,
+                            }
+                            # ... and add the entry to the expiring dict
+                            mowas_cache[mowas_identifier] = mowas_cache_payload
+
+                        ### create appreviated version but only if we need it
+                        if generate_sms_messages:
+                            mowas_sms_message = alert_content["sms_messages"].get(
+                                text_summarizer
+                            )
+                            if mowas_sms_message is not None:
+                                increment_counter(
+                                    "mowas_summarizer_cache_hits_total",
+                                    summarizer=text_summarizer,
+                                )
                             else:
-                                high_prio_msg = False
-                            #fmt: on
-
-                            # Now let's extract the remaining information before we take a look at the message's geometric structure
-                            #fmt: off
-                            mowas_headline = element["info"][0]["headline"] if "headline" in element["info"][0] else None
-                            mowas_urgency = element["info"][0]["urgency"] if "urgency" in element["info"][0] else None
-                            mowas_severity = element["info"][0]["severity"] if "severity" in element["info"][0] else None
-                            mowas_contact = element["info"][0]["contact"] if "contact" in element["info"][0] else None
-                            mowas_description = element["info"][0]["description"] if "description" in element["info"][0] else None
-                            mowas_instruction = element["info"][0]["instruction"] if "instruction" in element["info"][0] else None
-                            # fmt:on
-
-                            # remove any HTML content (if present)
-                            mowas_headline = remove_html_content(mowas_headline)
-                            mowas_instruction = remove_html_content(mowas_instruction)
-                            mowas_description = remove_html_content(mowas_description)
-                            mowas_contact = remove_html_content(mowas_contact)
-
-                            # Extract the list of areas from the element
-                            areas = element["info"][0]["area"]
-
-                            # If any of the given lat/lon coordinates from the user match with
-                            # any of the given areas from this message, then we may want to send out
-                            # this message to the user
-                            area_matches_with_user_latlon = False
-
-                            # If we find a match then this list will contain all areas for
-                            # which we found a match related to our lat/lon coordinates
-                            areas_matching_latlon = []
-                            geocodes_matching_latlon = []
-                            coords_matching_latlon = []
-                            latlon_array = []
-
-                            for area in areas:
-                                polygon = area["polygon"]
-                                # fmt: off
-                                # First, convert original MOWAS data to an array list
-                                lonlat_array = [point.split(",") for point in polygon[0].split(" ")]
-                                # and then convert it from lon/lat to lat/lon as we need that format later
-                                latlon_array = [(float(val[1]), float(val[0])) for val in lonlat_array]
-                                # fmt: on
-
-                                #
-                                numpy_array = np.array(latlon_array, dtype=np.float64)
-                                poly = Polygon(numpy_array)
-
-                                # Coord has the format latitude,longitude
-                                for coord in coordinates:
-                                    latitude = coord[0]
-                                    longitude = coord[1]
-
-                                    # Let's create our coordinate that we want to check
-                                    area_match = False
-                                    try:
-                                        p = Point(latitude, longitude)
-
-                                        # Check if we are either inside of the polygon or
-                                        # touch its borders
-                                        area_match = p.within(poly) or p.intersects(
-                                            poly
-                                        )
-
-                                    except Exception as ex:
-                                        exc_type, exc_value, exc_tb = sys.exc_info()
-                                        logger.info(
-                                            msg=f"Exception occurred: {exc_value}"
-                                        )
-                                        if exc_tb is not None:
-                                            prev = exc_tb
-                                            curr = exc_tb.tb_next
-                                            while curr is not None:
-                                                prev = curr
-                                                curr = curr.tb_next
-                                            logger.info(
-                                                msg=pformat(prev.tb_frame.f_locals)
-                                            )
-                                            logger.info(msg=pformat(locals()))
-                                            sys.exit(0)
-
-                                    # and set our global marker if we have found something
-                                    area_matches_with_user_latlon = (
-                                        True
-                                        if area_match
-                                        else area_matches_with_user_latlon
-                                    )
-
-                                    # if we have found something for the current area, then
-                                    # let's remember the area for which we had a match
-                                    if area_match:
-                                        geocode_value = None
-                                        area_desc = area["areaDesc"]
-                                        if "geocode" in area:
-                                            geocodes = area["geocode"]
-                                            for geocode in geocodes:
-                                                geocode_value = geocode["value"]
-
-                                        # We have a match? Then let's remember what we have
-                                        # Try to shorten the area names as this string is rather lengthy
-                                        if area_desc not in areas_matching_latlon:
-                                            areas_matching_latlon.append(area_desc)
-
-                                        # Save the geocodes, too. This is our primary mean of identification
-                                        # area_desc will only be used of the geocode cannot be found
-                                        # (MOWAS does seem to use incorrect geocodes from time to time)
-                                        if (
-                                            geocode_value
-                                            not in geocodes_matching_latlon
-                                        ):
-                                            geocodes_matching_latlon.append(
-                                                geocode_value
-                                            )
-
-                                        # get the address details so that we don't need to retrieve it
-                                        # for each communication method, Note that the target language will
-                                        # always be "de" - we will not translate this content
-                                        success, response_data = get_reverse_geopy_data(
-                                            latitude=latitude, longitude=longitude
-                                        )
-                                        address = (
-                                            response_data["address"]
-                                            if success
-                                            else "Cannot determine address data"
-                                        )
-
-                                        # calculate the maidenhead coordinates
-                                        maidenhead = convert_latlon_to_maidenhead(
-                                            latitude=latitude, longitude=longitude
-                                        )
-
-                                        # calculate the UTM coordinates
-                                        (
-                                            zone_number,
-                                            zone_letter,
-                                            easting,
-                                            northing,
-                                        ) = convert_latlon_to_utm(
-                                            latitude=latitude, longitude=longitude
-                                        )
-                                        utm = f"{zone_number} {zone_letter} {easting} {northing}"
-
-                                        # check if these coordinates are identical to the user's current APRS coordinates
-                                        aprs = (
-                                            True
-                                            if latitude == aprs_latitude
-                                            and longitude == aprs_longitude
-                                            else False
-                                        )
-
-                                        # Remember the set of coordinates which caused that match
-                                        mowas_coordinates = {
-                                            "latitude": latitude,
-                                            "longitude": longitude,
-                                            "address": address,
-                                            "maidenhead": maidenhead,
-                                            "utm": utm,
-                                            "aprs_coordinates": aprs,
-                                        }
-                                        if (
-                                            mowas_coordinates
-                                            not in coords_matching_latlon
-                                        ):
-                                            coords_matching_latlon.append(
-                                                mowas_coordinates
-                                            )
-
-                            # We went through all areas - now let's see of we found something
-                            if area_matches_with_user_latlon:
-                                # Check if Covid content is present. If yes, then check if
-                                # the user wants to receive Covid news
-                                add_data = True
-
-                                # Check if the message contains Covid content and flag the
-                                # message as "not to be added" if related content has been found
-                                if not enable_covid_messaging:
-                                    # some of these field values can have None data type
-                                    # We only use this data temporarily so if the field value is None,
-                                    # we replace this value with "" for our quick check
-                                    _headline = (
-                                        mowas_headline.lower() if mowas_headline else ""
-                                    )
-                                    _description = (
-                                        mowas_description.lower()
-                                        if mowas_description
-                                        else ""
-                                    )
-                                    _instruction = (
-                                        mowas_instruction.lower()
-                                        if mowas_instruction
-                                        else ""
-                                    )
-                                    content = [
-                                        _headline,
-                                        _description,
-                                        _instruction,
-                                    ]
-                                    if (
-                                        any("covid" in s for s in content)
-                                        or any("corona" in s for s in content)
-                                        or any("impfung" in s for s in content)
-                                    ):
-                                        add_data = False
-
-                                # Add to the expiring dict unless it is a "Cancel" msg
-                                if mowas_msgtype != "Cancel":
-                                    # Create the expiring dictionary's payload...
-                                    mowas_cache_payload = {
-                                        "msgtype": mowas_msgtype,
-                                        "sent": mowas_sent,
-                                    }
-                                    # ... and add the entry to the expiring dict
-                                    if add_data:
-                                        mowas_cache[
-                                            mowas_identifier
-                                        ] = mowas_cache_payload
-
-                                ### create appreviated version but only if we need it
-                                if generate_sms_messages:
-                                    mowas_sms_message = f"{mowas_headline} {mowas_description} {mowas_instruction}"
-
-                                    mowas_sms_message = create_text_summary(
-                                        input_text=mowas_sms_message,
-                                        post_processor=text_summarizer,
-                                        api_key=text_summarizer_api_key,
-                                    )
-                                else:
-                                    mowas_sms_message = ""
-
-                                # Create the outgoing message's payload ...
-                                mowas_messages_to_send_payload = {
-                                    "headline": mowas_headline,
-                                    "urgency": mowas_urgency,
-                                    "severity": mowas_severity,
-                                    "description": mowas_description,
-                                    "instruction": mowas_instruction,
-                                    "sms_message": mowas_sms_message,
-                                    "sent": mowas_sent,
-                                    "msgtype": mowas_msgtype,
-                                    "areas": areas_matching_latlon,
-                                    "geocodes": geocodes_matching_latlon,
-                                    "high_prio": high_prio_msg,
-                                    "latlon_polygon": latlon_array,
-                                    "coords_matching_latlon": coords_matching_latlon,
-                                    "contact": mowas_contact,
-                                }
-                                # If we have been asked to translate the content, then let's
-                                # first add the target language to the dictionary, translate
-                                # the content and then add the content to the dictionary
-                                if target_language:
-                                    mowas_messages_to_send_payload[
-                                        "lang"
-                                    ] = target_language
-
-                                    # prepare the content that we need to translate
-                                    content_list = [
-                                        mowas_headline,
-                                        mowas_description,
-                                        mowas_instruction,
-                                        mowas_contact,
-                                        mowas_sms_message,
-                                    ]
-                                    # translate the content
-                                    (
-                                        mowas_headline,
-                                        mowas_description,
-                                        mowas_instruction,
-                                        mowas_contact,
-                                        mowas_sms_message,
-                                    ) = translate_text_list(
-                                        deepl_api_key=deepl_api_key,
-                                        target_language=target_language,
-                                        original_text=content_list,
-                                    )
-
-                                    # and add the translated content to the dict as extra fields
-                                    mowas_messages_to_send_payload[
-                                        "lang_headline"
-                                    ] = mowas_headline
-                                    mowas_messages_to_send_payload[
-                                        "lang_description"
-                                    ] = mowas_description
-                                    mowas_messages_to_send_payload[
-                                        "lang_instruction"
-                                    ] = mowas_instruction
-                                    mowas_messages_to_send_payload[
-                                        "lang_contact"
-                                    ] = mowas_contact
-                                    mowas_messages_to_send_payload[
-                                        "lang_sms_message"
-                                    ] = mowas_sms_message
-
-                                # ... and add it to our dictionary (or update an existing element)
-                                # This code assumes that MOWAS uses unique message identifiers across
-                                # its various categories
-                                if add_data:
-                                    # Check if we have already received this message
-                                    if mowas_identifier not in mowas_messages_to_send:
-                                        # No - then let's add it
-                                        mowas_messages_to_send[
-                                            mowas_identifier
-                                        ] = mowas_messages_to_send_payload
-                                    else:
-                                        # Message is already present; we may need to update it
-                                        existing_message = mowas_messages_to_send[
-                                            mowas_identifier
-                                        ]
-                                        existing_coords = existing_message[
-                                            "coords_matching_latlon"
-                                        ]
-
-                                        # amend the existing set of coordinates, if necessary
-                                        for coord in coords_matching_latlon:
-                                            if coord not in existing_coords:
-                                                existing_coords.append(coord)
-
-                                        # replace the entry in the dict element
-                                        existing_message[
-                                            "coords_matching_latlon"
-                                        ] = existing_coords
-
-                                        # Finally, update the amended entry
-                                        mowas_messages_to_send[
-                                            mowas_identifier
-                                        ] = existing_message
-
-                                # Finally, check if the message is either "Alert" or
-                                # "Update". We need this info at a later point in time
-                                if mowas_msgtype in ("Alert", "Update"):
-                                    got_alert_or_update = True
+                                mowas_sms_message = create_text_summary(
+                                    input_text=f"{mowas_headline} {mowas_description} {mowas_instruction}",
+                                    post_processor=text_summarizer,
+                                    api_key=text_summarizer_api_key,
+                                )
+                                alert_content["sms_messages"][
+                                    text_summarizer
+                                ] = mowas_sms_message
+                        else:
+                            mowas_sms_message = ""
+
+                        # If we have been asked to translate the content, then let's
+                        # translate it; the translated content is sent in addition
+                        # to the original German content
+                        lang_content = {}
+                        lang_content_key = (target_language, mowas_sms_message)
+                        if target_language:
+                            lang_content = alert_content["lang_contents"].get(
+                                lang_content_key, {}
+                            )
+                            if lang_content:
+                                increment_counter("mowas_translator_cache_hits_total")
+                        if target_language and not lang_content:
+                            # prepare the content that we need to translate
+                            content_list = [
+                                mowas_headline,
+                                mowas_description,
+                                mowas_instruction,
+                                mowas_contact,
+                                mowas_sms_message,
+                            ]
+                            # translate the content
+                            (
+                                lang_content["lang_headline"],
+                                lang_content["lang_description"],
+                                lang_content["lang_instruction"],
+                                lang_content["lang_contact"],
+                                lang_content["lang_sms_message"],
+                            ) = translate_text_list(
+                                deepl_api_key=deepl_api_key,
+                                target_language=target_language,
+                                original_text=content_list,
+                            )
+                            lang_content["lang"] = target_language
+                            alert_content["lang_contents"][
+                                lang_content_key
+                            ] = lang_content
+
+                        # Create the outgoing message's payload ...
+                        mowas_messages_to_send_payload = Alert(
+                            headline=mowas_headline,
+                            urgency=mowas_urgency,
+                            severity=mowas_severity,
+                            description=mowas_description,
+                            instruction=mowas_instruction,
+                            sms_message=mowas_sms_message,
+                            sent=mowas_sent,
+                            msgtype=mowas_msgtype,
+                            areas=tuple(areas_matching_latlon),
+                            high_prio=high_prio_msg,
+                            latlon_polygon=latlon_array,
+                            coords_matching_latlon=list(
+                                coords_matching_latlon.values()
+                            ),
+                            contact=mowas_contact,
+                            **lang_content,
+                        )
+
+                        # ... and add it to our dictionary (or update an existing element)
+                        # This code assumes that MOWAS uses unique message identifiers across
+                        # its various categories
+                        # Check if we have already received this message
+                        if mowas_identifier not in mowas_messages_to_send:
+                            # No - then let's add it
+                            mowas_messages_to_send[
+                                mowas_identifier
+                            ] = mowas_messages_to_send_payload
+                            mowas_messages_points[mowas_identifier] = set(
+                                coords_matching_latlon
+                            )
+                        else:
+                            # Message is already present; amend its existing
+                            # set of coordinates, if necessary
+                            existing_coords = mowas_messages_to_send[
+                                mowas_identifier
+                            ].coords_matching_latlon
+                            known_points = mowas_messages_points[mowas_identifier]
+                            for point, coord in coords_matching_latlon.items():
+                                if point not in known_points:
+                                    existing_coords.append(coord)
+                                    known_points.add(point)
+
+                        # Finally, check if the message is either "Alert" or
+                        # "Update". We need this info at a later point in time
+                        if mowas_msgtype in ("Alert", "Update"):
+                            got_alert_or_update = True
+
+        for result, count in element_counts.items():
+            increment_counter(
+                "mowas_elements_total", count, category=mowas_category, result=result
+            )
 
     # finally, render any static images, if necessary
     for mowas_identifier in mowas_messages_to_send:
         existing_message = mowas_messages_to_send[mowas_identifier]
 
         # get the polygon and the target coordinates
-        latlon_polygon = existing_message["latlon_polygon"]
-        coords_matching_latlon = existing_message["coords_matching_latlon"]
+        latlon_polygon = existing_message.latlon_polygon
+        coords_matching_latlon = existing_message.coords_matching_latlon
 
         # render the image
         image_file_name = render_png_map(
             polygon_area=latlon_polygon,
             monitoring_positions=coords_matching_latlon,
-            aprs_latitude=aprs_latitude,
-            aprs_longitude=aprs_longitude,
         )
 
         # and write the local file name back to our dictionary
-        existing_message["static_image"] = image_file_name
-        mowas_messages_to_send[mowas_identifier] = existing_message
+        mowas_messages_to_send[mowas_identifier] = existing_message._replace(
+            static_image=image_file_name
+        )
 
     # Return the expiring cache and our messages to the user
     return mowas_cache, mowas_messages_to_send, got_alert_or_update
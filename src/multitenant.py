@@ -0,0 +1,288 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: multi-tenant mode - one process serving many subscribers
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Each MOWAS category is downloaded and parsed once per cycle. All
+# subscribers' watch coordinates are then matched against all MOWAS areas
+# in one go (see geomatch.build_area_match_table); the results are
+# fanned out to the subscribers, each of them with their own message
+# cache, warning levels, categories, language and messaging targets.
+# Messages which none of the subscribers may receive (message caches,
+# warning levels and content filter) are discarded before the spatial join.
+# The subscriber-independent parts of each message (content filter
+# results, cleaned texts, map polygon, SMS summary and translations) are
+# created once per cycle and shared by all subscribers (see
+# mowas.create_alert_records); the subscribers merely filter the
+# messages by category, severity and message cache.
+#
+import logging
+from expiringdict import ExpiringDict
+from mowas import (
+    create_alert_records,
+    get_candidate_feed_data,
+    get_matching_watch_point_locators,
+    get_mowas_feed_data,
+    process_mowas_data,
+    set_alert_area_matches,
+    typedef_mowas_severity,
+)
+from geomatch import build_area_match_table
+from outputgenerator import dispatch_mowas_messages
+from utils import image_garbage_collector
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def create_subscriber_caches(subscriber_profiles: list, time_to_live: int):
+    """
+    Creates one message cache per subscriber
+
+    Parameters
+    ==========
+    subscriber_profiles: 'list'
+        List of subscriber profiles, see utils.get_subscriber_profiles_from_file
+    time_to_live: 'int'
+        Message 'time to live' setting in minutes
+
+    Returns
+    =======
+    subscriber_caches: 'dict'
+        Subscriber name as key, the subscriber's ExpiringDict as value
+    """
+    return {
+        profile["name"]: ExpiringDict(max_len=1000, max_age_seconds=time_to_live * 60)
+        for profile in subscriber_profiles
+    }
+
+
+def run_multitenant_cycle(
+    mowas_categories: list,
+    subscriber_profiles: list,
+    subscriber_caches: dict,
+    warncell_data: dict,
+    email_enabled: bool = False,
+    smtpimap_email_address: str = None,
+    smtpimap_email_password: str = None,
+    smtp_server_address: str = None,
+    smtp_server_port: int = 0,
+    deepl_api_key: str = None,
+    text_summarizer: str = None,
+    text_summarizer_api_key: str = None,
+    sms_message_length: int = 67,
+    sms_message_split: bool = False,
+    local_file_name: str = None,
+    dispatch_messages: bool = True,
+    mowas_feed_data: dict = None,
+    geocode_index: dict = None,
+    content_filter_rules: list = None,
+    geometry_pool: dict = None,
+):
+    """
+    Runs one processing cycle for all subscribers
+
+    Parameters
+    ==========
+    mowas_categories: 'list'
+        MOWAS categories that we are supposed to process
+    subscriber_profiles: 'list'
+        List of subscriber profiles, see utils.get_subscriber_profiles_from_file
+    subscriber_caches: 'dict'
+        Message cache per subscriber, see create_subscriber_caches
+    warncell_data: 'dict'
+        warncell data; these are references to German municipal areas, cities etc
+    email_enabled: 'bool'
+        True if the sender's Email account is configured
+    smtpimap_email_address: str
+        This is the SENDER's SMTP Email Address
+    smtpimap_email_password: str
+        This is the SENDER's SMTP Email Password
+    smtp_server_address: 'str'
+        SMTP server address
+    smtp_server_port: 'int'
+        SMTP server port
+    deepl_api_key: 'str'
+        deepl.com API key (for subscribers with a target language)
+    text_summarizer: 'str'
+        One of the supported text summarizer identifiers, see text_post_processor.py
+    text_summarizer_api_key: 'str'
+        Associated API key (or None)
+    sms_message_length: 'int'
+        length of an SMS message
+    sms_message_split: 'bool'
+        False: Truncate after 'sms_message_length' characters
+        True: Build 1..n messages of 'sms_message_length' length
+    local_file_name: 'str"
+        For local testing; digests local file instead of online content
+    dispatch_messages: 'bool'
+        If False, the messages are generated but not sent (benchmarks)
+    mowas_feed_data: 'dict'
+        Optional MOWAS data, see mowas.get_mowas_feed_data. If 'None', the
+        function downloads the data on its own
+    geocode_index: 'dict'
+        Optional geocode index for all subscribers' coordinates,
+        see geomatch.create_geocode_index
+    content_filter_rules: 'list'
+        Optional user-defined content filter rules (for all subscribers),
+        see utils.get_content_filter_rules_from_file
+    geometry_pool: 'dict'
+        Optional geometry worker pool, see geopool.create_geometry_pool
+
+    Returns
+    =======
+    got_alert_or_update: 'bool'
+        True if at least one Alert or Update message was sent to at
+        least one of the subscribers
+    mowas_content_hashes: 'dict'
+        content hash per processed MOWAS category
+    """
+    got_alert_or_update = False
+    mowas_content_hashes = {}
+
+    # Only take care of those subscribers who are interested in these categories
+    active_profiles = [
+        profile
+        for profile in subscriber_profiles
+        if any(
+            category in profile["active_categories"] for category in mowas_categories
+        )
+    ]
+    if len(active_profiles) == 0:
+        return got_alert_or_update, mowas_content_hashes
+
+    # Download and parse each MOWAS category exactly once
+    if mowas_feed_data is None:
+        mowas_feed_data = get_mowas_feed_data(
+            mowas_active_categories=mowas_categories,
+            local_file_name=local_file_name,
+            mowas_content_hashes=mowas_content_hashes,
+        )
+
+    # Texts, map polygon, summary and translations of each message are
+    # only created once; the subscribers merely filter the messages
+    alert_records = create_alert_records()
+
+    # Discard all messages which none of our subscribers may receive (based
+    # on the least restrictive cache, severity and content filter settings)
+    # before we look at their geometry
+    candidate_feed_data = get_candidate_feed_data(
+        mowas_feed_data=mowas_feed_data,
+        mowas_active_categories=mowas_categories,
+        mowas_caches=[
+            subscriber_caches[profile["name"]] for profile in active_profiles
+        ],
+        minimal_mowas_severity=min(
+            (profile["warning_level"] for profile in active_profiles),
+            key=typedef_mowas_severity.index,
+        ),
+        covid_messaging_settings={
+            profile["enable_covid_content"] for profile in active_profiles
+        },
+        content_filter_rules=content_filter_rules,
+        alert_records=alert_records,
+    )
+
+    # Match all subscribers' coordinates against all areas in one go. We
+    # use the coordinates of all subscribers (not only of those who are
+    # interested in these categories): the per-category polling jobs then
+    # pass identical coordinate sets and share the geocode index and its
+    # polygon memo (see geomatch.prepare_geocode_index)
+    all_coordinates = [
+        coord for profile in subscriber_profiles for coord in profile["watch_areas"]
+    ]
+    area_match_table = build_area_match_table(
+        mowas_feed_data=candidate_feed_data,
+        coordinates=all_coordinates,
+        geocode_index=geocode_index,
+        geometry_pool=geometry_pool,
+    )
+    logger.debug(
+        msg=f"{len(active_profiles)} subscriber(s), {len(all_coordinates)} coordinates, {len(area_match_table)} matching area(s)"
+    )
+
+    # Convert the coordinates of all matching watch points in one go
+    watch_point_locators = get_matching_watch_point_locators(
+        coordinates=all_coordinates, area_match_table=area_match_table
+    )
+    set_alert_area_matches(
+        alert_records=alert_records, area_match_table=area_match_table
+    )
+
+    # and fan out the results to our subscribers
+    for profile in active_profiles:
+        subscriber_categories = [
+            category
+            for category in mowas_categories
+            if category in profile["active_categories"]
+        ]
+        _, mowas_messages_to_send, subscriber_alert_or_update = process_mowas_data(
+            coordinates=profile["watch_areas"],
+            mowas_cache=subscriber_caches[profile["name"]],
+            minimal_mowas_severity=profile["warning_level"],
+            mowas_high_prio_level=profile["high_prio_level"],
+            mowas_active_categories=subscriber_categories,
+            enable_covid_messaging=profile["enable_covid_content"],
+            target_language=profile["target_language"],
+            deepl_api_key=deepl_api_key,
+            generate_sms_messages=True
+            if profile["sms_messenger_config_file"]
+            else False,
+            text_summarizer=text_summarizer,
+            text_summarizer_api_key=text_summarizer_api_key,
+            mowas_feed_data=mowas_feed_data,
+            area_match_table=area_match_table,
+            content_filter_rules=content_filter_rules,
+            watch_point_locators=watch_point_locators,
+            alert_records=alert_records,
+        )
+
+        if len(mowas_messages_to_send) == 0:
+            continue
+
+        logger.info(
+            msg=f"{len(mowas_messages_to_send)} new message(s) found for subscriber {profile['name']}"
+        )
+        if subscriber_alert_or_update:
+            got_alert_or_update = True
+
+        if dispatch_messages:
+            dispatch_mowas_messages(
+                mowas_messages_to_send=mowas_messages_to_send,
+                warncell_data=warncell_data,
+                email_enabled=email_enabled and profile["email_recipient"] is not None,
+                smtpimap_email_address=smtpimap_email_address,
+                smtpimap_email_password=smtpimap_email_password,
+                smtp_server_address=smtp_server_address,
+                smtp_server_port=smtp_server_port,
+                mail_recipient=profile["email_recipient"],
+                messenger_config_file=profile["messenger_config_file"],
+                sms_messenger_config_file=profile["sms_messenger_config_file"],
+                sms_message_length=sms_message_length,
+                sms_message_split=sms_message_split,
+            )
+
+        # Remove all local image files
+        image_garbage_collector(mowas_messages_to_send=mowas_messages_to_send)
+
+    return got_alert_or_update, mowas_content_hashes
+
+
+if __name__ == "__main__":
+    pass
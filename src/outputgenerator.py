@@ -31,10 +31,11 @@ from datetime import datetime
 from expiringdict import ExpiringDict
 from test_data_generator import generate_test_data
 import apprise
+from metrics import measure_duration
 
 # Set up the global logger variable
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
 )
 logger = logging.getLogger(__name__)
 
@@ -54,7 +55,7 @@ def generate_email_messages(
     Parameters
     ==========
     mowas_messages_to_send : 'dict'
-        dictionary, containing all messages that are to be sent to the end user
+        dictionary, containing all messages (records.Alert) that are to be sent to the end user
     warncell_data: 'dict'
         warncell data; these are references to German municipal areas, cities etc
     smtpimap_email_address: str
@@ -185,35 +186,35 @@ REPLACE_HTML_ADDRESSES
     )
 
     logger.debug(msg="Starting Email message processing")
-    for mowas_message_id in mowas_messages_to_send:
-        headline = mowas_messages_to_send[mowas_message_id]["headline"]
-        urgency = mowas_messages_to_send[mowas_message_id]["urgency"]
-        severity = mowas_messages_to_send[mowas_message_id]["severity"]
-        description = mowas_messages_to_send[mowas_message_id]["description"]
-        instruction = mowas_messages_to_send[mowas_message_id]["instruction"]
+    for message in mowas_messages_to_send.values():
+        headline = message.headline
+        urgency = message.urgency
+        severity = message.severity
+        description = message.description
+        instruction = message.instruction
         instruction = "" if not instruction else instruction
-        contact = mowas_messages_to_send[mowas_message_id]["contact"]
+        contact = message.contact
         contact = "" if not contact else contact
-        sent = mowas_messages_to_send[mowas_message_id]["sent"]
-        msgtype = mowas_messages_to_send[mowas_message_id]["msgtype"]
-        areas = mowas_messages_to_send[mowas_message_id]["areas"]
-        geocodes = mowas_messages_to_send[mowas_message_id]["geocodes"]
-        high_prio = mowas_messages_to_send[mowas_message_id]["high_prio"]
-        latlon_polygon = mowas_messages_to_send[mowas_message_id]["latlon_polygon"]
+        sent = message.sent
+        msgtype = message.msgtype
+        areas = message.areas
+        geocodes = message.geocodes
+        high_prio = message.high_prio
+        latlon_polygon = message.latlon_polygon
         # fmt: off
-        coords_matching_latlon = mowas_messages_to_send[mowas_message_id]["coords_matching_latlon"]
-        if "lang" in mowas_messages_to_send[mowas_message_id]:
-            lang_headline = mowas_messages_to_send[mowas_message_id]["lang_headline"]
-            lang_description = mowas_messages_to_send[mowas_message_id]["lang_description"]
-            lang_instruction = mowas_messages_to_send[mowas_message_id]["lang_instruction"]
+        coords_matching_latlon = message.coords_matching_latlon
+        if message.lang is not None:
+            lang_headline = message.lang_headline
+            lang_description = message.lang_description
+            lang_instruction = message.lang_instruction
             lang_instruction = "" if not lang_instruction else lang_instruction
-            lang_contact = mowas_messages_to_send[mowas_message_id]["lang_contact"]
+            lang_contact = message.lang_contact
         else:
             lang_headline = lang_instruction = lang_contact = lang_description = None
         # fmt: on
 
         # get the rendered image (output value will be 'None' in case it cannot be rendered)
-        file_name = mowas_messages_to_send[mowas_message_id]["static_image"]
+        file_name = message.static_image
         html_image = None
 
         try:
@@ -244,17 +245,18 @@ REPLACE_HTML_ADDRESSES
         plaintext_address_coords = []
 
         for coords in coords_matching_latlon:
-            latitude = coords["latitude"]
-            longitude = coords["longitude"]
-            address = coords["address"]
-            utm = coords["utm"]
-            maidenhead = coords["maidenhead"]
-            aprs_c = coords["aprs_coordinates"]
+            latitude = coords.latitude
+            longitude = coords.longitude
+            address = coords.address
+            utm = coords.utm
+            maidenhead = coords.maidenhead
+            aprs_c = coords.aprs_coordinates
+            aprs_callsign = coords.aprs_callsign
 
             # set a marker if these are coordinates originating from
-            # the user's APRS position
+            # a tracked APRS position; label it with its call sign(s)
             aprs = (
-                '<span style="background-color:#00FF00">&nbsp;&nbsp;&nbsp;&nbsp;y&nbsp;&nbsp;&nbsp;&nbsp;</span>'
+                f'<span style="background-color:#00FF00">&nbsp;&nbsp;&nbsp;&nbsp;{aprs_callsign or "y"}&nbsp;&nbsp;&nbsp;&nbsp;</span>'
                 if aprs_c
                 else '<span style="background-color:#FF0000">&nbsp;&nbsp;&nbsp;&nbsp;n&nbsp;&nbsp;&nbsp;&nbsp;</span>'
             )
@@ -276,8 +278,8 @@ REPLACE_HTML_ADDRESSES
             msg = msg.replace("REPLACE_UTM", utm)
             msg = msg.replace("REPLACE_MAIDENHEAD", maidenhead)
             msg = msg.replace("REPLACE_ADDRESS", address)
-            if aprs == "X":
-                msg = msg + " (User's APRS Position)"
+            if aprs_c:
+                msg = msg + f" (APRS Position of {aprs_callsign or 'User'})"
             plaintext_address_coords.append(msg)
 
         # Use the generated list items in order to create the final content for the address info
@@ -401,7 +403,7 @@ def generate_apprise_message(
     Parameters
     ==========
     mowas_messages_to_send : 'dict'
-        dictionary, containing all messages that are to be sent to the end user
+        dictionary, containing all messages (records.Alert) that are to be sent to the end user
     warncell_data: 'dict'
         warncell data; these are references to German municipal areas, cities etc
     apprise_config_file: 'str'
@@ -449,35 +451,33 @@ def generate_apprise_message(
     apobj.add(config)
 
     # Generate the message(s)
-    for mowas_message_id in mowas_messages_to_send:
-        headline = mowas_messages_to_send[mowas_message_id]["headline"]
-        urgency = mowas_messages_to_send[mowas_message_id]["urgency"]
-        severity = mowas_messages_to_send[mowas_message_id]["severity"]
-        description = mowas_messages_to_send[mowas_message_id]["description"]
-        contact = mowas_messages_to_send[mowas_message_id]["contact"]
-        instruction = mowas_messages_to_send[mowas_message_id]["instruction"]
-        sent = mowas_messages_to_send[mowas_message_id]["sent"]
-        msgtype = mowas_messages_to_send[mowas_message_id]["msgtype"]
-        areas = mowas_messages_to_send[mowas_message_id]["areas"]
-        geocodes = mowas_messages_to_send[mowas_message_id]["geocodes"]
-        high_prio = mowas_messages_to_send[mowas_message_id]["high_prio"]
-        coords_matching_latlon = mowas_messages_to_send[mowas_message_id][
-            "coords_matching_latlon"
-        ]
-        sms_message = mowas_messages_to_send[mowas_message_id]["sms_message"]
+    for message in mowas_messages_to_send.values():
+        headline = message.headline
+        urgency = message.urgency
+        severity = message.severity
+        description = message.description
+        contact = message.contact
+        instruction = message.instruction
+        sent = message.sent
+        msgtype = message.msgtype
+        areas = message.areas
+        geocodes = message.geocodes
+        high_prio = message.high_prio
+        coords_matching_latlon = message.coords_matching_latlon
+        sms_message = message.sms_message
 
         # get the rendered image's file name (will be 'None' in case it cannot be rendered)
-        html_image = mowas_messages_to_send[mowas_message_id]["static_image"]
+        html_image = message.static_image
 
         # did the user request translated content?
-        if "lang" in mowas_messages_to_send[mowas_message_id]:
+        if message.lang is not None:
             # yes; get the translated content
             # fmt: off
-            lang_headline = mowas_messages_to_send[mowas_message_id]["lang_headline"]
-            lang_description = mowas_messages_to_send[mowas_message_id]["lang_description"]
-            lang_instruction = mowas_messages_to_send[mowas_message_id]["lang_instruction"]
-            lang_contact = mowas_messages_to_send[mowas_message_id]["lang_contact"]
-            lang_sms_message = mowas_messages_to_send[mowas_message_id]["lang_sms_message"]
+            lang_headline = message.lang_headline
+            lang_description = message.lang_description
+            lang_instruction = message.lang_instruction
+            lang_contact = message.lang_contact
+            lang_sms_message = message.lang_sms_message
             # fmt: on
 
             # if we send regular messages, then let's prepare the target fields
@@ -490,14 +490,14 @@ def generate_apprise_message(
             else:
                 headline = instruction = contact = ""
                 try:
-                    description = f"{areas[0]}:{lang_description}"
+                    description = f"{areas[0].area_desc}:{lang_description}"
                 except IndexError:
                     description = f"{description}"
         else:
             # no translated content, but regular German one
             if abbreviated_message_format:
                 try:
-                    description = f"{areas[0]}:{description}"
+                    description = f"{areas[0].area_desc}:{description}"
                 except IndexError:
                     description = f"{description}"
 
@@ -562,12 +562,13 @@ def generate_apprise_message(
             )
 
             for coords in coords_matching_latlon:
-                latitude = coords["latitude"]
-                longitude = coords["longitude"]
-                address = coords["address"]
-                utm = coords["utm"]
-                maidenhead = coords["maidenhead"]
-                aprs = coords["aprs_coordinates"]
+                latitude = coords.latitude
+                longitude = coords.longitude
+                address = coords.address
+                utm = coords.utm
+                maidenhead = coords.maidenhead
+                aprs = coords.aprs_coordinates
+                aprs_callsign = coords.aprs_callsign
 
                 apprise_message = (
                     apprise_message
@@ -576,7 +577,7 @@ def generate_apprise_message(
                 if aprs:
                     apprise_message = (
                         apprise_message
-                        + f" (<i>This is the user's latest APRS position; see green pin on map</i>)"
+                        + f" (<i>This is the latest APRS position of {aprs_callsign or 'the user'}; see green pin on map</i>)"
                     )
                 apprise_message = apprise_message + newline
                 apprise_message = (
@@ -620,5 +621,95 @@ def generate_apprise_message(
     return success
 
 
+def dispatch_mowas_messages(
+    mowas_messages_to_send: dict,
+    warncell_data: dict,
+    email_enabled: bool = False,
+    smtpimap_email_address: str = None,
+    smtpimap_email_password: str = None,
+    smtp_server_address: str = None,
+    smtp_server_port: int = 0,
+    mail_recipient: str = None,
+    messenger_config_file: str = None,
+    sms_messenger_config_file: str = None,
+    sms_message_length: int = 67,
+    sms_message_split: bool = False,
+):
+    """
+    Sends the messages to all messaging targets of a user
+
+    Parameters
+    ==========
+    mowas_messages_to_send : 'dict'
+        dictionary, containing all messages (records.Alert) that are to be sent to the end user
+    warncell_data: 'dict'
+        warncell data; these are references to German municipal areas, cities etc
+    email_enabled: 'bool'
+        True if we are supposed to send Email messages
+    smtpimap_email_address: str
+        This is the SENDER's SMTP Email Address
+    smtpimap_email_password: str
+        This is the SENDER's SMTP Email Password
+    smtp_server_address: 'str'
+        SMTP server address
+    smtp_server_port: 'int'
+        SMTP server port
+    mail_recipient: str
+        This is the RECIPIENT's email address
+    messenger_config_file: 'str'
+        Apprise Yaml configuration file for full-content messages (or None)
+    sms_messenger_config_file: 'str'
+        Apprise Yaml configuration file for SMS-like messages (or None)
+    sms_message_length: 'int'
+        length of an SMS message
+    sms_message_split: 'bool'
+        False: Truncate after 'sms_message_length' characters
+        True: Build 1..n messages of 'sms_message_length' length
+
+    Returns
+    =======
+    """
+    # Check if we need to send something via Email
+    if email_enabled:
+        logger.debug(msg="Generating Email notifications")
+        with measure_duration("mowas_send_seconds", channel="email"):
+            success = generate_email_messages(
+                mowas_messages_to_send=mowas_messages_to_send,
+                warncell_data=warncell_data,
+                smtpimap_email_address=smtpimap_email_address,
+                smtpimap_email_password=smtpimap_email_password,
+                mail_recipient=mail_recipient,
+                smtp_server_address=smtp_server_address,
+                smtp_server_port=smtp_server_port,
+            )
+        logger.debug(msg=f"Email message success: {success}")
+
+    # Check if we need to send something via Apprise 'full msg' config
+    if messenger_config_file:
+        logger.debug(msg="Generating Apprise 'full msg' notifications")
+        with measure_duration("mowas_send_seconds", channel="apprise_full"):
+            success = generate_apprise_message(
+                mowas_messages_to_send=mowas_messages_to_send,
+                warncell_data=warncell_data,
+                apprise_config_file=messenger_config_file,
+                abbreviated_message_format=False,
+            )
+        logger.info(msg=f"Apprise 'full msg' success: {success}")
+
+    # Check if we need to send something via Apprise 'SMS msg' config
+    if sms_messenger_config_file:
+        logger.debug(msg="Generating Apprise 'SMS msg' notifications")
+        with measure_duration("mowas_send_seconds", channel="apprise_sms"):
+            success = generate_apprise_message(
+                mowas_messages_to_send=mowas_messages_to_send,
+                warncell_data=warncell_data,
+                apprise_config_file=sms_messenger_config_file,
+                abbreviated_message_format=True,
+                sms_message_split=sms_message_split,
+                sms_message_length=sms_message_length,
+            )
+        logger.info(msg=f"Apprise 'SMS msg' success: {success}")
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,345 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: scheduler-based polling of the MOWAS categories
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Each MOWAS category gets its own APScheduler interval job. Interval
+# jobs tick at a fixed rate (the processing time does not add up to the
+# run interval) and a job whose run interval changes gets rescheduled
+# right away rather than waiting for its previous interval to elapse.
+#
+# Every category adapts its run interval on its own, based on its own
+# alert activity and on how often its upstream content actually changes:
+#
+# - Alert/Update message sent to the user: use the emergency interval
+# - recent alert activity and the content has changed: keep polling at
+#   about twice the rate at which the content has been observed to change
+# - recent alert activity but the content did not change: back off
+#   towards the standard interval
+# - no recent alert activity: use the standard interval
+#
+# All jobs share the same message cache. A MOWAS identifier which is
+# present in more than one category's feed is therefore only processed
+# by the job which sees it first; the other jobs skip it as a known
+# message (the same outcome as with a single pass over all categories).
+#
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from apscheduler.schedulers.base import BaseScheduler
+from metrics import start_cycle, finish_cycle
+from profiling import run_cycle_function
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Max. delay in seconds for the very first run of each category's job.
+# Prevents all categories from hitting the MOWAS servers at the very same time
+max_start_jitter = 30
+
+# Shared lock which prevents polling jobs from overlapping with each other;
+# all jobs share the same message cache and messaging targets
+polling_lock = threading.Lock()
+
+# Factor by which a category's run interval grows for each run without
+# any content change (until it has reached the standard run interval)
+interval_backoff_factor = 2.0
+
+# Smoothing factor for the average time between two content changes
+change_interval_smoothing = 0.3
+
+# Per-category polling state, see get_category_state
+category_states = {}
+
+
+def get_polling_job_id(mowas_category: str):
+    """
+    Returns the scheduler's job ID for a MOWAS category
+
+    Parameters
+    ==========
+    mowas_category: 'str'
+        MOWAS category, e.g. TEMPEST
+
+    Returns
+    =======
+    job_id: 'str'
+        The scheduler's job ID for that category
+    """
+    return f"mowas_polling_{mowas_category}"
+
+
+def get_category_state(mowas_category: str, standard_run_interval: int):
+    """
+    Returns the polling state for a MOWAS category. Creates a new
+    state if the category has not been polled before
+
+    Parameters
+    ==========
+    mowas_category: 'str'
+        MOWAS category, e.g. TEMPEST
+    standard_run_interval: 'int'
+        Initial run interval in minutes
+
+    Returns
+    =======
+    category_state: 'dict'
+        run_interval: current run interval in minutes
+        content_hash: content hash from the previous run (or None)
+        last_content_change: datetime of the last content change (or None)
+        mean_change_interval: average number of minutes between two
+                              content changes (or None)
+    """
+    if mowas_category not in category_states:
+        category_states[mowas_category] = {
+            "run_interval": standard_run_interval,
+            "content_hash": None,
+            "last_content_change": None,
+            "mean_change_interval": None,
+        }
+    return category_states[mowas_category]
+
+
+def calculate_run_interval(
+    category_state: dict,
+    got_alert_or_update: bool,
+    content_hash: str,
+    standard_run_interval: int,
+    emergency_run_interval: int,
+    now: datetime = None,
+):
+    """
+    Updates a category's polling state with the results of its most
+    recent run and calculates the category's next run interval.
+    The result is always within the emergency and standard run interval.
+
+    Parameters
+    ==========
+    category_state: 'dict'
+        The category's polling state, see get_category_state
+    got_alert_or_update: 'bool'
+        True if the category did report at least one Alert or Update
+        message to the user
+    content_hash: 'str'
+        Hash of the category's downloaded content. 'None' if the
+        content could not be downloaded
+    standard_run_interval: 'int'
+        Run interval in minutes in case no incident has been detected
+    emergency_run_interval: 'int'
+        Run interval in minutes in case an incident has been detected
+    now: 'datetime'
+        Current time; only required for testing purposes
+
+    Returns
+    =======
+    run_interval: 'int'
+        The category's new run interval in minutes
+    """
+    now = now if now else datetime.now()
+
+    # Did the content change since our previous run?
+    content_changed = (
+        content_hash is not None and content_hash != category_state["content_hash"]
+    )
+    if content_changed:
+        last_content_change = category_state["last_content_change"]
+        if last_content_change:
+            observed = (now - last_content_change).total_seconds() / 60
+            mean_change_interval = category_state["mean_change_interval"]
+            if mean_change_interval is None:
+                mean_change_interval = observed
+            else:
+                mean_change_interval = (
+                    change_interval_smoothing * observed
+                    + (1 - change_interval_smoothing) * mean_change_interval
+                )
+            category_state["mean_change_interval"] = mean_change_interval
+        category_state["last_content_change"] = now
+        category_state["content_hash"] = content_hash
+
+    run_interval = category_state["run_interval"]
+
+    if got_alert_or_update:
+        # something is going on in our watch area
+        run_interval = emergency_run_interval
+    elif run_interval < standard_run_interval:
+        # recent alert activity - stay alert as long as the content keeps changing
+        if content_changed:
+            mean_change_interval = category_state["mean_change_interval"]
+            if mean_change_interval:
+                run_interval = min(run_interval, mean_change_interval / 2)
+        else:
+            run_interval = run_interval * interval_backoff_factor
+    else:
+        run_interval = standard_run_interval
+
+    run_interval = int(
+        round(max(emergency_run_interval, min(standard_run_interval, run_interval)))
+    )
+    category_state["run_interval"] = run_interval
+    return run_interval
+
+
+def add_polling_jobs(
+    scheduler: BaseScheduler,
+    mowas_active_categories: list,
+    polling_function,
+    standard_run_interval: int,
+    emergency_run_interval: int,
+):
+    """
+    Adds one fixed-rate interval job per active MOWAS category
+    to the scheduler. Each job starts with the standard run interval
+    and a randomized start delay.
+
+    Parameters
+    ==========
+    scheduler: 'BaseScheduler'
+        APScheduler instance (not necessarily started yet)
+    mowas_active_categories: 'list'
+        List of active categories (from the program's config file)
+    polling_function: 'function'
+        Function which processes a list of MOWAS categories. Needs to
+        return a tuple: True if at least one Alert or Update message was
+        sent to the user (otherwise False) and a dictionary with the
+        content hash per MOWAS category
+    standard_run_interval: 'int'
+        Run interval in minutes in case no incident has been detected
+    emergency_run_interval: 'int'
+        Run interval in minutes in case an incident has been detected
+
+    Returns
+    =======
+    """
+    for mowas_category in mowas_active_categories:
+        start_delay = random.uniform(0, max_start_jitter)
+        scheduler.add_job(
+            run_polling_job,
+            "interval",
+            id=get_polling_job_id(mowas_category),
+            minutes=standard_run_interval,
+            next_run_time=datetime.now() + timedelta(seconds=start_delay),
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=None,
+            kwargs={
+                "scheduler": scheduler,
+                "mowas_category": mowas_category,
+                "polling_function": polling_function,
+                "standard_run_interval": standard_run_interval,
+                "emergency_run_interval": emergency_run_interval,
+            },
+        )
+        logger.debug(
+            msg=f"Scheduled category {mowas_category}: first run in {start_delay:.1f} secs, then every {standard_run_interval} mins"
+        )
+
+
+def run_polling_job(
+    scheduler: BaseScheduler,
+    mowas_category: str,
+    polling_function,
+    standard_run_interval: int,
+    emergency_run_interval: int,
+):
+    """
+    Scheduler job for a single MOWAS category. Runs the polling function
+    and adjusts the category's run interval, based on the category's
+    alert activity and content changes.
+
+    Parameters
+    ==========
+    scheduler: 'BaseScheduler'
+        APScheduler instance which runs this job
+    mowas_category: 'str'
+        MOWAS category that we are supposed to process
+    polling_function: 'function'
+        see add_polling_jobs
+    standard_run_interval: 'int'
+        Run interval in minutes in case no incident has been detected
+    emergency_run_interval: 'int'
+        Run interval in minutes in case an incident has been detected
+
+    Returns
+    =======
+    """
+    with polling_lock:
+        cycle_id = start_cycle(mowas_categories=[mowas_category])
+        got_alert_or_update = False
+        try:
+            got_alert_or_update, mowas_content_hashes = run_cycle_function(
+                polling_function, [mowas_category], cycle_id=cycle_id
+            )
+        finally:
+            finish_cycle(got_alert_or_update=got_alert_or_update)
+
+    run_interval = calculate_run_interval(
+        category_state=get_category_state(
+            mowas_category=mowas_category,
+            standard_run_interval=standard_run_interval,
+        ),
+        got_alert_or_update=got_alert_or_update,
+        content_hash=mowas_content_hashes.get(mowas_category),
+        standard_run_interval=standard_run_interval,
+        emergency_run_interval=emergency_run_interval,
+    )
+    set_polling_interval(
+        scheduler=scheduler, mowas_category=mowas_category, run_interval=run_interval
+    )
+
+
+def set_polling_interval(
+    scheduler: BaseScheduler, mowas_category: str, run_interval: int
+):
+    """
+    Changes a category's run interval. If the interval differs from the
+    job's current one, the job is rescheduled immediately, meaning that
+    its next run takes place 'run_interval' minutes from now.
+
+    Parameters
+    ==========
+    scheduler: 'BaseScheduler'
+        APScheduler instance
+    mowas_category: 'str'
+        MOWAS category whose job we may need to reschedule
+    run_interval: 'int'
+        new run interval in minutes
+
+    Returns
+    =======
+    rescheduled: 'bool'
+        True if the job was rescheduled
+    """
+    job = scheduler.get_job(get_polling_job_id(mowas_category))
+    if not job:
+        return False
+
+    if job.trigger.interval == timedelta(minutes=run_interval):
+        return False
+
+    logger.debug(
+        msg=f"Changing run interval for category {mowas_category} to {run_interval} mins"
+    )
+    scheduler.reschedule_job(job.id, trigger="interval", minutes=run_interval)
+    return True
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,151 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: on-demand profiling of a single polling cycle
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# If enabled (--profile-directory), the next polling cycle after either
+#
+# - a SIGUSR1 signal ("kill -USR1 <pid>") or
+# - the creation of the flag file '<profile directory>/profile-next-cycle'
+#
+# runs under cProfile. Its statistics are written to the profile directory
+# as 'mowas-pwb-cycle-<cycle id>-<timestamp>.pstats' (use e.g. "python -m
+# pstats <file>" or snakeviz for analysis). All other cycles run as usual.
+#
+import cProfile
+import logging
+import os
+import signal
+import threading
+from datetime import datetime
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Name of the flag file within the profile directory
+profiling_flag_file_name = "profile-next-cycle"
+
+# Profiling settings; the directory is 'None' if profiling is disabled
+profiling_settings = {"directory": None}
+
+# Set by the signal handler; checked at the start of each cycle
+profiling_requested = threading.Event()
+
+
+def request_profiling(signum=None, frame=None):
+    """
+    Signal handler; the next polling cycle will be profiled
+    """
+    profiling_requested.set()
+
+
+def enable_profiling(profile_directory: str):
+    """
+    Enables the on-demand profiling of polling cycles
+
+    Parameters
+    ==========
+    profile_directory: 'str'
+        Directory for the flag file and the profiling results
+
+    Returns
+    =======
+    """
+    os.makedirs(profile_directory, exist_ok=True)
+    profiling_settings["directory"] = profile_directory
+
+    # SIGUSR1 is not available on Windows; the flag file always works
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, request_profiling)
+    logger.info(
+        msg=f"Profiling enabled; send SIGUSR1 or create '{os.path.join(profile_directory, profiling_flag_file_name)}' to profile the next cycle"
+    )
+
+
+def is_profiling_requested():
+    """
+    Checks (and resets) the profiling triggers
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    requested: 'bool'
+        True if the next cycle is to be profiled
+    """
+    profile_directory = profiling_settings["directory"]
+    if not profile_directory:
+        return False
+
+    requested = profiling_requested.is_set()
+    profiling_requested.clear()
+
+    flag_file = os.path.join(profile_directory, profiling_flag_file_name)
+    if os.path.exists(flag_file):
+        requested = True
+        try:
+            os.remove(flag_file)
+        except OSError as ex:
+            logger.info(msg=f"Cannot remove profiling flag file: {ex}")
+    return requested
+
+
+def run_cycle_function(cycle_function, *args, cycle_id: int = 0, **kwargs):
+    """
+    Runs a polling cycle's function; the function runs under cProfile
+    in case profiling has been requested for this cycle
+
+    Parameters
+    ==========
+    cycle_function: 'function'
+        The function that we want to run
+    args: 'list'
+        Positional arguments for the function
+    cycle_id: 'int'
+        ID of the polling cycle (used for the file name)
+    kwargs: 'dict'
+        Keyword arguments for the function
+
+    Returns
+    =======
+    result:
+        The function's return value
+    """
+    if not is_profiling_requested():
+        return cycle_function(*args, **kwargs)
+
+    profile_file = os.path.join(
+        profiling_settings["directory"],
+        f"mowas-pwb-cycle-{cycle_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pstats",
+    )
+    logger.info(msg=f"Profiling cycle {cycle_id}")
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(cycle_function, *args, **kwargs)
+    finally:
+        try:
+            profiler.dump_stats(profile_file)
+            logger.info(msg=f"Profile of cycle {cycle_id} written to '{profile_file}'")
+        except OSError as ex:
+            logger.info(msg=f"Cannot write profile '{profile_file}': {ex}")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,82 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: record types for MOWAS alerts, areas and matched coordinates
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# All records are NamedTuples: they have no per-instance __dict__, are
+# hashable (as long as their fields are) and can therefore be used
+# for set-based duplicate checks.
+#
+from typing import NamedTuple
+
+
+class WatchPoint(NamedTuple):
+    # A user's watch coordinates
+    latitude: float
+    longitude: float
+
+
+class Area(NamedTuple):
+    # A MOWAS area which matches with at least one watch point
+    area_desc: str
+    geocode: str
+
+
+class Match(NamedTuple):
+    # A watch point which is located in a MOWAS area, including
+    # its address and its coordinates in various formats. Tracked
+    # APRS positions are labeled with their call sign(s)
+    latitude: float
+    longitude: float
+    address: str
+    maidenhead: str
+    utm: str
+    aprs_coordinates: bool
+    aprs_callsign: str = None
+
+
+class Alert(NamedTuple):
+    # A MOWAS message that is to be sent to the user
+    headline: str
+    urgency: str
+    severity: str
+    description: str
+    instruction: str
+    sms_message: str
+    sent: str
+    msgtype: str
+    areas: tuple
+    high_prio: bool
+    latlon_polygon: list
+    coords_matching_latlon: list
+    contact: str
+    lang: str = None
+    lang_headline: str = None
+    lang_description: str = None
+    lang_instruction: str = None
+    lang_contact: str = None
+    lang_sms_message: str = None
+    static_image: str = None
+
+    @property
+    def geocodes(self):
+        # Geocodes of all matching areas (without duplicates)
+        return list(dict.fromkeys(area.geocode for area in self.areas))
+
+
+if __name__ == "__main__":
+    pass
@@ -19,9 +19,10 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-import staticmaps
 import logging
 import tempfile
+import time
+from metrics import increment_counter, observe_duration
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
@@ -32,8 +33,6 @@ logger = logging.getLogger(__name__)
 def render_png_map(
     polygon_area: list,
     monitoring_positions: list,
-    aprs_latitude: float = None,
-    aprs_longitude: float = None,
 ):
     """
     Render a static PNG image of the destination area where a MOWAS event
@@ -44,11 +43,8 @@ def render_png_map(
     polygon_area : 'list'
             Polygon of the destination area
     monitoring_positions : 'list'
-            Contains dictionary elements for latitude and longitude
-    aprs_latitude : 'float'
-            APRS dynamic latitude (if applicable)
-    aprs_longitude : 'float'
-            APRS dynamic longitude (if applicable)
+            Contains records.Match elements (latitude, longitude and
+            the APRS flag for tracked call sign positions)
 
     Returns
     =======
@@ -57,6 +53,11 @@ def render_png_map(
             contains our rendered image
     """
 
+    # staticmaps (and its rendering backends) is only imported if we render a map
+    import staticmaps
+
+    render_start = time.perf_counter()
+
     # Create the object
     context = staticmaps.Context()
     context.set_tile_provider(staticmaps.tile_provider_OSM)
@@ -73,13 +74,9 @@ def render_png_map(
 
     # Add the markers: static markers = red, APRS-dynamic marker: green
     for position in monitoring_positions:
-        latitude = position["latitude"]
-        longitude = position["longitude"]
-        marker_color = (
-            staticmaps.GREEN
-            if latitude == aprs_latitude and longitude == aprs_longitude
-            else staticmaps.RED
-        )
+        latitude = position.latitude
+        longitude = position.longitude
+        marker_color = staticmaps.GREEN if position.aprs_coordinates else staticmaps.RED
         context.add_object(
             staticmaps.Marker(
                 staticmaps.create_latlng(latitude, longitude),
@@ -103,7 +100,9 @@ def render_png_map(
             image.save(file_name, format="png")
     except Exception as ex:
         file_name = None
+        increment_counter("mowas_render_errors_total")
 
+    observe_duration("mowas_render_seconds", time.perf_counter() - render_start)
     return file_name
 
 
@@ -1,7 +1,8 @@
 #
 # MOWAS Personal Warning Beacon
 # Module: Renders a sample output message which is used
-# by the program for its configuration test
+# by the program for its configuration test and generates
+# synthetic MOWAS feeds for scale tests
 # Author: Joerg Schultze-Lutter, 2021
 #
 # This program is free software; you can redistribute it and/or modify
@@ -19,8 +20,35 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import copy
 import json
+import os
+import random
+from datetime import datetime, timedelta
+import numpy as np
 from staticmap import render_png_map
+from records import Alert, Area, Match
+
+# Directory with the captured MOWAS feeds; these serve as
+# templates for the synthetic MOWAS feeds
+demo_data_directory = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "demo_data"
+)
+
+# Area in which the synthetic polygons are located (min_lat, min_lon, max_lat, max_lon)
+synthetic_feed_bbox = (47.27, 5.87, 55.06, 15.04)
+
+# Default share of the MOWAS message types in a synthetic feed
+synthetic_msgtype_mix = {"Alert": 0.7, "Update": 0.2, "Cancel": 0.1}
+
+# MOWAS severities (same distribution for all synthetic messages)
+synthetic_severities = ("Minor", "Moderate", "Severe", "Extreme")
+
+# Min / max radius of a synthetic polygon in km
+synthetic_polygon_radius = (5.0, 40.0)
+
+# Timestamp of the first synthetic message
+synthetic_feed_start_time = datetime.fromisoformat("2022-02-17T07:00:00+01:00")
 
 # Sample JSON file - contains everything but the static image
 meinjson = """
@@ -34,8 +62,10 @@ meinjson = """
 		"sms_message": "mowas-pwb Konfigurationstest ok",
 		"sent": "2020-08-28T11:00:08+02:00",
 		"msgtype": "Alert",
-		"areas": ["Kreis Holzminden"],
-		"geocodes": ["103255000"],
+		"areas": [{
+			"area_desc": "Kreis Holzminden",
+			"geocode": "103255000"
+		}],
 		"high_prio": false,
 		"latlon_polygon": [
 			[52.038744328437716, 9.57555944842884],
@@ -192,7 +222,8 @@ meinjson = """
 			"address": "Niemanns Villa, Schießhäuser Straße, Holzminden, Landkreis Holzminden, Niedersachsen, 37603, Deutschland",
 			"maidenhead": "JO41st16",
 			"utm": "32 U 535428 5741033",
-			"aprs_coordinates": true
+			"aprs_coordinates": true,
+			"aprs_callsign": "DF1JSL"
 		}, {
 			"latitude": 51.9016773,
 			"longitude": 9.6425367,
@@ -214,7 +245,8 @@ meinjson = """
 
 def generate_test_data():
     """
-    Converts the JSON input to a dict, renders the static image and returns the dict
+    Converts the JSON input to a dict of records.Alert, renders the
+    static image and returns the dict
 
     Parameters
     ==========
@@ -226,21 +258,300 @@ def generate_test_data():
     """
 
     target_dict = json.loads(meinjson)
-    latlon_polygon = target_dict["MOWAS-BEISPIEL-MELDUNG"]["latlon_polygon"]
-    coords_matching_latlon = target_dict["MOWAS-BEISPIEL-MELDUNG"][
-        "coords_matching_latlon"
-    ]
+    for mowas_message_id, message in target_dict.items():
+        message["areas"] = tuple(Area(**area) for area in message["areas"])
+        message["coords_matching_latlon"] = [
+            Match(**coords) for coords in message["coords_matching_latlon"]
+        ]
+        target_dict[mowas_message_id] = Alert(**message)
+
+    message = target_dict["MOWAS-BEISPIEL-MELDUNG"]
 
     # render the image
     image_file_name = render_png_map(
-        polygon_area=latlon_polygon,
-        monitoring_positions=coords_matching_latlon,
-        aprs_latitude=51.81901,
-        aprs_longitude=9.5139941,
+        polygon_area=message.latlon_polygon,
+        monitoring_positions=message.coords_matching_latlon,
+    )
+    target_dict["MOWAS-BEISPIEL-MELDUNG"] = message._replace(
+        static_image=image_file_name
     )
-    target_dict["MOWAS-BEISPIEL-MELDUNG"]["static_image"] = image_file_name
     return target_dict
 
 
+def load_template_elements(template_directory: str = demo_data_directory):
+    """
+    Loads all MOWAS messages from the captured MOWAS feeds
+
+    Parameters
+    ==========
+    template_directory: 'str'
+        Directory with the captured MOWAS JSON files
+
+    Returns
+    =======
+    template_elements: 'list'
+        MOWAS messages (sorted by file name) which contain
+        at least one area with a polygon
+    """
+    template_elements = []
+    for file_name in sorted(os.listdir(template_directory)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(template_directory, file_name), "r") as f:
+            for element in json.load(f):
+                if any(
+                    area.get("polygon")
+                    for info in element.get("info", [])
+                    for area in info.get("area", [])
+                ):
+                    template_elements.append(element)
+    return template_elements
+
+
+def get_template_shapes(template_elements: list):
+    """
+    Extracts the polygon shapes of the captured MOWAS messages. Each
+    shape is normalized: centered around (0, 0) and scaled to a max.
+    radius of 1
+
+    Parameters
+    ==========
+    template_elements: 'list'
+        see load_template_elements
+
+    Returns
+    =======
+    template_shapes: 'list'
+        List of numpy arrays with (latitude, longitude) offsets
+    """
+    template_shapes = []
+    for element in template_elements:
+        for info in element.get("info", []):
+            for area in info.get("area", []):
+                for polygon in area.get("polygon", []):
+                    latlon = np.array(
+                        [
+                            [float(value) for value in point.split(",")][::-1]
+                            for point in polygon.split()
+                        ]
+                    )
+                    if len(latlon) < 4:
+                        continue
+                    # degrees of longitude are shorter than degrees of latitude
+                    latlon[:, 1] *= np.cos(np.radians(latlon[:, 0].mean()))
+                    latlon -= latlon.mean(axis=0)
+                    radius = np.hypot(latlon[:, 0], latlon[:, 1]).max()
+                    if radius > 0:
+                        template_shapes.append(latlon / radius)
+    return template_shapes
+
+
+def resample_shape(shape: np.ndarray, vertex_count: int):
+    """
+    Resamples a closed shape to a given number of vertices which are
+    evenly spaced along the shape's outline
+
+    Parameters
+    ==========
+    shape: 'np.ndarray'
+        (latitude, longitude) offsets of the shape
+    vertex_count: 'int'
+        Number of vertices (without the closing vertex)
+
+    Returns
+    =======
+    shape: 'np.ndarray'
+        Resampled shape
+    """
+    ring = np.vstack([shape, shape[:1]])
+    distances = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(ring, axis=0).T))])
+    positions = np.linspace(0.0, distances[-1], vertex_count, endpoint=False)
+    return np.column_stack(
+        [
+            np.interp(positions, distances, ring[:, 0]),
+            np.interp(positions, distances, ring[:, 1]),
+        ]
+    )
+
+
+def create_random_shape(rng: random.Random, vertex_count: int):
+    """
+    Creates a random, star-shaped polygon around (0, 0)
+    with a max. radius of 1
+
+    Parameters
+    ==========
+    rng: 'random.Random'
+        Our random generator
+    vertex_count: 'int'
+        Number of vertices (without the closing vertex)
+
+    Returns
+    =======
+    shape: 'np.ndarray'
+        (latitude, longitude) offsets of the shape
+    """
+    angles = np.sort([rng.uniform(0, 2 * np.pi) for _ in range(vertex_count)])
+    radii = np.array([rng.uniform(0.6, 1.0) for _ in range(vertex_count)])
+    return np.column_stack([radii * np.sin(angles), radii * np.cos(angles)])
+
+
+def create_polygon_string(
+    shape: np.ndarray, latitude: float, longitude: float, radius: float
+):
+    """
+    Places a normalized shape at the given position and returns it
+    in MOWAS format ("lon,lat lon,lat ..." with a closing vertex)
+
+    Parameters
+    ==========
+    shape: 'np.ndarray'
+        (latitude, longitude) offsets of the shape
+    latitude: 'float'
+        Latitude of the polygon's center
+    longitude: 'float'
+        Longitude of the polygon's center
+    radius: 'float'
+        Max. radius of the polygon in km
+
+    Returns
+    =======
+    polygon: 'str'
+        MOWAS polygon string
+    """
+    # one degree of latitude is ~111 km
+    radius_degrees = radius / 111.0
+    latitudes = latitude + shape[:, 0] * radius_degrees
+    longitudes = longitude + shape[:, 1] * radius_degrees / np.cos(np.radians(latitude))
+    points = [
+        f"{lon:.4f},{lat:.4f}"
+        for lat, lon in zip(latitudes.tolist(), longitudes.tolist())
+    ]
+    points.append(points[0])
+    return " ".join(points)
+
+
+def generate_synthetic_feed(
+    element_count: int = 100,
+    areas_per_element: int = 3,
+    vertices_per_polygon: int = 50,
+    msgtype_mix: dict = None,
+    seed: int = 42,
+    use_template_shapes: bool = True,
+    template_directory: str = demo_data_directory,
+    bbox: tuple = synthetic_feed_bbox,
+):
+    """
+    Generates a synthetic MOWAS feed. The messages are copies of the
+    captured MOWAS messages (all CAP fields, texts etc.) with new
+    identifiers, message types, severities and areas. The polygons
+    are either derived from the captured polygons (resampled, scaled
+    and moved to a random position) or random star-shaped polygons.
+    The same settings and seed always produce the same feed.
+
+    Parameters
+    ==========
+    element_count: 'int'
+        Number of MOWAS messages
+    areas_per_element: 'int'
+        Number of areas per MOWAS message
+    vertices_per_polygon: 'int'
+        Number of vertices per polygon (without the closing vertex)
+    msgtype_mix: 'dict'
+        Share per MOWAS message type, e.g. {"Alert": 0.7, "Update": 0.2, "Cancel": 0.1}
+    seed: 'int'
+        Seed for the random generator
+    use_template_shapes: 'bool'
+        If True, the polygons are derived from the captured polygons
+    template_directory: 'str'
+        Directory with the captured MOWAS JSON files
+    bbox: 'tuple'
+        (min_lat, min_lon, max_lat, max_lon) of the area in which
+        the polygons are located
+
+    Returns
+    =======
+    json_data: 'list'
+        Synthetic MOWAS feed (same format as the MOWAS servers' JSON data)
+    """
+    rng = random.Random(seed)
+    msgtype_mix = msgtype_mix or synthetic_msgtype_mix
+    msgtypes = list(msgtype_mix.keys())
+    msgtype_weights = list(msgtype_mix.values())
+
+    template_elements = load_template_elements(template_directory=template_directory)
+    template_shapes = (
+        get_template_shapes(template_elements=template_elements)
+        if use_template_shapes
+        else []
+    )
+    min_lat, min_lon, max_lat, max_lon = bbox
+
+    json_data = []
+    for element_index in range(element_count):
+        element = copy.deepcopy(rng.choice(template_elements))
+        element["identifier"] = f"SYNTHETIC-{seed}-{element_index:06d}"
+        element["msgType"] = rng.choices(msgtypes, weights=msgtype_weights)[0]
+        element["sent"] = (
+            synthetic_feed_start_time + timedelta(seconds=element_index)
+        ).isoformat()
+
+        info = element["info"][0]
+        info["severity"] = rng.choice(synthetic_severities)
+
+        areas = []
+        for area_index in range(areas_per_element):
+            if template_shapes:
+                shape = resample_shape(
+                    shape=rng.choice(template_shapes),
+                    vertex_count=vertices_per_polygon,
+                )
+            else:
+                shape = create_random_shape(rng=rng, vertex_count=vertices_per_polygon)
+            geocode = f"{element_index % 1000000:06d}{area_index % 1000000:06d}"
+            areas.append(
+                {
+                    "areaDesc": f"Synthetisches Gebiet {element_index}-{area_index}",
+                    "polygon": [
+                        create_polygon_string(
+                            shape=shape,
+                            latitude=rng.uniform(min_lat, max_lat),
+                            longitude=rng.uniform(min_lon, max_lon),
+                            radius=rng.uniform(*synthetic_polygon_radius),
+                        )
+                    ],
+                    "geocode": [{"valueName": f"Gebiet {geocode}", "value": geocode}],
+                }
+            )
+        info["area"] = areas
+        element["info"] = [info]
+        json_data.append(element)
+
+    return json_data
+
+
+def write_synthetic_feed(file_name: str, **kwargs):
+    """
+    Generates a synthetic MOWAS feed and writes it to a JSON file
+    which can be used with process_mowas_data's 'local_file_name'
+
+    Parameters
+    ==========
+    file_name: 'str'
+        Name of the JSON file
+    **kwargs:
+        see generate_synthetic_feed
+
+    Returns
+    =======
+    json_data: 'list'
+        Synthetic MOWAS feed
+    """
+    json_data = generate_synthetic_feed(**kwargs)
+    with open(file_name, "w", encoding="utf-8") as f:
+        json.dump(json_data, f, ensure_ascii=False)
+    return json_data
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,178 @@
+#
+# MOWAS Personal Warning Beacon
+# Module: text cleaning and down-conversion of UTF-8 text to plain ASCII
+# Author: Joerg Schultze-Lutter, 2021
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# unidecode transliterates character by character. We therefore
+# precompute its results for the Unicode blocks that German MOWAS
+# texts commonly use and apply them via str.translate. German special
+# characters get their proper transliteration (which unidecode does
+# not provide). unidecode itself is only called for characters which
+# are not yet part of the table; their results are added to the table.
+#
+# Most MOWAS texts are either plain ASCII or only contain German special
+# characters; both cases are handled without any per-character lookups.
+#
+# HTML markup in MOWAS texts (usually '<br/>') is replaced by spaces,
+# HTML entities are decoded and whitespace is collapsed. All steps run
+# at C speed (no per-match Python callbacks); texts without markup
+# are not touched at all.
+#
+import html
+import logging
+import re
+import threading
+from unidecode import unidecode
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# German special characters (not covered by unidecode)
+german_transliterations = {
+    "Ä": "Ae",
+    "Ö": "Oe",
+    "Ü": "Ue",
+    "ä": "ae",
+    "ö": "oe",
+    "ü": "ue",
+    "ß": "ss",
+}
+
+# Unicode blocks which are added to the table in advance:
+# Latin-1 Supplement, Latin Extended-A/B, General Punctuation
+# and Currency Symbols
+precomputed_unicode_ranges = [
+    range(0x00A0, 0x0250),
+    range(0x2000, 0x2070),
+    range(0x20A0, 0x20D0),
+]
+
+# Max. number of table entries; characters beyond this limit
+# are still converted but no longer added to the table
+ascii_translation_table_max_size = 10000
+
+# HTML tags
+html_tag_pattern = re.compile(r"<[^<>]+>")
+
+# Runs of non-ASCII characters
+non_ascii_pattern = re.compile(r"[^\x00-\x7f]+")
+
+# Translation table (code point -> ASCII string); built on first use
+ascii_translation_table = {}
+ascii_translation_table_lock = threading.Lock()
+
+
+def get_ascii_translation_table():
+    """
+    Returns the translation table and builds it, if necessary
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    ascii_translation_table: 'dict'
+        Translation table for str.translate
+    """
+    if not ascii_translation_table:
+        with ascii_translation_table_lock:
+            if not ascii_translation_table:
+                table = {
+                    code_point: unidecode(chr(code_point))
+                    for unicode_range in precomputed_unicode_ranges
+                    for code_point in unicode_range
+                }
+                for char, transliteration in german_transliterations.items():
+                    table[ord(char)] = transliteration
+                ascii_translation_table.update(table)
+    return ascii_translation_table
+
+
+def remove_html_content(message_string: str):
+    """
+    Removes HTML tags from a MOWAS text, decodes its HTML entities and
+    collapses its whitespace. Texts without any '<' or '&' characters
+    are returned unchanged.
+
+    Parameters
+    ==========
+    message_string: 'str'
+        Text that needs to be cleaned (or 'None')
+
+    Returns
+    =======
+    message_string: 'str'
+        Cleaned text
+    """
+    if not message_string or ("<" not in message_string and "&" not in message_string):
+        return message_string
+    message_string = html_tag_pattern.sub(" ", message_string)
+    if "&" in message_string:
+        message_string = html.unescape(message_string)
+    # split() also covers non-breaking spaces (e.g. from '&nbsp;')
+    return " ".join(message_string.split())
+
+
+def convert_non_ascii_run(match: re.Match):
+    """
+    Converts a run of non-ASCII characters (regex match) to ASCII
+    """
+    table = get_ascii_translation_table()
+    converted = match.group().translate(table)
+    if converted.isascii():
+        return converted
+
+    # Some characters are not part of our table yet
+    if len(table) >= ascii_translation_table_max_size:
+        return unidecode(converted)
+    for char in set(converted):
+        if not char.isascii():
+            table[ord(char)] = unidecode(char)
+    return converted.translate(table)
+
+
+def convert_text_to_plain_ascii(message_string: str):
+    """
+    Converts a string to plain ASCII
+
+    Parameters
+    ==========
+    message_string: 'str'
+                    Text that needs to be converted
+
+    Returns
+    =======
+    hex-converted text to the user
+    """
+    # Fast path: nothing to convert
+    if message_string.isascii():
+        return message_string
+
+    # German special characters are by far the most common ones
+    for char, transliteration in german_transliterations.items():
+        message_string = message_string.replace(char, transliteration)
+    if message_string.isascii():
+        return message_string
+
+    # Convert the remaining non-ASCII characters via our table
+    return non_ascii_pattern.sub(convert_non_ascii_run, message_string)
+
+
+if __name__ == "__main__":
+    pass
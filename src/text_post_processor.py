@@ -24,23 +24,39 @@
 # This module tries to shorten the given input text whereas possible. It
 # acts as a decision tree on which post processor is about to get called.
 # The actual post processiing is done in the various sub sections
+#
+# The post processors are only imported once they are used for the first
+# time - some of them pull in large dependencies (e.g. torch)
 
-from text_summarizer_generic import text_summarizer_generic
-from text_summarizer_openai import text_summarizer_openai
-from text_summarizer_palm import text_summarizer_palm
-from text_summarizer_internal import text_summarizer_internal
+import importlib
+from metrics import measure_duration
 
+# post processor identifier: (module name, function name)
 available_processors = {
-    "internal": text_summarizer_internal,
-    "generic": text_summarizer_generic,
-    "openai": text_summarizer_openai,
-    "palm": text_summarizer_palm,
+    "internal": ("text_summarizer_internal", "text_summarizer_internal"),
+    "generic": ("text_summarizer_generic", "text_summarizer_generic"),
+    "openai": ("text_summarizer_openai", "text_summarizer_openai"),
+    "palm": ("text_summarizer_palm", "text_summarizer_palm"),
 }
 
+# post processors which have already been imported
+loaded_processors = {}
+
+
+def get_text_summarizer(post_processor: str):
+    if post_processor not in loaded_processors:
+        module_name, function_name = available_processors[post_processor]
+        module = importlib.import_module(module_name)
+        loaded_processors[post_processor] = getattr(module, function_name)
+    return loaded_processors[post_processor]
+
 
 def create_text_summary(input_text: str, post_processor: str, api_key: str):
     assert post_processor in available_processors
-    return available_processors[post_processor](input_text=input_text, api_key=api_key)
+    with measure_duration("mowas_summarizer_seconds", summarizer=post_processor):
+        return get_text_summarizer(post_processor)(
+            input_text=input_text, api_key=api_key
+        )
 
 
 if __name__ == "__main__":
@@ -18,13 +18,16 @@
 #
 
 import logging
-import deepl
+from metrics import increment_counter, measure_duration
 
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
+    level=logging.INFO, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# deepl.com API server ('None' = deepl.com default; can be overridden, e.g. for a mock server)
+deepl_server_url = None
+
 
 def translate_text_string(
     deepl_api_key: str,
@@ -52,8 +55,11 @@ def translate_text_string(
             Translated text (or original text in case of errors)
     """
 
+    # deepl is only imported if we need to translate something
+    import deepl
+
     try:
-        translator = deepl.Translator(deepl_api_key)
+        translator = deepl.Translator(deepl_api_key, server_url=deepl_server_url)
         result = translator.translate_text(
             original_text, target_lang=target_language, source_lang=original_language
         )
@@ -91,14 +97,20 @@ def translate_text_list(
             Translated texts (or original texts in case of errors)
     """
 
+    import deepl
+
     try:
-        translator = deepl.Translator(deepl_api_key)
-        result = translator.translate_text(
-            original_text, target_lang=target_language, source_lang=original_language
-        )
+        with measure_duration("mowas_translator_seconds"):
+            translator = deepl.Translator(deepl_api_key, server_url=deepl_server_url)
+            result = translator.translate_text(
+                original_text,
+                target_lang=target_language,
+                source_lang=original_language,
+            )
         response = [str(item) for item in result]
     except Exception as ex:
         response = original_text
+        increment_counter("mowas_translator_errors_total")
         logger.debug(msg="Cannot translate; deepl.com exception occurred")
 
     return response
@@ -18,15 +18,22 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-import numpy as np
 import configparser
-from unidecode import unidecode
+from text_normalizer import convert_text_to_plain_ascii
 import re
 import logging
 import sys
 import argparse
 import string
 import os.path
+from contentfilter import (
+    ContentFilterRule,
+    check_content_filter_pattern,
+    compile_content_filter,
+    content_filter_default_fields,
+    content_filter_fields,
+)
+from aprsdotfi import aprsdotfi_poll_interval, aprsdotfi_min_distance
 
 # Set up the global logger variable
 logging.basicConfig(
@@ -35,6 +42,40 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def get_watch_areas_from_string(watch_areas_string: str):
+    """
+    Converts the watch areas from the config file to a list of coordinates
+
+    Parameters
+    ==========
+    watch_areas_string: 'str'
+        Format: lat1,lon1<space>lat2,lon2<space>.....latn,lonn
+        Each entry can have an optional radius in meters (watch zone),
+        e.g. 51.838879,8.32678,5000
+
+    Returns
+    =======
+    watch_areas: 'list'
+        List of [latitude, longitude] and [latitude, longitude, radius]
+        coordinates
+    """
+    watch_areas = []
+    for point in watch_areas_string.split():
+        values = [float(value) for value in point.split(",")]
+        if len(values) not in (2, 3):
+            raise ValueError(f"Invalid watch area '{point}'")
+        if len(values) == 3:
+            if values[2] < 0:
+                raise ValueError(f"Invalid watch zone radius in '{point}'")
+            # A watch zone without a radius is a plain watch point
+            if values[2] == 0:
+                values.pop()
+        watch_areas.append(values)
+    if len(watch_areas) == 0:
+        raise ValueError("No watch areas found")
+    return watch_areas
+
+
 def get_program_config_from_file(config_filename: str = "mowas-pwb.cfg"):
     config = configparser.ConfigParser()
 
@@ -42,9 +83,7 @@ def get_program_config_from_file(config_filename: str = "mowas-pwb.cfg"):
         config.read(config_filename)
         mowas_aprsdotfi_api_key = config.get("mowas_config", "aprsdotfi_api_key")
         mowas_watch_areas_string = config.get("mowas_config", "mowas_watch_areas")
-        a = [point.split(",") for point in mowas_watch_areas_string.split(" ")]
-        b = np.array(a, dtype=np.float64)
-        mowas_watch_areas = b.tolist()
+        mowas_watch_areas = get_watch_areas_from_string(mowas_watch_areas_string)
 
         mowas_deepldotcom_api_key = config.get("mowas_config", "deepldotcom_api_key")
 
@@ -136,6 +175,224 @@ def get_program_config_from_file(config_filename: str = "mowas-pwb.cfg"):
     )
 
 
+def get_subscriber_profiles_from_file(
+    subscriber_filename: str,
+    default_active_categories: list,
+    default_warning_level: str = "Minor",
+    default_high_prio_level: str = "Severe",
+):
+    """
+    Reads the subscriber profiles for the multi-tenant mode. Each section
+    of the file represents one subscriber; all keys except for
+    'mowas_watch_areas' are optional. Example:
+
+    [jane_doe]
+    mowas_watch_areas = 51.838879,8.32678 51.829722,9.448333,5000
+    warning_level = MODERATE
+    high_prio_level = SEVERE
+    mowas_active_categories = TEMPEST,FLOOD
+    target_language = en-us
+    enable_covid_content = false
+    email_recipient = jane.doe@example.com
+    messenger_config_file = jane_doe_full_msg.yml
+    sms_messenger_config_file = jane_doe_sms.yml
+
+    Parameters
+    ==========
+    subscriber_filename: 'str'
+        Name of the subscriber file
+    default_active_categories: 'list'
+        MOWAS categories for subscribers which do not specify any
+    default_warning_level: 'str'
+        Minimal warning level for subscribers which do not specify any
+    default_high_prio_level: 'str'
+        High prio level for subscribers which do not specify any
+
+    Returns
+    =======
+    success: 'bool'
+        True if the file could be parsed
+    subscriber_profiles: 'list'
+        List of subscriber profile dictionaries
+    """
+    config = configparser.ConfigParser()
+    subscriber_profiles = []
+
+    try:
+        if not config.read(subscriber_filename):
+            raise ValueError(f"Cannot read subscriber file {subscriber_filename}")
+
+        for subscriber_name in config.sections():
+            section = config[subscriber_name]
+
+            mowas_watch_areas_string = section.get("mowas_watch_areas")
+            mowas_watch_areas = get_watch_areas_from_string(mowas_watch_areas_string)
+
+            warning_level = string.capwords(
+                section.get("warning_level", default_warning_level)
+            )
+            high_prio_level = string.capwords(
+                section.get("high_prio_level", default_high_prio_level)
+            )
+            for level in (warning_level, high_prio_level):
+                if level not in ["Minor", "Moderate", "Severe", "Extreme"]:
+                    logger.info(
+                        msg=f"Subscriber {subscriber_name}: invalid warning level '{level}'"
+                    )
+                    raise ValueError("Error in subscriber file")
+
+            mowas_acs = section.get("mowas_active_categories", "")
+            mowas_active_categories = [
+                s.strip().upper() for s in mowas_acs.split(",") if s.strip() != ""
+            ]
+            if len(mowas_active_categories) == 0:
+                mowas_active_categories = default_active_categories
+            for ac in mowas_active_categories:
+                if ac not in [
+                    "TEMPEST",
+                    "FLOOD",
+                    "FLOOD_OLD",
+                    "WILDFIRE",
+                    "EARTHQUAKE",
+                    "DISASTERS",
+                ]:
+                    logger.info(
+                        msg=f"Subscriber {subscriber_name}: received category '{ac}'"
+                    )
+                    raise ValueError("Error in subscriber file")
+
+            target_language = language_check(section.get("target_language", None))
+
+            messenger_config_file = section.get("messenger_config_file", None)
+            sms_messenger_config_file = section.get("sms_messenger_config_file", None)
+            for file_name in (messenger_config_file, sms_messenger_config_file):
+                if file_name and not does_file_exist(file_name):
+                    logger.info(
+                        msg=f"Subscriber {subscriber_name}: config file '{file_name}' does not exist"
+                    )
+                    raise ValueError("Error in subscriber file")
+
+            subscriber_profiles.append(
+                {
+                    "name": subscriber_name,
+                    "watch_areas": mowas_watch_areas,
+                    "warning_level": warning_level,
+                    "high_prio_level": high_prio_level,
+                    "active_categories": mowas_active_categories,
+                    "target_language": target_language,
+                    "enable_covid_content": section.getboolean(
+                        "enable_covid_content", False
+                    ),
+                    "email_recipient": section.get("email_recipient", None),
+                    "messenger_config_file": messenger_config_file,
+                    "sms_messenger_config_file": sms_messenger_config_file,
+                }
+            )
+
+        success = len(subscriber_profiles) > 0
+    except Exception as ex:
+        logger.info(
+            msg="Error in subscriber file; Check if your subscriber file format is correct."
+        )
+        subscriber_profiles = []
+        success = False
+
+    return success, subscriber_profiles
+
+
+def get_content_filter_rules_from_file(config_filename: str = "mowas-pwb.cfg"):
+    """
+    Reads the (optional) user-defined content filter rules from the
+    program's config file. Each rule is a section whose name starts
+    with 'content_filter_'; all keys are optional. Example:
+
+    [content_filter_test_alarm]
+    keywords = probealarm, testwarnung
+    patterns = ^test
+               warntag 20[0-9]{2}
+    fields = headline, description
+
+    'keywords' are case-insensitive substrings (comma-separated),
+    'patterns' are case-insensitive regular expressions (one per line),
+    'fields' are the message fields that we check (headline, description,
+    instruction, contact, sender). A message which matches any rule
+    is not sent to the user.
+
+    Parameters
+    ==========
+    config_filename: 'str'
+        Name of the program's config file
+
+    Returns
+    =======
+    success: 'bool'
+        True if the rules could be parsed (or if there are none)
+    content_filter_rules: 'list'
+        List of ContentFilterRule elements
+    """
+    config = configparser.ConfigParser()
+    content_filter_rules = []
+
+    try:
+        config.read(config_filename)
+        for section_name in config.sections():
+            if not section_name.startswith("content_filter_"):
+                continue
+            section = config[section_name]
+            rule_name = section_name[len("content_filter_") :]
+
+            keywords = tuple(
+                s.strip().lower()
+                for s in section.get("keywords", "").split(",")
+                if s.strip() != ""
+            )
+            patterns = tuple(
+                s.strip()
+                for s in section.get("patterns", "").splitlines()
+                if s.strip() != ""
+            )
+            # Each pattern becomes part of one combined regular expression
+            for pattern in patterns:
+                error_message = check_content_filter_pattern(pattern)
+                if error_message:
+                    logger.info(
+                        msg=f"Content filter {rule_name}: {error_message} in '{pattern}'"
+                    )
+                    raise ValueError("Error in config file")
+
+            fields = tuple(
+                s.strip().lower()
+                for s in section.get("fields", "").split(",")
+                if s.strip() != ""
+            )
+            if len(fields) == 0:
+                fields = content_filter_default_fields
+            for field in fields:
+                if field not in content_filter_fields:
+                    logger.info(
+                        msg=f"Content filter {rule_name}: received field '{field}'"
+                    )
+                    raise ValueError("Error in config file")
+
+            content_filter_rules.append(
+                ContentFilterRule(
+                    name=rule_name, keywords=keywords, patterns=patterns, fields=fields
+                )
+            )
+
+        # Make sure that all rules can be combined
+        compile_content_filter(tuple(content_filter_rules))
+        success = True
+    except Exception as ex:
+        logger.info(
+            msg="Error in content filter configuration; Check if your config format is correct."
+        )
+        content_filter_rules = []
+        success = False
+
+    return success, content_filter_rules
+
+
 def signal_term_handler(signal_number, frame):
     """
     Signal handler for SIGTERM signals. Ensures that the program
@@ -173,6 +430,10 @@ def does_file_exist(file_name: str):
     return os.path.isfile(file_name)
 
 
+# Characters which are not permitted in APRS messages
+sms_forbidden_characters = re.compile("[{}|~]+")
+
+
 def make_pretty_sms_messages(
     message_to_add: str,
     destination_list: list = None,
@@ -229,7 +490,7 @@ def make_pretty_sms_messages(
     # replace non-permitted APRS characters from the
     # message text
     # see APRS specification pg. 71
-    message_to_add = re.sub("[{}|~]+", "", message_to_add)
+    message_to_add = sms_forbidden_characters.sub("", message_to_add)
 
     # Check if the user wants unicode messages. Default is ASCII
     if not force_outgoing_unicode_messages:
@@ -238,47 +499,45 @@ def make_pretty_sms_messages(
         # Therefore, we need to 'translate' them first
         message_to_add = convert_text_to_plain_ascii(message_string=message_to_add)
 
-    # If new message is longer than max len then split it up with
-    # max chunks of max_len bytes and add it to the array.
-    # This should never happen but better safe than sorry.
+    # If new message is longer than max len then split it up into its
+    # words and pack them into chunks of max_len bytes. Words which
+    # exceed max_len themselves are split up and added as is.
     # Keep in mind that we only transport plain text anyway.
-    if len(message_to_add) > max_len:
-        split_data = message_to_add.split()
-        for split in split_data:
-            # if string is short enough then add it by calling ourself
-            # with the smaller text chunk
-            if len(split) < max_len:
-                destination_list = make_pretty_sms_messages(
-                    message_to_add=split,
-                    destination_list=destination_list,
-                    max_len=max_len,
-                    separator_char=separator_char,
-                    add_sep=add_sep,
-                    force_outgoing_unicode_messages=force_outgoing_unicode_messages,
-                )
-            else:
-                # string exceeds max len; split it up and add it as is
-                string_list = split_string_to_string_list(
-                    message_string=split, max_len=max_len
-                )
-                for msg in string_list:
-                    destination_list.append(msg)
-    else:  # try to insert
+    split_message = len(message_to_add) > max_len
+    if split_message:
+        words = message_to_add.split()
+        # The ASCII conversion may have introduced non-permitted characters;
+        # these are removed on a per-word basis (only if there are any)
+        filter_words = sms_forbidden_characters.search(message_to_add) is not None
+    else:
+        words = [message_to_add]
+        filter_words = False
+
+    for word in words:
+        if split_message and len(word) >= max_len:
+            # string exceeds max len; split it up and add it as is
+            destination_list.extend(
+                split_string_to_string_list(message_string=word, max_len=max_len)
+            )
+            continue
+        if filter_words:
+            word = sms_forbidden_characters.sub("", word)
+
+        # try to insert
         if len(destination_list) > 0:
             # Get very last element from list
             string_from_list = destination_list[-1]
 
             # element + new string > max len? no: add to existing string, else create new element in list
-            if len(string_from_list) + len(message_to_add) + 1 <= max_len:
+            if len(string_from_list) + len(word) + 1 <= max_len:
                 delimiter = ""
                 if len(string_from_list) > 0 and add_sep:
                     delimiter = separator_char
-                string_from_list = string_from_list + delimiter + message_to_add
-                destination_list[-1] = string_from_list
+                destination_list[-1] = string_from_list + delimiter + word
             else:
-                destination_list.append(message_to_add)
+                destination_list.append(word)
         else:
-            destination_list.append(message_to_add)
+            destination_list.append(word)
 
     return destination_list
 
@@ -311,32 +570,6 @@ def split_string_to_string_list(message_string: str, max_len: int = 80):
     return split_strings
 
 
-def convert_text_to_plain_ascii(message_string: str):
-    """
-    Converts a string to plain ASCII
-
-    Parameters
-    ==========
-    message_string: 'str'
-                    Text that needs to be converted
-
-    Returns
-    =======
-    hex-converted text to the user
-    """
-    message_string = (
-        message_string.replace("Ä", "Ae")
-        .replace("Ö", "Oe")
-        .replace("Ü", "Ue")
-        .replace("ä", "ae")
-        .replace("ö", "oe")
-        .replace("ü", "ue")
-        .replace("ß", "ss")
-    )
-    message_string = unidecode(message_string)
-    return message_string
-
-
 def standard_run_interval_check(interval_value):
     interval_value = int(interval_value)
     if interval_value < 60:
@@ -443,7 +676,23 @@ def get_command_line_params():
         default=None,
         dest="follow_the_ham",
         type=str,
-        help="Adds a call sign's current coordinates to the MOWAS coordinates monitored by this program",
+        help="Adds the current coordinates of 1..n (comma-separated) call signs to the MOWAS coordinates monitored by this program",
+    )
+
+    parser.add_argument(
+        "--aprs-poll-interval",
+        default=aprsdotfi_poll_interval,
+        dest="aprs_poll_interval",
+        type=int,
+        help="Interval in minutes at which the positions of the --follow-the-ham call signs are retrieved from aprs.fi. Default value is 5 mins",
+    )
+
+    parser.add_argument(
+        "--aprs-min-distance",
+        default=aprsdotfi_min_distance,
+        dest="aprs_min_distance",
+        type=int,
+        help="Minimal distance in meters that a --follow-the-ham call sign needs to move before its new position is used. Default value is 250m",
     )
 
     parser.add_argument(
@@ -500,6 +749,54 @@ def get_command_line_params():
         help="local MOWAS JSON file (for testing purposes only)",
     )
 
+    parser.add_argument(
+        "--subscriber-file",
+        default=None,
+        dest="subscriber_file",
+        type=str,
+        help="Enables the multi-tenant mode. Config file with 1..n subscriber profiles (watch areas, warning levels, categories, language and messaging targets)",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        default=None,
+        dest="metrics_port",
+        type=int,
+        help="Exposes the program's metrics in Prometheus text format on this TCP port",
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        dest="metrics_file",
+        type=str,
+        help="Writes the metrics of each polling cycle as one JSON line to this (rotating) file",
+    )
+
+    parser.add_argument(
+        "--profile-directory",
+        default=None,
+        dest="profile_directory",
+        type=str,
+        help="Enables on-demand profiling: after a SIGUSR1 signal or the creation of the file 'profile-next-cycle' in this directory, the next polling cycle is profiled and its statistics are written to this directory",
+    )
+
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        dest="base_url",
+        type=str,
+        help="Sends all requests for MOWAS, aprs.fi, Nominatim, DWD warncell and deepl.com data to this base URL (e.g. http://localhost:8080 for mockserver.py). For testing purposes only",
+    )
+
+    parser.add_argument(
+        "--geometry-workers",
+        default=0,
+        dest="geometry_workers",
+        type=int,
+        help="Number of worker processes for matching the watch coordinates against the MOWAS area polygons. Only useful for very large watch lists (e.g. in multi-tenant mode). Default value is 0 (no worker processes)",
+    )
+
     parser.set_defaults(add_example_data=False)
 
     args = parser.parse_args()
@@ -521,6 +818,14 @@ def get_command_line_params():
     mowas_text_summarizer = args.text_summarizer
     mowas_sms_message_length = args.sms_message_length
     mowas_sms_message_split = args.sms_message_split
+    mowas_subscriber_file = args.subscriber_file
+    mowas_metrics_port = args.metrics_port
+    mowas_metrics_file = args.metrics_file
+    mowas_profile_directory = args.profile_directory
+    mowas_aprs_poll_interval = args.aprs_poll_interval
+    mowas_aprs_min_distance = args.aprs_min_distance
+    mowas_base_url = args.base_url
+    mowas_geometry_workers = args.geometry_workers
 
     # Did the user specify an optional JSON file for testing?
     # if yes, check if that file exists
@@ -530,6 +835,14 @@ def get_command_line_params():
                 f"Local MOWAS test file '{mowas_localfile}' does not exist"
             )
 
+    # Did the user specify an optional subscriber file?
+    # if yes, check if that file exists
+    if mowas_subscriber_file:
+        if not does_file_exist(mowas_subscriber_file):
+            raise ValueError(
+                f"Provided subscriber file '{mowas_subscriber_file}' does not exist"
+            )
+
     # Did the user specify an optional generic full message file?
     # if yes, check if that file exists
     if mowas_messenger_configfile:
@@ -546,11 +859,19 @@ def get_command_line_params():
                 f"Provided MOWAS short message config file '{mowas_sms_messenger_configfile}' does not exist"
             )
 
-    # Convert requested call sign to upper case whereas present
+    # Convert requested call signs to upper case whereas present
     if mowas_follow_the_ham:
-        mowas_follow_the_ham = mowas_follow_the_ham.upper()
-        # Get rid of the SSID in the TO callsign (if accidentally present)
-        mowas_follow_the_ham = mowas_follow_the_ham.split("-")[0].upper()
+        # Get rid of the SSID in the TO callsigns (if accidentally present)
+        # and remove duplicates
+        mowas_follow_the_ham = list(
+            dict.fromkeys(
+                callsign.strip().split("-")[0].upper()
+                for callsign in mowas_follow_the_ham.split(",")
+                if callsign.strip()
+            )
+        )
+        if not mowas_follow_the_ham:
+            raise ValueError("--follow-the-ham requires at least one call sign")
 
     # Convert the MOWAS Warning Level to the MOWAS-Native format:
     # First character = Uppercase, remainder is lowercase
@@ -563,6 +884,15 @@ def get_command_line_params():
     if mowas_sms_message_length < 67:
         raise ValueError("SMS message minimum length must be 67 or greater")
 
+    if mowas_aprs_poll_interval < 1:
+        raise ValueError("aprs.fi poll interval must be 1 minute or greater")
+
+    if mowas_aprs_min_distance < 0:
+        raise ValueError("aprs.fi minimal distance must not be negative")
+
+    if mowas_geometry_workers < 0:
+        raise ValueError("Number of geometry workers must not be negative")
+
     return (
         mowas_configfile,
         mowas_standard_run_interval,
@@ -581,14 +911,38 @@ def get_command_line_params():
         mowas_text_summarizer,
         mowas_sms_message_length,
         mowas_sms_message_split,
+        mowas_subscriber_file,
+        mowas_metrics_port,
+        mowas_metrics_file,
+        mowas_profile_directory,
+        mowas_aprs_poll_interval,
+        mowas_aprs_min_distance,
+        mowas_base_url,
+        mowas_geometry_workers,
     )
 
 
-def remove_html_content(message_string: str):
-    if message_string:
-        return re.sub("<[^<]+?>", " ", message_string)
-    else:
-        return message_string
+def image_garbage_collector(mowas_messages_to_send: dict):
+    """
+    Garbage collector; deletes all images which we may have created
+    on the user's hard drive.
+
+    Parameters
+    ==========
+    mowas_messages_to_send: 'dict'
+                    Our MOWAS messages dictionary
+
+    Returns
+    =======
+    """
+    logger.debug(msg="Starting image files garbage collector")
+
+    for message in mowas_messages_to_send.values():
+        file_name = message.static_image
+        if file_name and os.path.isfile(file_name):
+            os.remove(file_name)
+
+    logger.debug(msg="Finishing image files garbage collector")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 #
 # MOWAS Personal Warning Beacon
 # Module: Reads all Warncells from the Deutscher Wetterdienst site
-#         and returns them as a dictionary
+#         and keeps them in a local SQLite database
 # Author: Joerg Schultze-Lutter, 2021
 #
 # This program is free software; you can redistribute it and/or modify
@@ -22,6 +22,11 @@ import csv
 import requests
 import io
 import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
 
 # Set up the global logger variable
 logging.basicConfig(
@@ -29,74 +34,295 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Deutscher Wetterdienst URL for the warncell table
+warncell_url = "https://www.dwd.de/DE/leistungen/opendata/help/warnungen/cap_warncellids_csv.csv?__blob=publicationFile&v=3"
 
-def read_warncell_info(
-    url: str = "https://www.dwd.de/DE/leistungen/opendata/help/warnungen/cap_warncellids_csv.csv?__blob=publicationFile&v=3",
+# Default location of our local warncell database
+warncell_database_file = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "warncell.db"
+)
+
+# Version of the database layout; older databases get rebuilt
+warncell_schema_version = "1"
+
+# Interval for checking the DWD site for warncell updates (hours)
+warncell_refresh_interval = 24
+
+# Size of the memory-mapped region for read access (bytes)
+warncell_mmap_size = 16 * 1024 * 1024
+
+
+class WarncellEntry(NamedTuple):
+    full_name: str
+    short_name: str
+
+
+class WarncellStore:
+    """
+    Read-only, dictionary-like access to the local warncell database.
+    The database is opened on first access and read through a
+    memory-mapped region; entries are only materialized on lookup.
+    """
+
+    __slots__ = ("database_file", "_connection", "_lock", "_length")
+
+    def __init__(self, database_file: str = warncell_database_file):
+        self.database_file = database_file
+        self._connection = None
+        self._lock = threading.Lock()
+        self._length = None
+
+    def _execute(self, statement: str, parameters: tuple = ()):
+        with self._lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(
+                    f"file:{self.database_file}?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                )
+                self._connection.execute(f"PRAGMA mmap_size={warncell_mmap_size}")
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def get(self, warncellid: str, default=None):
+        try:
+            rows = self._execute(
+                "SELECT full_name, short_name FROM warncell WHERE warncellid = ?",
+                (warncellid,),
+            )
+        except sqlite3.Error:
+            return default
+        return WarncellEntry(*rows[0]) if rows else default
+
+    def __getitem__(self, warncellid: str):
+        entry = self.get(warncellid)
+        if entry is None:
+            raise KeyError(warncellid)
+        return entry
+
+    def __contains__(self, warncellid: str):
+        return self.get(warncellid) is not None
+
+    def __len__(self):
+        if self._length is None:
+            try:
+                self._length = self._execute("SELECT COUNT(*) FROM warncell")[0][0]
+            except sqlite3.Error:
+                return 0
+        return self._length
+
+    def keys(self):
+        try:
+            rows = self._execute("SELECT warncellid FROM warncell")
+        except sqlite3.Error:
+            rows = []
+        return [row[0] for row in rows]
+
+    def invalidate(self):
+        """
+        Drops the cached entry count after the database has been refreshed
+        """
+        self._length = None
+
+
+def get_warncell_metadata(database_file: str = warncell_database_file):
+    """
+    Reads the metadata (schema version, ETag etc) of our local
+    warncell database
+
+    Parameters
+    ==========
+    database_file: 'str'
+        Name of the local warncell database
+
+    Returns
+    =======
+    metadata: 'dict'
+        Metadata key/value pairs; empty dict if the database
+        does not exist or cannot be read
+    """
+    if not os.path.isfile(database_file):
+        return {}
+    try:
+        with sqlite3.connect(f"file:{database_file}?mode=ro", uri=True) as connection:
+            rows = connection.execute("SELECT key, value FROM metadata").fetchall()
+    except sqlite3.Error as ex:
+        logger.info(msg=f"Cannot read warncell database '{database_file}': {ex}")
+        return {}
+    return dict(rows)
+
+
+def parse_warncell_csv(warncell_data_string: str):
+    """
+    Parses the DWD warncell CSV file
+
+    Parameters
+    ==========
+    warncell_data_string: 'str'
+        Content of the DWD warncell CSV file
+
+    Returns
+    =======
+    warncell_rows: 'list'
+        List of (warncellid, full_name, short_name) tuples
+    """
+    # We use custom field names as the original ones do contain Unicode
+    # characters which will make it difficult for us to access the fields
+    fieldnames = [
+        "warncellid",
+        "fullname",
+        "nuts_kennung",
+        "shortname",
+        "sign_kennung",
+    ]
+
+    # Parse the content
+    csvreader = csv.DictReader(
+        io.StringIO(warncell_data_string),
+        dialect="excel",
+        delimiter=";",
+        fieldnames=fieldnames,
+    )
+
+    # Convert the content to a proper dictionary that we can use
+    warncell_data = {}
+    for elem in csvreader:
+        warncell_data[elem["warncellid"]] = (elem["fullname"], elem["shortname"])
+
+    # Delete the first key from the dict as it
+    # contains the header information from the file
+    if len(warncell_data) > 0:
+        hdr = list(warncell_data.keys())[0]
+        warncell_data.pop(hdr)
+
+    return [(key, val[0], val[1]) for key, val in warncell_data.items()]
+
+
+def refresh_warncell_database(
+    database_file: str = None,
+    url: str = None,
+    warncell_store: WarncellStore = None,
 ):
     """
-    Reads Warncell information from the Deutscher Wetterdienst website
-    and returns information as a dictionary
+    Downloads the warncell data from the Deutscher Wetterdienst website
+    and stores it in our local database. The download is skipped if the
+    DWD site reports that the data has not changed since our last download.
 
     Parameters
     ==========
+    database_file: 'str'
+        Name of the local warncell database (default: warncell_database_file)
     url : 'str'
-            Deutscher Wetterdienst URL (usually fixed)
+        Deutscher Wetterdienst URL (default: warncell_url)
+    warncell_store: 'WarncellStore'
+        Optional store which reads from this database; gets
+        notified if the database content has changed
+
     Returns
     =======
     success : 'bool'
-            True if operation was successful
-    warncell_data: 'dict'
-            Dictionary which contains the Warncell information
+        True if our local database is up to date
     """
+    database_file = database_file or warncell_database_file
+    url = url or warncell_url
     request_headers = {"User-Agent": "Mozilla"}
 
-    # This is our target directory
-    warncell_data = {}
-
-    warncell_data_string = None
+    metadata = get_warncell_metadata(database_file=database_file)
+    if metadata.get("schema_version") == warncell_schema_version:
+        if metadata.get("etag"):
+            request_headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            request_headers["If-Modified-Since"] = metadata["last_modified"]
 
-    # Download the Warncell data from the web site and retain the string if successful
+    # Download the Warncell data from the web site
     try:
-        resp = requests.get(url=url, headers=request_headers)
+        resp = requests.get(url=url, headers=request_headers, timeout=30)
     except Exception as ex:
-        resp = None
-    if resp:
-        if resp.status_code == 200:
-            warncell_data_string = resp.text
-
-    # Do we have some data? Then let's try to process it
-    if warncell_data_string:
-        # We use custom field names as the original ones do contain Unicode
-        # characters which will make it difficult for us to access the fields
-        fieldnames = [
-            "warncellid",
-            "fullname",
-            "nuts_kennung",
-            "shortname",
-            "sign_kennung",
-        ]
-
-        # Parse the content
-        csvreader = csv.DictReader(
-            io.StringIO(warncell_data_string),
-            dialect="excel",
-            delimiter=";",
-            fieldnames=fieldnames,
+        logger.info(msg=f"Cannot download warncell data: {ex}")
+        return False
+
+    if resp.status_code == 304:
+        logger.debug(msg="Warncell data has not changed")
+        return True
+    if resp.status_code != 200:
+        logger.info(msg=f"Cannot download warncell data: HTTP {resp.status_code}")
+        return False
+
+    warncell_rows = parse_warncell_csv(resp.text)
+    if len(warncell_rows) == 0:
+        logger.info(msg="Downloaded warncell data is empty; keeping local copy")
+        return False
+
+    metadata = {
+        "schema_version": warncell_schema_version,
+        "etag": resp.headers.get("ETag", ""),
+        "last_modified": resp.headers.get("Last-Modified", ""),
+        "updated": datetime.now(timezone.utc).isoformat(),
+    }
+
+    # Replace the content in one transaction; readers will either
+    # see the old or the new table
+    connection = None
+    try:
+        connection = sqlite3.connect(database_file, isolation_level=None)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("DROP TABLE IF EXISTS warncell")
+        connection.execute(
+            "CREATE TABLE warncell (warncellid TEXT PRIMARY KEY, full_name TEXT, short_name TEXT) WITHOUT ROWID"
         )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        connection.executemany("INSERT INTO warncell VALUES (?, ?, ?)", warncell_rows)
+        connection.executemany(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?)", metadata.items()
+        )
+        connection.execute("COMMIT")
+    except sqlite3.Error as ex:
+        logger.info(msg=f"Cannot write warncell database '{database_file}': {ex}")
+        if connection is not None and connection.in_transaction:
+            connection.execute("ROLLBACK")
+        return False
+    finally:
+        if connection is not None:
+            connection.close()
 
-        # Convert the content to a proper dictionary that we can use
-        for elem in csvreader:
-            warncellid = elem["warncellid"]
-            full_name = elem["fullname"]
-            short_name = elem["shortname"]
-            val = {"full_name": full_name, "short_name": short_name}
-            warncell_data[warncellid] = val
+    logger.info(
+        msg=f"Stored {len(warncell_rows)} warncell entries in '{database_file}'"
+    )
+    if warncell_store is not None:
+        warncell_store.invalidate()
+    return True
 
-    # Delete the first key from the dict as it
-    # contains the header information from the file
-    if len(warncell_data) > 0:
-        hdr = list(warncell_data.keys())[0]
-        warncell_data.pop(hdr)
+
+def read_warncell_info(
+    url: str = None,
+    database_file: str = None,
+):
+    """
+    Returns the warncell information from our local database. The data
+    is only downloaded from the Deutscher Wetterdienst website if there
+    is no local copy yet; use refresh_warncell_database for updating an
+    existing copy
+
+    Parameters
+    ==========
+    url : 'str'
+            Deutscher Wetterdienst URL (default: warncell_url)
+    database_file: 'str'
+            Name of the local warncell database (default: warncell_database_file)
+    Returns
+    =======
+    success : 'bool'
+            True if warncell data is available
+    warncell_data: 'WarncellStore'
+            Dictionary-like store which contains the Warncell information
+    """
+    database_file = database_file or warncell_database_file
+    metadata = get_warncell_metadata(database_file=database_file)
+    if metadata.get("schema_version") != warncell_schema_version:
+        refresh_warncell_database(database_file=database_file, url=url)
+
+    warncell_data = WarncellStore(database_file=database_file)
 
     # Finally, check if we have received something and
     # set our success/failure marker